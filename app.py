@@ -1,48 +1,99 @@
 from os import environ
 
-from flask import current_app, Flask, jsonify, request
+from flask import current_app, Flask, jsonify, Response
 from flask_cors import cross_origin
-from flask_session import Session
 from werkzeug.exceptions import HTTPException
 
-from util import app_logger, auth_util, sql_util
+from commands import archive_commands, data_commands, rollup_commands, session_commands
+from util import app_logger, auth_util, compression_util, metrics_util, session_util, sql_util
 from util.app_util import CROSS_ORIGIN_HEADERS
 from util.sql_util import SQLUtil
 
-app = Flask(__name__, static_folder=None)
-app.config['IS_DEV'] = 'DEV' in environ
-logger = app_logger.create_logger('app', app.config['IS_DEV'])
-logger.info('Starting up...')
+logger = app_logger.create_logger('app', 'DEV' in environ)
+requires_auth = auth_util.init_auth('app')
 
 
 def app_db() -> SQLUtil:
     return current_app.config['DC_DB']
 
 
-app.config['DC_DB'] = sql_util.init_db(app)
-app.config['SESSION_TYPE'] = 'sqlalchemy'
-app.config['SESSION_SQLALCHEMY'] = app.config['DC_DB'].get_db()
-app.config['SESSION_SQLALCHEMY_TABLE'] = 'session'
-app.config['SESSION_COOKIE_SECURE'] = True
+def create_app(start_worker: bool = True) -> Flask:
+    """
+    Build the application. With ``start_worker=False`` (gunicorn --preload) the per-process resources are left for
+    ``init_worker`` to create after fork, and the master only loads what workers can share copy-on-write.
+    """
+    app = Flask(__name__, static_folder=None)
+    app.config['IS_DEV'] = 'DEV' in environ
+    logger.info('Starting up...')
+    app_logger.init_request_logging(app)
+
+    app.config['DC_DB'] = sql_util.init_db(app)
+    app.config['SESSION_SQLALCHEMY_TABLE'] = 'session'
+    app.config['SESSION_COOKIE_SECURE'] = True
+    app.config['SESSION_CACHE_TTL'] = int(environ.get('SESSION_CACHE_TTL', 30))
+
+    # noinspection SpellCheckingInspection
+    app.secret_key = environ['SESSION_SECRET']
+    session_interface = session_util.init_session(app, app.config['DC_DB'].get_db())
+    auth_util.employee_provisioner = app.config['DC_DB'].provision_employee
+    metrics = metrics_util.init_metrics(app)
+    metrics.gauge('token_cache_hits', 'Verified-token cache hits.', lambda: auth_util.token_cache.hits)
+    metrics.gauge('token_cache_misses', 'Verified-token cache misses.', lambda: auth_util.token_cache.misses)
+    metrics.gauge('session_cache_hits', 'Session read-cache hits.', lambda: session_interface.read_cache.hits)
+    metrics.gauge('session_cache_misses', 'Session read-cache misses.', lambda: session_interface.read_cache.misses)
+    metrics.gauge('requests_shed', 'Requests rejected with 503 because the worker was at its concurrency limit.',
+                  lambda: auth_util.concurrency_limiter.rejected)
+    if auth_util.rate_limiter is not None:
+        metrics.gauge('requests_rate_limited', 'Requests rejected with 429 by the per-employee token buckets.',
+                      lambda: auth_util.rate_limiter.rejected)
+    metrics.gauge('log_records_dropped', 'Log records dropped because the log queue was full.',
+                  app_logger.dropped_records)
+    compressor = compression_util.init_compression(app)
+    metrics.gauge('compression_cache_hits', 'Responses served from the compressed-body cache.', lambda: compressor.hits)
+    metrics.gauge('compression_cache_misses', 'Responses compressed on the fly.', lambda: compressor.misses)
+    if 'QUERY_CACHE' in app.config:
+        metrics.gauge('query_cache_hit_rate', 'Query cache hit rate.',
+                      lambda: app.config['QUERY_CACHE'].stats()['hit_rate'])
 
-# noinspection SpellCheckingInspection
-app.secret_key = environ['SESSION_SECRET']
-Session(app)
-
-with app.app_context():
     from blueprints import employee_blueprint
-
-    requires_auth = auth_util.init_auth('app')
     app.register_blueprint(employee_blueprint.employee, url_prefix='/api/employee')
+    app.cli.add_command(rollup_commands.rollup_cli)
+    app.cli.add_command(session_commands.session_cli)
+    app.cli.add_command(data_commands.data_cli)
+    app.cli.add_command(archive_commands.archive_cli)
+
+    app.add_url_rule('/api/hello', view_func=hello, methods=['GET'])
+    app.add_url_rule('/api/init-session', view_func=init_session, methods=['GET'])
+    app.add_url_rule('/api/metrics', view_func=get_metrics, methods=['GET'])
+    app.after_request(add_headers)
+    app.register_error_handler(HTTPException, handle_http_exception)
+    app.register_error_handler(Exception, handle_exception)
+
+    if start_worker:
+        init_worker(app)
+    else:
+        auth_util.jwks_store.refresh()
+    return app
+
+
+def init_worker(app: Flask) -> None:
+    """
+    Create the resources that cannot be shared across fork: DB connections, the JWKS refresher thread, the log
+    listener thread and the metrics flusher thread. Called from create_app, or from gunicorn's post_fork hook in each worker.
+    """
+    with app.app_context():
+        app.config['DC_DB'].dispose_engines()
+    app_logger.start_listener()
+    auth_util.jwks_store.start()
+    if metrics_util.metrics_directory:
+        metrics_util.metrics_directory.start()
 
 
-@app.route('/api/hello', methods=['GET'])
 def hello():
     logger.info('GET /api/hello')
     return 'Hello!'
 
 
-@app.route('/api/init-session', methods=['GET'])
 @cross_origin(headers=CROSS_ORIGIN_HEADERS)
 @requires_auth()
 def init_session():
@@ -50,8 +101,13 @@ def init_session():
     return jsonify({}), 200
 
 
-@app.after_request
+@requires_auth(admin_required=True)
+def get_metrics():
+    return Response(metrics_util.render_metrics(), mimetype='text/plain; version=0.0.4')
+
+
 def add_headers(response):
+    # Only security/CORS headers are set here; ETag, Last-Modified and Cache-Control from handlers pass through.
     response.headers['Referrer-Policy'] = 'no-referrer'
     response.headers['Strict-Transport-Security'] = 'max-age=31536000; includeSubDomains; preload'
     response.headers['X-Content-Type-Options'] = 'nosniff'
@@ -67,17 +123,16 @@ def add_headers(response):
     return response
 
 
-@app.errorhandler(HTTPException)
 def handle_http_exception(e: HTTPException):
     logger.error('%d %s HTTPException', e.code, e.name, exc_info=e)
-    return e.name, e.code
+    # Keep headers such as Retry-After and Allow; the body is the plain-text name, not the HTML page.
+    return e.name, e.code, [(name, value) for name, value in e.get_headers() if name != 'Content-Type']
 
 
-@app.errorhandler(Exception)
 def handle_exception(e: Exception):
     logger.error('Uncaught application exception', exc_info=e)
     return 'Server Error', 500
 
 
 if __name__ == '__main__':
-    app.run()
+    create_app().run()
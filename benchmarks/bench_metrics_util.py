@@ -0,0 +1,44 @@
+"""
+Measure the instrumentation cost of one request (a route observation plus a handful of auth/DB/JSON phases) against
+OVERHEAD_BUDGET_SECONDS, and exit non-zero when the median of several runs is over it.
+
+    python -m benchmarks.bench_metrics_util [iterations]
+"""
+from statistics import median
+import sys
+import time
+
+from util.metrics_util import MetricsRegistry, OVERHEAD_BUDGET_SECONDS
+
+
+def instrument_request(registry: MetricsRegistry) -> None:
+    registry.observe('http_request_duration_seconds', 0.01, route='/api/x', method='GET', status='200')
+    with registry.timed('auth_phase_duration_seconds', phase='session'):
+        pass
+    for method in ('employee_info', 'get_daily_hours_worked', 'get_timecard_validator'):
+        registry.observe('db_query_duration_seconds', 0.001, method=method)
+    registry.observe('json_serialization_duration_seconds', 0.0001)
+
+
+def measure(iterations: int, runs: int = 5) -> float:
+    """Median seconds per instrumented request over ``runs`` runs of ``iterations`` requests each."""
+    timings = []
+    for _ in range(runs):
+        registry = MetricsRegistry()
+        start = time.perf_counter()
+        for _ in range(iterations):
+            instrument_request(registry)
+        timings.append((time.perf_counter() - start) / iterations)
+    return median(timings)
+
+
+def main(iterations: int) -> int:
+    per_request = measure(iterations)
+    within = per_request < OVERHEAD_BUDGET_SECONDS
+    print(f'instrumentation per request: {per_request * 1e6:.1f}us, {"within" if within else "OVER"} the '
+          f'{OVERHEAD_BUDGET_SECONDS * 1e6:.0f}us budget')
+    return 0 if within else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000))
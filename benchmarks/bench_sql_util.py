@@ -0,0 +1,89 @@
+"""
+Compare SQLUtil's precompiled statements and columnar encoding with the previous per-call f-string SQL and
+dict-per-row results.
+
+    python -m benchmarks.bench_sql_util [rows]
+"""
+from datetime import date, timedelta
+import json
+import sys
+import time
+import tracemalloc
+
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+
+from benchmarks.sqlite_schema import create_schema
+from util import sql_statements as sql
+from util.sql_util import SQLUtil
+
+ADHOC_ENTRIES_BETWEEN = '''
+    SELECT id, timecard_date, hours, location, description, created_ts, modified_ts, created_by, last_modified_by
+    FROM timecard
+    WHERE employee_id = :employee_id
+    AND timecard_date >= :start_date
+    AND timecard_date <= :end_date
+'''
+
+
+def seed(db, rows: int) -> None:
+    create_schema(db.session)
+    start = date(2024, 1, 1)
+    db.session.execute(sql.INSERT_TIMECARD, [{
+        'employee_id': 'bench',
+        'timecard_date': (start + timedelta(days=i % 28)).isoformat(),
+        'hours': 1.5,
+        'location': 'Office',
+        'description': f'Entry number {i}',
+        'created_ts': '2024-01-01 08:00:00',
+        'modified_ts': '2024-01-01 08:00:00',
+        'created_by': 'Bench Mark',
+        'last_modified_by': 'Bench Mark'
+    } for i in range(rows)])
+    db.session.commit()
+
+
+def time_per_call(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def allocated(fn):
+    tracemalloc.start()
+    value = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return value, peak
+
+
+def main(rows: int) -> None:
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db = SQLAlchemy(app)
+    util = SQLUtil(db)
+    # An employee with no rows, so the timing is dominated by statement preparation rather than fetching.
+    params = {'employee_id': 'nobody', 'start_date': '2024-01-01', 'end_date': '2024-01-01'}
+
+    with app.app_context():
+        seed(db, rows)
+        adhoc = time_per_call(lambda: db.session.execute(ADHOC_ENTRIES_BETWEEN, params).fetchall(), 2000)
+        compiled = time_per_call(lambda: db.session.execute(sql.TIMECARD_ENTRIES_BETWEEN, params).fetchall(), 2000)
+        print(f'statement execute (empty result): ad hoc text {adhoc:.1f}us, precompiled {compiled:.1f}us')
+
+        dict_rows, dict_peak = allocated(
+            lambda: util.get_timecard_entries_between('bench', '2024-01-01', '2024-01-31'))
+        columnar, columnar_peak = allocated(
+            lambda: util.get_timecard_entries_between('bench', '2024-01-01', '2024-01-31', columnar=True))
+        dict_bytes = len(json.dumps(dict_rows, default=str))
+        columnar_bytes = len(json.dumps(columnar, default=str))
+        print(f'{len(dict_rows)} rows peak allocation: dict rows {dict_peak / 1024:.0f}KiB, '
+              f'columnar {columnar_peak / 1024:.0f}KiB ({100 * (1 - columnar_peak / dict_peak):.0f}% less)')
+        print(f'{len(dict_rows)} rows JSON payload: dict rows {dict_bytes / 1024:.0f}KiB, '
+              f'columnar {columnar_bytes / 1024:.0f}KiB ({100 * (1 - columnar_bytes / dict_bytes):.0f}% smaller)')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,109 @@
+"""
+Compare gunicorn worker boot time and memory with and without the shipped preload configuration (Linux only).
+
+    python -m benchmarks.boot_profile --workers 4
+
+"import per worker" starts gunicorn with an empty config file (gunicorn would otherwise pick up ./gunicorn.conf.py), so
+every worker imports and builds the app itself.
+"preload" uses gunicorn.conf.py: the master builds the app once and post_fork only re-creates per-process resources.
+Reports the time until the server answers, the CPU each worker spent booting, and per-worker RSS and PSS (PSS splits
+pages shared copy-on-write between the processes sharing them).
+"""
+import argparse
+from os import environ, path
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+from urllib.request import urlopen
+
+from benchmarks.seed import seed
+
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+CLOCK_TICKS = __import__('os').sysconf('SC_CLK_TCK')
+
+
+def free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+def children(pid: int) -> List[int]:
+    with open(f'/proc/{pid}/task/{pid}/children') as children_file:
+        return [int(child) for child in children_file.read().split()]
+
+
+def process_stats(pid: int) -> Dict[str, float]:
+    with open(f'/proc/{pid}/stat') as stat_file:
+        fields = stat_file.read().rsplit(')', 1)[1].split()
+    stats = {'cpu_s': (int(fields[11]) + int(fields[12])) / CLOCK_TICKS}
+    with open(f'/proc/{pid}/smaps_rollup') as smaps:
+        for line in smaps:
+            name, value = line.split(':', 1)
+            if name in ('Rss', 'Pss'):
+                stats[name.lower() + '_mb'] = int(value.split()[0]) / 1024
+    return stats
+
+
+def profile(label: str, args: List[str], workers: int, env: Dict[str, str]) -> dict:
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}', '--workers', str(workers), *args,
+         'benchmarks.boot_wsgi:app'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            try:
+                urlopen(f'http://127.0.0.1:{port}/api/hello', timeout=1).read()
+                break
+            except OSError:
+                if server.poll() is not None or time.perf_counter() - started > 120:
+                    raise RuntimeError(f'{label}: gunicorn did not start')
+                time.sleep(0.01)
+        ready_s = time.perf_counter() - started
+
+        # Let the remaining workers finish booting, then read their counters.
+        time.sleep(2)
+        stats = [process_stats(pid) for pid in children(server.pid)]
+        return {
+            'label': label,
+            'ready_s': ready_s,
+            'worker_cpu_s': sum(stat['cpu_s'] for stat in stats) / len(stats),
+            'worker_rss_mb': sum(stat['rss_mb'] for stat in stats) / len(stats),
+            'worker_pss_mb': sum(stat['pss_mb'] for stat in stats) / len(stats),
+            'total_pss_mb': sum(stat['pss_mb'] for stat in stats) + process_stats(server.pid)['pss_mb']
+        }
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(30)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    database_path = path.join(tempfile.mkdtemp(prefix='dc-boot-profile-'), 'bench.db')
+    seed(database_path, employees=10, days=30, entries_per_day=1)
+    env = dict(environ, BENCH_DB=database_path)
+    empty_config = path.join(path.dirname(database_path), 'empty.conf.py')
+    open(empty_config, 'w').close()
+
+    results = [
+        profile('import per worker', ['--config', empty_config], args.workers, env),
+        profile('preload', ['--config', path.join(ROOT, 'gunicorn.conf.py')], args.workers, env)
+    ]
+    print(f'{"mode":<18} {"ready s":>8} {"worker cpu s":>13} {"worker RSS MB":>14} {"worker PSS MB":>14} '
+          f'{"total PSS MB":>13}')
+    for result in results:
+        print(f'{result["label"]:<18} {result["ready_s"]:>8.2f} {result["worker_cpu_s"]:>13.2f} '
+              f'{result["worker_rss_mb"]:>14.1f} {result["worker_pss_mb"]:>14.1f} {result["total_pss_mb"]:>13.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,12 @@
+# gunicorn entry point used by benchmarks.boot_profile: the real wsgi module against the SQLite stand-in, with the
+# tenant JWKS endpoint replaced by an empty local key set so booting never touches the network.
+from os import environ
+
+from benchmarks.load_test import configure_environment
+from util import auth_util
+from util.jwks_util import JWKSStore, StaticJWKSSource
+
+configure_environment(environ['BENCH_DB'])
+auth_util.jwks_store = JWKSStore(StaticJWKSSource([]))
+
+from wsgi import app  # noqa: E402,F401
@@ -0,0 +1,49 @@
+import base64
+import time
+import uuid
+
+from jose import jwt
+import rsa
+
+from util.jwks_util import StaticJWKSSource
+
+
+def _b64(value: int) -> str:
+    raw = value.to_bytes((value.bit_length() + 7) // 8, 'big')
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+
+class FakeIdentityProvider:
+    """Signs Azure AD shaped access tokens with a local RSA key and serves the matching JWKS."""
+
+    def __init__(self, tenant_id: str, app_id: str, key_size: int = 2048):
+        self.tenant_id = tenant_id
+        self.app_id = app_id
+        self.kid = uuid.uuid4().hex
+        public_key, private_key = rsa.newkeys(key_size)
+        self._private_pem = private_key.save_pkcs1().decode('ascii')
+        self.jwks_source = StaticJWKSSource([{
+            'kty': 'RSA',
+            'kid': self.kid,
+            'use': 'sig',
+            'n': _b64(public_key.n),
+            'e': _b64(public_key.e)
+        }])
+
+    def token(self, oid: str, name: str, groups: list, ttl: int = 3600) -> str:
+        now = int(time.time())
+        claims = {
+            'aud': f'api://{self.app_id}',
+            'iss': f'https://sts.windows.net/{self.tenant_id}/',
+            'iat': now,
+            'nbf': now,
+            'exp': now + ttl,
+            'groups': groups,
+            'ipaddr': '127.0.0.1',
+            'name': name,
+            'oid': oid,
+            'tid': self.tenant_id,
+            'unique_name': f'{name.replace(" ", ".").lower()}@example.com',
+            'upn': f'{name.replace(" ", ".").lower()}@example.com'
+        }
+        return jwt.encode(claims, self._private_pem, algorithm='RS256', headers={'kid': self.kid})
@@ -0,0 +1,263 @@
+"""
+Load test for every HTTP endpoint, run in-process against a seeded SQLite database and a fake identity provider.
+
+    python -m benchmarks.load_test --employees 200 --days 365 --concurrency 8 --requests 400
+
+Each scenario is driven by ``--concurrency`` threads, each with its own logged-in test client, until ``--requests``
+requests have completed. Reports p50/p99 latency and throughput per scenario; ``--output`` also writes the results as
+JSON so runs can be compared against a baseline.
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+import json
+import logging
+from os import environ, path
+import random
+import shutil
+import tempfile
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from benchmarks.fake_idp import FakeIdentityProvider
+from benchmarks.seed import employee_ids, seed
+
+BASE_URL = 'https://localhost'
+TENANT_ID = '00000000-0000-0000-0000-0000000000aa'
+APP_ID = '00000000-0000-0000-0000-0000000000bb'
+ADMIN_GROUP_ID = '00000000-0000-0000-0000-0000000000cc'
+TIMECARD_GROUP_ID = '00000000-0000-0000-0000-0000000000dd'
+
+Request = Tuple[str, str, Optional[object]]
+
+
+class Worker:
+    def __init__(self, client, employee_id: str, rng: random.Random, end: date, days: int):
+        self.client = client
+        self.employee_id = employee_id
+        self.rng = rng
+        self.end = end
+        self.days = days
+        self.timecard_ids: List[int] = []
+
+    def day(self) -> date:
+        return self.end - timedelta(days=self.rng.randrange(self.days))
+
+    def call(self, method: str, url: str, body=None, headers: Dict[str, str] = None):
+        response = self.client.open(url, method=method, json=body, headers=headers, base_url=BASE_URL)
+        response.get_data()
+        return response
+
+
+class Scenario(NamedTuple):
+    name: str
+    admin: bool
+    build: Callable[[Worker], Request]
+    prepare: Optional[Callable[[Worker, int], None]] = None
+
+
+def new_entry(worker: Worker, timecard_date: date = None) -> dict:
+    timecard_date = timecard_date or worker.day()
+    return {
+        'hours': worker.rng.choice((0.5, 1, 2, 4)),
+        'location': 'Office',
+        'description': 'Load test entry',
+        'date': int(datetime(timecard_date.year, timecard_date.month, timecard_date.day).timestamp())
+    }
+
+
+def prepare_existing_ids(worker: Worker, count: int) -> None:
+    """Collect ids of the worker's own timecards, creating them first so deletes never run out."""
+    timecard_date = worker.end + timedelta(days=1)
+    for start in range(0, count, 100):
+        worker.call('PUT', f'/api/employee/{worker.employee_id}/timecard/batch',
+                    [new_entry(worker, timecard_date) for _ in range(min(100, count - start))])
+    response = worker.call('GET', f'/api/employee/{worker.employee_id}/timecard/entries/'
+                                  f'{timecard_date.year}/{timecard_date.month}/{timecard_date.day}')
+    worker.timecard_ids = [entry['id'] for entry in response.get_json()]
+
+
+def month_range(worker: Worker) -> dict:
+    end = worker.day()
+    return {'startDate': (end - timedelta(days=27)).isoformat(), 'endDate': end.isoformat()}
+
+
+def year_to_date(worker: Worker) -> dict:
+    return {'startDate': f'{worker.end.year}-01-01', 'endDate': worker.end.isoformat()}
+
+
+def employee_path(worker: Worker, suffix: str) -> str:
+    return f'/api/employee/{worker.employee_id}{suffix}'
+
+
+SCENARIOS = [
+    Scenario('hello', False, lambda w: ('GET', '/api/hello', None)),
+    Scenario('init-session', False, lambda w: ('GET', '/api/init-session', None)),
+    Scenario('employee list page', True, lambda w: ('GET', '/api/employee/list?limit=100', None)),
+    Scenario('employee list search', True, lambda w: ('GET', '/api/employee/list?limit=50&q=ada', None)),
+    Scenario('employee info', False, lambda w: ('GET', employee_path(w, '/info'), None)),
+    Scenario('timecard hours', False, lambda w: (
+        'GET', employee_path(w, '/timecard/hours/{0.year}/{0.month}'.format(w.day())), None)),
+    Scenario('year hours json', False, lambda w: ('GET', employee_path(w, f'/timecard/hours/{w.end.year}'), None)),
+    Scenario('year hours float32', False, lambda w: (
+        'GET', employee_path(w, f'/timecard/hours/{w.end.year}?format=float32'), None)),
+    Scenario('year hours uint16', False, lambda w: (
+        'GET', employee_path(w, f'/timecard/hours/{w.end.year}?format=uint16'), None)),
+    Scenario('team timecard hours', True, lambda w: (
+        'GET', '/api/employee/timecard/hours/{0.year}/{0.month}'.format(w.day()), None)),
+    Scenario('timecard rollup', False, lambda w: ('POST', employee_path(w, '/timecard/rollup'), year_to_date(w))),
+    Scenario('team timecard rollup', True, lambda w: ('POST', '/api/employee/timecard/rollup', year_to_date(w))),
+    Scenario('timecard entries', False, lambda w: (
+        'GET', employee_path(w, '/timecard/entries/{0.year}/{0.month}/{0.day}'.format(w.day())), None)),
+    Scenario('timecard entries report', False, lambda w: (
+        'POST', employee_path(w, '/timecard/entries/report'), month_range(w))),
+    Scenario('timecard entries report columnar', False, lambda w: (
+        'POST', employee_path(w, '/timecard/entries/report?format=columnar'), month_range(w))),
+    Scenario('timecard report ndjson', True, lambda w: (
+        'POST', '/api/employee/timecard/report', {'startDate': w.end.isoformat(), 'endDate': w.end.isoformat()})),
+    Scenario('timecard create', False, lambda w: ('PUT', employee_path(w, '/timecard'), new_entry(w))),
+    Scenario('timecard update', False, lambda w: ('PUT', employee_path(w, '/timecard'), {
+        'id': w.rng.choice(w.timecard_ids), 'hours': 2, 'location': 'Home', 'description': 'Updated'
+    }), prepare_existing_ids),
+    Scenario('timecard batch', False, lambda w: (
+        'PUT', employee_path(w, '/timecard/batch'), [new_entry(w) for _ in range(10)])),
+    Scenario('timecard delete', False, lambda w: (
+        'DELETE', employee_path(w, f'/timecard/{w.timecard_ids.pop()}'), None), prepare_existing_ids),
+    Scenario('metrics', True, lambda w: ('GET', '/api/metrics', None)),
+]
+
+
+def configure_environment(database_path: str) -> None:
+    # The timeout makes SQLite writers wait for the lock instead of failing under concurrency.
+    environ['DATABASE_URI'] = f'sqlite:///{database_path}?timeout=30'
+    environ.setdefault('DEV', '1')
+    environ.setdefault('SESSION_SECRET', 'load-test')
+    # Each worker hammers one employee's endpoints, which the per-employee budgets would turn into 429s.
+    environ.setdefault('RATE_LIMITS', 'off')
+    environ['TENANT_ID'] = TENANT_ID
+    environ['APP_ID'] = APP_ID
+    environ['ADMIN_GROUP_ID'] = ADMIN_GROUP_ID
+    environ['TIMECARD_GROUP_ID'] = TIMECARD_GROUP_ID
+
+
+def install_identity_provider(idp: FakeIdentityProvider) -> None:
+    from util import auth_util
+    from util.jwks_util import JWKSStore
+
+    # Swap the tenant JWKS endpoint for the fake identity provider before create_app loads the keys.
+    auth_util.jwks_store = JWKSStore(idp.jwks_source)
+    auth_util.jwks_store.add_listener(auth_util.token_cache.clear)
+
+
+def load_app(idp: FakeIdentityProvider):
+    install_identity_provider(idp)
+
+    from app import create_app
+    app = create_app()
+    logging.disable(logging.INFO)
+    return app
+
+
+def login(app, idp: FakeIdentityProvider, employee_id: str, admin: bool):
+    client = app.test_client()
+    token = idp.token(employee_id, 'Ada Lovelace', [ADMIN_GROUP_ID if admin else TIMECARD_GROUP_ID])
+    response = client.get('/api/init-session', headers={'Authorization': f'Bearer {token}'}, base_url=BASE_URL)
+    if response.status_code != 200:
+        raise RuntimeError(f'Login failed with {response.status_code}: {response.get_data(as_text=True)}')
+    return client
+
+
+def percentile(latencies: List[float], fraction: float) -> float:
+    ordered = sorted(latencies)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))] if ordered else 0.0
+
+
+def run_scenario(scenario: Scenario, workers: List[Worker], requests: int) -> dict:
+    per_worker = max(1, requests // len(workers))
+    if scenario.prepare:
+        for worker in workers:
+            scenario.prepare(worker, per_worker)
+
+    def drive(worker: Worker) -> Tuple[List[float], int]:
+        latencies, errors = [], 0
+        for _ in range(per_worker):
+            method, url, body = scenario.build(worker)
+            start = time.perf_counter()
+            response = worker.call(method, url, body)
+            latencies.append(time.perf_counter() - start)
+            errors += response.status_code >= 400
+        return latencies, errors
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(workers)) as executor:
+        results = list(executor.map(drive, workers))
+    elapsed = time.perf_counter() - started
+
+    latencies = [latency for worker_latencies, _ in results for latency in worker_latencies]
+    return {
+        'scenario': scenario.name,
+        'requests': len(latencies),
+        'errors': sum(errors for _, errors in results),
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'throughput_rps': len(latencies) / elapsed if elapsed else 0.0
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', help='SQLite file to use; seeded unless it already exists')
+    parser.add_argument('--employees', type=int, default=100)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--entries-per-day', type=int, default=2)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=400, help='requests per scenario')
+    parser.add_argument('--replica', action='store_true', help='route reads to a copy of the database')
+    parser.add_argument('--scenario', action='append', help='only run scenarios whose name contains this')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+
+    database_path = args.db or path.join(tempfile.mkdtemp(prefix='dc-load-test-'), 'bench.db')
+    end = date.today()
+    if not path.exists(database_path):
+        started = time.perf_counter()
+        rows = seed(database_path, args.employees, args.days, args.entries_per_day, end=end)
+        print(f'Seeded {rows} timecard rows into {database_path} in {time.perf_counter() - started:.1f}s')
+
+    configure_environment(database_path)
+    if args.replica:
+        replica_path = database_path + '.replica'
+        shutil.copyfile(database_path, replica_path)
+        environ['DATABASE_REPLICA_URIS'] = f'sqlite:///{replica_path}?timeout=30'
+    idp = FakeIdentityProvider(TENANT_ID, APP_ID)
+    app = load_app(idp)
+
+    ids = employee_ids(args.employees)
+    rng = random.Random(7)
+    workers = {
+        admin: [
+            Worker(login(app, idp, ids[index % len(ids)], admin), ids[index % len(ids)], random.Random(rng.random()),
+                   end, args.days)
+            for index in range(args.concurrency)
+        ]
+        for admin in (False, True)
+    }
+
+    results = []
+    print(f'{"scenario":<34} {"requests":>8} {"errors":>6} {"p50 ms":>8} {"p99 ms":>8} {"req/s":>8}')
+    for scenario in SCENARIOS:
+        if args.scenario and not any(name in scenario.name for name in args.scenario):
+            continue
+        result = run_scenario(scenario, workers[scenario.admin], args.requests)
+        results.append(result)
+        print(f'{result["scenario"]:<34} {result["requests"]:>8} {result["errors"]:>6} {result["p50_ms"]:>8.2f} '
+              f'{result["p99_ms"]:>8.2f} {result["throughput_rps"]:>8.1f}')
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump({'concurrency': args.concurrency, 'employees': args.employees, 'days': args.days,
+                       'entries_per_day': args.entries_per_day, 'results': results}, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
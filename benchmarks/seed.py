@@ -0,0 +1,83 @@
+"""
+Synthetic data generator for a SQLite stand-in database.
+
+    python -m benchmarks.seed bench.db --employees 1000 --days 730 --entries-per-day 2
+
+1000 employees x 730 days x 2 entries is ~1.5 million timecard rows.
+"""
+import argparse
+from datetime import date, timedelta
+import random
+import sqlite3
+import time
+from typing import List
+
+from benchmarks.sqlite_schema import SCHEMA
+from util import sql_statements as sql
+
+LOCATIONS = ['Office', 'Home', 'Client site', 'Warehouse']
+FIRST_NAMES = ['Ada', 'Alan', 'Grace', 'Edsger', 'Barbara', 'Donald', 'Margaret', 'Ken', 'Frances', 'John']
+LAST_NAMES = ['Lovelace', 'Turing', 'Hopper', 'Dijkstra', 'Liskov', 'Knuth', 'Hamilton', 'Thompson', 'Allen']
+
+
+def employee_ids(employees: int) -> List[str]:
+    return [f'{index:032x}' for index in range(1, employees + 1)]
+
+
+def seed(path: str, employees: int, days: int, entries_per_day: int, end: date = None, chunk_size: int = 50000,
+         random_seed: int = 42) -> int:
+    """Create the schema in ``path`` and fill it. Returns the number of timecard rows written."""
+    rng = random.Random(random_seed)
+    end = end or date.today()
+    start = end - timedelta(days=days - 1)
+    connection = sqlite3.connect(path)
+    try:
+        for statement in SCHEMA:
+            connection.execute(statement)
+        ids = employee_ids(employees)
+        connection.executemany('INSERT OR REPLACE INTO employee VALUES (?, ?, ?, ?)', [
+            (employee_id, rng.choice(FIRST_NAMES), f'{rng.choice(LAST_NAMES)}{index}', f'user{index}@example.com')
+            for index, employee_id in enumerate(ids)
+        ])
+
+        written = 0
+        rows = []
+        for employee_id in ids:
+            for day in range(days):
+                timecard_date = (start + timedelta(days=day)).isoformat()
+                for _ in range(entries_per_day):
+                    rows.append((employee_id, timecard_date, rng.choice((0.5, 1, 2, 2.5, 4, 8)),
+                                 rng.choice(LOCATIONS), 'Synthetic entry', f'{timecard_date} 17:00:00',
+                                 f'{timecard_date} 17:00:00', 'seed', 'seed'))
+                if len(rows) >= chunk_size:
+                    written += _insert_timecards(connection, rows)
+                    rows = []
+        written += _insert_timecards(connection, rows)
+
+        connection.execute(str(sql.CLEAR_DAILY_TOTALS))
+        connection.execute(str(sql.rebuild_daily_totals(sql.HOT_TABLES)))
+        connection.commit()
+        return written
+    finally:
+        connection.close()
+
+
+def _insert_timecards(connection, rows) -> int:
+    connection.executemany('''
+        INSERT INTO timecard (employee_id, timecard_date, hours, location, description, created_ts, modified_ts,
+                              created_by, last_modified_by)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', rows)
+    return len(rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path')
+    parser.add_argument('--employees', type=int, default=100)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--entries-per-day', type=int, default=2)
+    args = parser.parse_args()
+    started = time.perf_counter()
+    count = seed(args.path, args.employees, args.days, args.entries_per_day)
+    print(f'Wrote {count} timecard rows in {time.perf_counter() - started:.1f}s')
@@ -0,0 +1,59 @@
+# SQLite stand-in for the MySQL schema, used by the benchmarks. Keep in step with the tables under sql/.
+SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS employee (
+        id                  VARCHAR(32) PRIMARY KEY,
+        first_name          VARCHAR(255),
+        last_name           VARCHAR(255),
+        user_principal_name VARCHAR(255),
+        refresh_count       INT NOT NULL DEFAULT 0
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS timecard (
+        id               INTEGER PRIMARY KEY AUTOINCREMENT,
+        employee_id      VARCHAR(32) NOT NULL,
+        timecard_date    DATE        NOT NULL,
+        hours            DECIMAL(4, 2),
+        location         VARCHAR(255),
+        description      VARCHAR(255),
+        created_ts       DATETIME,
+        modified_ts      DATETIME,
+        created_by       VARCHAR(255),
+        last_modified_by VARCHAR(255)
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS ix_timecard_employee_date ON timecard (employee_id, timecard_date)',
+    'CREATE INDEX IF NOT EXISTS ix_timecard_date ON timecard (timecard_date)',
+    '''
+    CREATE TABLE IF NOT EXISTS timecard_daily_totals (
+        employee_id   VARCHAR(32)   NOT NULL,
+        timecard_date DATE          NOT NULL,
+        total_hours   DECIMAL(8, 2) NOT NULL DEFAULT 0,
+        entry_count   INT           NOT NULL DEFAULT 0,
+        version       BIGINT        NOT NULL DEFAULT 0,
+        modified_ts   DATETIME      NULL,
+        PRIMARY KEY (employee_id, timecard_date)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS timecard_archive_years (
+        year        INT PRIMARY KEY,
+        archived_ts DATETIME
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS session (
+        id         INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id VARCHAR(255) UNIQUE,
+        data       BLOB,
+        expiry     DATETIME
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS ix_session_expiry ON session (expiry)'
+]
+
+
+def create_schema(connection) -> None:
+    for statement in SCHEMA:
+        connection.execute(statement)
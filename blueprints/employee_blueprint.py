@@ -1,26 +1,45 @@
-from typing import Dict
+from datetime import datetime
+from os import environ
+from typing import Dict, List
 
-from flask import current_app, Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, Response, session, stream_with_context
 from flask_cors import cross_origin
-from werkzeug.exceptions import Forbidden
+from werkzeug.exceptions import BadRequest, Forbidden, NotFound
 
 from app import app_db
-from util.app_util import CROSS_ORIGIN_HEADERS, get_timecard_from_request
-from util.type_util import SessionIdentity, UpdateTimecardEntryRequest
-from util import app_logger, auth_util, validation_util
+from util.app_util import CROSS_ORIGIN_HEADERS, conditional_json, get_timecard_from_request, rows_to_csv, \
+    rows_to_ndjson
+from util.sql_util import format_next_day_as_iso, format_next_month_as_iso, format_year_month_day_as_iso
+from util.type_util import SessionIdentity, TimecardEntry, UpdateTimecardEntryRequest
+from util import app_logger, auth_util, calendar_util, validation_util
+
+TIMECARD_REPORT_COLUMNS = [
+    'employee_id', 'first_name', 'last_name', 'id', 'timecard_date', 'hours', 'location', 'description',
+    'created_ts', 'modified_ts', 'created_by', 'last_modified_by'
+]
+
+PAY_PERIOD_DAYS = int(environ.get('PAY_PERIOD_DAYS', 14))
+PAY_PERIOD_ANCHOR = environ.get('PAY_PERIOD_ANCHOR', '2024-01-01')
 
 employee = Blueprint('employee', __name__)
-logger = app_logger.create_logger('employee', current_app.config['IS_DEV'])
+logger = app_logger.create_logger('employee', 'DEV' in environ)
 requires_auth = auth_util.init_auth('employee')
 
 
 @employee.route('/list', methods=['GET'])
 @cross_origin(headers=CROSS_ORIGIN_HEADERS)
-@requires_auth(admin_required=True, with_session=True)
+@requires_auth(admin_required=True)
 def get_employee_list():
-    logger.info('GET /api/employee/list')
-    employee_list = app_db().employee_list()
-    return jsonify(employee_list)
+    limit, after, query = request.args.get('limit'), request.args.get('after'), request.args.get('q')
+    validation_util.validate_employee_list_query(limit, after, query)
+    logger.info('GET /api/employee/list - limit=%s after=%s q=%s', limit, after, query)
+
+    if limit is None and after is None and query is None:
+        employee_list, _ = app_db().directory.page()
+        return jsonify(employee_list)
+    employee_list, next_after = app_db().directory.page(
+        int(limit or validation_util.MAX_EMPLOYEE_PAGE_SIZE), after, query)
+    return jsonify({'employees': employee_list, 'next': next_after})
 
 
 @employee.route('/<employee_id>/info', methods=['GET'])
@@ -30,23 +49,17 @@ def get_employee_info(identity: SessionIdentity, employee_id: str):
     validation_util.validate_employee_api_request(identity, employee_id)
     logger.info('GET /api/employee/%s/info', employee_id)
 
+    if not auth_util.is_admin(identity):
+        # Employees are provisioned at login; sessions created before that was the case are provisioned here, once.
+        employee = session.get('employee') or auth_util.provision_session_employee(identity)
+        if employee.get('new_employee'):
+            # Reported by the first /info after the employee was created, as when /info created the employee itself.
+            session['employee'] = {key: value for key, value in employee.items() if key != 'new_employee'}
+        return jsonify(employee)
     try:
         return jsonify(app_db().employee_info(employee_id))
-    except TypeError as e:
-        if auth_util.is_admin(identity):
-            return jsonify({})
-        else:
-            logger.info(f"Employee {identity['name']} does not exist. Creating new employee...", exc_info=e)
-            [first_name, last_name] = identity['name'].split(' ')
-            data = {
-                'id': identity['employee_id'],
-                'first_name': first_name,
-                'last_name': last_name,
-                'user_principal_name': identity['user_principal_name'],
-                'new_employee': True
-            }
-            app_db().create_employee(data)
-            return jsonify(data)
+    except TypeError:
+        return jsonify({})
 
 
 @employee.route('/<employee_id>/timecard/hours/<year>/<month>', methods=['GET'])
@@ -57,21 +70,112 @@ def get_timecard_hours(identity: SessionIdentity, employee_id: str, year: str, m
     logger.info('GET /api/employee/%s/timecard/hours/%s/%s', employee_id, year, month)
 
     if auth_util.is_admin(identity) or validation_util.is_current_year(year):
-        return jsonify(app_db().get_daily_hours_worked(employee_id, year, month))
+        validator = app_db().get_timecard_validator(
+            employee_id, format_year_month_day_as_iso(year, month, '1'), format_next_month_as_iso(year, month))
+        return conditional_json(
+            f'hours:{employee_id}:{year}:{month}',
+            validator,
+            lambda: app_db().get_daily_hours_worked(employee_id, year, month, validator)
+        )
     else:
         logger.info('Employee %s does not have permission to view %s-%s-%s', employee_id, year, month)
         return jsonify([])
 
 
+@employee.route('/<employee_id>/timecard/hours/<year>', methods=['GET'])
+@cross_origin(headers=CROSS_ORIGIN_HEADERS)
+@requires_auth(with_session=True)
+def get_year_calendar_hours(identity: SessionIdentity, employee_id: str, year: str):
+    calendar_format = request.args.get('format', 'json')
+    validation_util.validate_employee_api_request(identity, employee_id, year)
+    validation_util.validate_year_calendar_request(year, calendar_format)
+    logger.info('GET /api/employee/%s/timecard/hours/%s - format=%s', employee_id, year, calendar_format)
+
+    if not (auth_util.is_admin(identity) or validation_util.is_current_year(year)):
+        logger.info('Employee %s does not have permission to view %s', employee_id, year)
+        return render_year_calendar(calendar_util.year_hours([], int(year)), calendar_format)
+    validator = app_db().get_timecard_validator(
+        employee_id, format_year_month_day_as_iso(year, '1', '1'), format_next_month_as_iso(year, '12'))
+    return conditional_json(
+        f'year_hours:{employee_id}:{year}:{calendar_format}',
+        validator,
+        lambda: calendar_util.year_hours(app_db().get_year_daily_hours(employee_id, year, validator), int(year)),
+        lambda hours: render_year_calendar(hours, calendar_format)
+    )
+
+
+@employee.route('/timecard/hours/<year>/<month>', methods=['GET'])
+@cross_origin(headers=CROSS_ORIGIN_HEADERS)
+@requires_auth(admin_required=True, rate_limit='report')
+def get_team_timecard_hours(year: str, month: str):
+    employee_ids = request.args.get('ids')
+    validation_util.require_numeric(year)
+    validation_util.require_numeric(month)
+    validation_util.require_date(year, month, '1')
+    if employee_ids is not None:
+        validation_util.validate_employee_ids_query(employee_ids)
+    logger.info('GET /api/employee/timecard/hours/%s/%s - ids=%s', year, month, employee_ids)
+
+    return jsonify(app_db().get_monthly_hours_by_employee(
+        year, month, None if employee_ids is None else employee_ids.split(',')))
+
+
+@employee.route('/<employee_id>/timecard/rollup', methods=['POST'])
+@cross_origin(headers=CROSS_ORIGIN_HEADERS)
+@requires_auth(with_session=True, rate_limit='report')
+def get_timecard_rollup(identity: SessionIdentity, employee_id: str):
+    rollup_request: Dict[str, any] = request.json
+    validation_util.validate_employee_api_request(identity, employee_id)
+    validation_util.validate_rollup_query(rollup_request)
+    logger.info('POST /api/employee/%s/timecard/rollup - %s', employee_id, str(rollup_request))
+
+    if not auth_util.is_admin(identity) and not (
+            validation_util.is_current_year(rollup_request['startDate'][0:4])
+            and validation_util.is_current_year(rollup_request['endDate'][0:4])):
+        raise Forbidden(f'Employee {employee_id} may only view rollups for the current year')
+    return jsonify(app_db().get_hours_rollup(
+        rollup_request['startDate'],
+        rollup_request['endDate'],
+        int(rollup_request.get('payPeriodDays', PAY_PERIOD_DAYS)),
+        rollup_request.get('payPeriodAnchor', PAY_PERIOD_ANCHOR),
+        employee_id
+    ))
+
+
+@employee.route('/timecard/rollup', methods=['POST'])
+@cross_origin(headers=CROSS_ORIGIN_HEADERS)
+@requires_auth(admin_required=True, rate_limit='report')
+def get_team_timecard_rollup():
+    rollup_request: Dict[str, any] = request.json
+    validation_util.validate_rollup_query(rollup_request)
+    logger.info('POST /api/employee/timecard/rollup - %s', str(rollup_request))
+
+    return jsonify(app_db().get_hours_rollup(
+        rollup_request['startDate'],
+        rollup_request['endDate'],
+        int(rollup_request.get('payPeriodDays', PAY_PERIOD_DAYS)),
+        rollup_request.get('payPeriodAnchor', PAY_PERIOD_ANCHOR)
+    ))
+
+
 @employee.route('/<employee_id>/timecard/entries/<year>/<month>/<day>', methods=['GET'])
 @cross_origin(headers=CROSS_ORIGIN_HEADERS)
 @requires_auth(with_session=True)
 def get_timecard_entries(identity: SessionIdentity, employee_id: str, year: str, month: str, day: str):
+    response_format = request.args.get('format', 'rows')
     validation_util.validate_employee_api_request(identity, employee_id, year, month, day)
+    validation_util.validate_response_format(response_format)
     logger.info('GET /api/employee/%s/timecard/entries/%s/%s/%s', employee_id, year, month, day)
 
     if auth_util.is_admin(identity) or validation_util.is_current_year(year):
-        return jsonify(app_db().get_timecard_entries(employee_id, year, month, day))
+        validator = app_db().get_timecard_validator(
+            employee_id, format_year_month_day_as_iso(year, month, day), format_next_day_as_iso(year, month, day))
+        return conditional_json(
+            f'entries:{employee_id}:{year}:{month}:{day}:{response_format}',
+            validator,
+            lambda: app_db().get_timecard_entries(
+                employee_id, year, month, day, response_format == 'columnar', validator)
+        )
     else:
         logger.info('Employee %s does not have permission to view %s-%s-%s', employee_id, year, month, day)
         return jsonify([])
@@ -79,15 +183,36 @@ def get_timecard_entries(identity: SessionIdentity, employee_id: str, year: str,
 
 @employee.route('/<employee_id>/timecard/entries/report', methods=['POST'])
 @cross_origin(headers=CROSS_ORIGIN_HEADERS)
-@requires_auth(with_session=True)
+@requires_auth(with_session=True, rate_limit='report')
 def timecard_entry_report(identity: SessionIdentity, employee_id: str):
     request_dates: Dict[str, str] = request.json
+    response_format = request.args.get('format', 'rows')
     validation_util.validate_employee_api_request(identity, employee_id)
     validation_util.validate_timecard_entry_query(request_dates)
+    validation_util.validate_response_format(response_format)
     logger.info('POST /api/employee/%s/timecard/entries/report - %s', employee_id, str(request_dates))
 
-    return jsonify(
-        app_db().get_timecard_entries_between(employee_id, request_dates['startDate'], request_dates['endDate']))
+    return jsonify(app_db().get_timecard_entries_between(
+        employee_id, request_dates['startDate'], request_dates['endDate'], response_format == 'columnar'))
+
+
+@employee.route('/timecard/report', methods=['POST'])
+@cross_origin(headers=CROSS_ORIGIN_HEADERS)
+@requires_auth(admin_required=True, rate_limit='report')
+def timecard_report():
+    request_dates: Dict[str, str] = request.json
+    report_format = request.args.get('format', 'ndjson')
+    validation_util.validate_timecard_report_query(request_dates, report_format)
+    logger.info('POST /api/employee/timecard/report - %s %s', report_format, str(request_dates))
+
+    rows = app_db().stream_timecard_report(request_dates['startDate'], request_dates['endDate'])
+    if report_format == 'csv':
+        body = rows_to_csv(rows, TIMECARD_REPORT_COLUMNS)
+        mimetype = 'text/csv'
+    else:
+        body = rows_to_ndjson(rows)
+        mimetype = 'application/x-ndjson'
+    return Response(stream_with_context(body), mimetype=mimetype)
 
 
 @employee.route('/<employee_id>/timecard', methods=['PUT'])
@@ -99,19 +224,60 @@ def post_timecard_entry(identity: SessionIdentity, employee_id: str):
     validation_util.validate_timecard_entry_request(timecard)
     logger.info('PUT /api/employee/%s/timecard - %s', employee_id, str(timecard.__dict__))
 
+    timecard.employee_id = employee_id
     if type(timecard) == UpdateTimecardEntryRequest:
-        existing_timecard = app_db().get_timecard_by_id(timecard.id)
-        if auth_util.is_admin(identity) or employee_id == existing_timecard['employee_id']:
-            timecard.date = existing_timecard['timecard_date']
-            timecard.employee_id = employee_id
-            successful = app_db().update_timecard(timecard, identity['name'])
-            logger.info('Error updating timecard, returning 500')
-            return jsonify({}), (204 if successful else 500)
+        if not app_db().update_timecard(timecard, identity['name'], auth_util.is_admin(identity)):
+            raise_timecard_write_failure(employee_id, timecard.id, 'update')
     else:
-        timecard.employee_id = employee_id
+        reject_archived_timecards([timecard])
         app_db().create_timecard(timecard, identity['name'])
-        return jsonify({}), 204
-    raise Forbidden(f'Employee {employee_id} does not have permission to post a new timecard entry')
+    return jsonify({}), 204
+
+
+@employee.route('/<employee_id>/timecard/batch', methods=['PUT'])
+@cross_origin(headers=CROSS_ORIGIN_HEADERS)
+@requires_auth(with_session=True)
+def post_timecard_entries(identity: SessionIdentity, employee_id: str):
+    if not isinstance(request.json, list):
+        raise BadRequest('Timecard batch must be a list of timecard entries')
+    timecards = [get_timecard_from_request(timecard_request) for timecard_request in request.json]
+    validation_util.validate_employee_api_request(identity, employee_id)
+    validation_util.validate_timecard_batch_request(timecards)
+    logger.info('PUT /api/employee/%s/timecard/batch - %d entries', employee_id, len(timecards))
+
+    existing_timecards = app_db().get_timecards_by_ids(
+        [timecard.id for timecard in timecards if type(timecard) == UpdateTimecardEntryRequest])
+    reject_archived_timecard_ids([timecard.id for timecard in timecards
+                                  if type(timecard) == UpdateTimecardEntryRequest
+                                  and int(timecard.id) not in existing_timecards])
+    results: List[Dict[str, any]] = []
+    new_timecards: List[TimecardEntry] = []
+    updated_timecards: List[UpdateTimecardEntryRequest] = []
+    for index, timecard in enumerate(timecards):
+        timecard.employee_id = employee_id
+        if type(timecard) != UpdateTimecardEntryRequest:
+            new_timecards.append(timecard)
+            results.append({'index': index, 'status': 'created'})
+            continue
+        existing_timecard = existing_timecards.get(int(timecard.id))
+        if not existing_timecard:
+            results.append({'index': index, 'id': timecard.id, 'status': 'not_found'})
+        elif auth_util.is_admin(identity) or employee_id == existing_timecard['employee_id']:
+            updated_timecards.append(timecard)
+            results.append({'index': index, 'id': timecard.id, 'status': 'updated'})
+        else:
+            results.append({'index': index, 'id': timecard.id, 'status': 'forbidden'})
+
+    reject_archived_timecards(new_timecards)
+    matched = app_db().save_timecards(new_timecards, updated_timecards, identity['name'], auth_util.is_admin(identity))
+    stale_ids = [int(timecard.id) for timecard, updated in zip(updated_timecards, matched) if not updated]
+    if stale_ids:
+        # Deleted or reassigned between the ownership check above and the owner-checked update.
+        remaining = app_db().get_timecards_by_ids(stale_ids)
+        for result in results:
+            if result['status'] == 'updated' and int(result['id']) in stale_ids:
+                result['status'] = 'forbidden' if int(result['id']) in remaining else 'not_found'
+    return jsonify(results), 200
 
 
 @employee.route('/<employee_id>/timecard/<timecard_id>', methods=['DELETE'])
@@ -119,12 +285,41 @@ def post_timecard_entry(identity: SessionIdentity, employee_id: str):
 @requires_auth(with_session=True)
 def delete_timecard_entry(identity: SessionIdentity, employee_id: str, timecard_id: str):
     validation_util.validate_employee_api_request(identity, employee_id)
+    validation_util.require_numeric(timecard_id)
     logger.info('DELETE /api/employee/%s/timecard/%s', employee_id, timecard_id)
 
-    existing_timecard = app_db().get_timecard_by_id(timecard_id)
-    if auth_util.is_admin(identity) or employee_id == existing_timecard['employee_id']:
-        successful = app_db().delete_timecard(timecard_id)
-        logger.info('Error deleting timecard, returning 500')
-        return jsonify({}), (204 if successful else 500)
-    else:
-        raise Forbidden(f'Employee {employee_id} does not have permission to delete new timecard entry {timecard_id}')
+    if not app_db().delete_timecard(timecard_id, employee_id, auth_util.is_admin(identity)):
+        raise_timecard_write_failure(employee_id, timecard_id, 'delete')
+    return jsonify({}), 204
+
+
+def raise_timecard_write_failure(employee_id: str, timecard_id, action: str) -> None:
+    """An ownership-checked write matched no row: look the timecard up once to tell not found from forbidden."""
+    if int(timecard_id) not in app_db().get_timecards_by_ids([timecard_id]):
+        reject_archived_timecard_ids([timecard_id])
+        raise NotFound(f'Timecard entry {timecard_id} does not exist')
+    raise Forbidden(f'Employee {employee_id} does not have permission to {action} timecard entry {timecard_id}')
+
+
+def reject_archived_timecards(timecards: List[TimecardEntry]) -> None:
+    """Archived years are read-only: new timecards would land in the hot table, which no longer serves that year."""
+    for timecard in timecards:
+        year = datetime.fromtimestamp(int(timecard.date)).year
+        if app_db().archive.is_archived(year):
+            raise BadRequest(f'Timecards for {year} are archived and read-only')
+
+
+def reject_archived_timecard_ids(timecard_ids: list) -> None:
+    """Updates and deletes only reach the hot table, so a timecard moved to an archive table can not be changed."""
+    archived_ids = app_db().get_archived_timecard_ids(timecard_ids)
+    if archived_ids:
+        raise BadRequest(f'Timecard entry {min(archived_ids)} is archived and read-only')
+
+
+def render_year_calendar(hours, calendar_format: str) -> Response:
+    """Daily hours indexed by day of the year (0 is January 1st) as a JSON array, or packed little-endian float32 or
+    uint16 hundredths of an hour."""
+    if calendar_format == 'json':
+        return jsonify(calendar_util.to_json(hours))
+    body = calendar_util.to_float32(hours) if calendar_format == 'float32' else calendar_util.to_uint16(hours)
+    return Response(body, mimetype='application/octet-stream')
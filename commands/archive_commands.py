@@ -0,0 +1,51 @@
+from datetime import date
+import time
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+archive_cli = AppGroup('archive', help='Move closed years of timecards into per-year archive tables.')
+
+
+@archive_cli.command('list')
+def list_years():
+    """Show archived years and whether their move has finished."""
+    years = current_app.config['DC_DB'].archived_years()
+    for year in sorted(years):
+        click.echo(f"{year}: {'archived' if years[year] else 'in progress'}")
+    click.echo(f'{len(years)} archived years')
+
+
+@archive_cli.command('year')
+@click.argument('year', type=int)
+@click.option('--batch-size', default=1000, show_default=True, help='Timecards moved per transaction.')
+@click.option('--pause', default=0.1, show_default=True, help='Seconds to sleep between batches.')
+@click.option('--grace', type=float,
+              help='Seconds to wait after registering the year so every worker sees it; defaults to '
+                   'ARCHIVE_REGISTRY_TTL.')
+def archive_year(year: int, batch_size: int, pause: float, grace: float):
+    """
+    Move YEAR's timecards to timecard_archive_YEAR. Only years before the current one can be archived. Safe to re-run:
+    an interrupted move continues where it stopped.
+    """
+    if year >= date.today().year:
+        raise click.ClickException(f'{year} is not closed; only years before {date.today().year} can be archived')
+    db = current_app.config['DC_DB']
+    if year not in db.archived_years():
+        db.start_archive(year)
+        # Until every worker has reloaded the registry, some still read the year from the hot table alone.
+        grace = db.archive.ttl if grace is None else grace
+        click.echo(f'Registered {year}; waiting {grace:.0f}s for workers to start reading the archive')
+        time.sleep(grace)
+
+    moved, started = 0, time.perf_counter()
+    batch = db.archive_batch(year, batch_size)
+    while batch:
+        moved += batch
+        click.echo(f'Moved {moved} timecards')
+        time.sleep(pause)
+        batch = db.archive_batch(year, batch_size)
+    if not db.finish_archive(year):
+        raise click.ClickException(f'Timecards for {year} were written during the move; re-run to move them')
+    click.echo(f'Archived {year}: moved {moved} timecards in {time.perf_counter() - started:.1f}s')
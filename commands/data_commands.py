@@ -0,0 +1,89 @@
+from functools import partial
+import glob
+import os
+import time
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from util import bulk_util
+
+data_cli = AppGroup('data', help='Bulk export and import of employee and timecard data.')
+
+TABLES = click.Choice(list(bulk_util.EXPORT_FIELDS))
+
+
+class Progress:
+    def __init__(self, label: str):
+        self.label = label
+        self.rows = 0
+        self.started = time.perf_counter()
+
+    def rate(self) -> float:
+        elapsed = time.perf_counter() - self.started
+        return self.rows / elapsed if elapsed else 0.0
+
+    def add(self, rows: int) -> None:
+        self.rows += rows
+        click.echo(f'{self.label} {self.rows} rows ({self.rate():.0f} rows/s)')
+
+    def finish(self) -> None:
+        click.echo(f'{self.label} {self.rows} rows in {time.perf_counter() - self.started:.1f}s '
+                   f'({self.rate():.0f} rows/s)')
+
+
+@data_cli.command('export')
+@click.argument('table', type=TABLES)
+@click.argument('directory', type=click.Path(file_okay=False))
+@click.option('--format', 'file_format', type=click.Choice(bulk_util.EXPORT_FORMATS), default='csv', show_default=True)
+@click.option('--rows-per-file', default=100000, show_default=True, help='Start a new file after this many rows.')
+@click.option('--chunk-size', default=5000, show_default=True, help='Rows fetched from the cursor at a time.')
+def export(table: str, directory: str, file_format: str, rows_per_file: int, chunk_size: int):
+    """Stream a table to numbered CSV or JSONL files in DIRECTORY."""
+    os.makedirs(directory, exist_ok=True)
+    db = current_app.config['DC_DB']
+    rows = db.stream_employees(chunk_size) if table == 'employee' else db.stream_timecards(chunk_size)
+    progress = Progress('Exported')
+
+    def on_file(path: str, file_rows: int):
+        click.echo(f'Wrote {path}')
+        progress.add(file_rows)
+
+    bulk_util.export_rows(rows, table, directory, file_format, rows_per_file, on_file)
+    progress.finish()
+
+
+@data_cli.command('import')
+@click.argument('table', type=TABLES)
+@click.argument('paths', nargs=-1, required=True, type=click.Path(exists=True))
+@click.option('--batch-size', default=5000, show_default=True, help='Rows inserted per transaction.')
+@click.option('--checkpoint', type=click.Path(dir_okay=False),
+              help='Progress file used to resume; defaults to .import-<table>.json in the input directory.')
+@click.option('--skip-invalid', is_flag=True, help='Report and skip invalid records instead of stopping.')
+def import_(table: str, paths, batch_size: int, checkpoint: str, skip_invalid: bool):
+    """
+    Validate and bulk insert exported CSV or JSONL files, or directories of them. Re-running the same command after a
+    failure resumes after the last committed batch. Timecards keep their exported ids, and a timecard whose id already
+    exists is skipped, so a batch repeated after a crash is not imported twice.
+    """
+    files = []
+    for path in paths:
+        files += sorted(glob.glob(os.path.join(path, f'{table}-*.*'))) if os.path.isdir(path) else [path]
+    directory = paths[0] if os.path.isdir(paths[0]) else os.path.dirname(os.path.abspath(paths[0]))
+    checkpoint = bulk_util.ImportCheckpoint(checkpoint or os.path.join(directory, f'.import-{table}.json'))
+    db = current_app.config['DC_DB']
+    to_row, load = (bulk_util.employee_row, db.import_employees) if table == 'employee' else \
+        (partial(bulk_util.timecard_row, is_archived=db.archive.is_archived), db.import_timecards)
+    progress = Progress('Imported')
+
+    for path in files:
+        if checkpoint.done(path):
+            click.echo(f'Resuming {path} after record {checkpoint.done(path)}')
+        try:
+            bulk_util.import_file(
+                path, to_row, load, checkpoint, batch_size, skip_invalid, on_batch=progress.add,
+                on_invalid=lambda number, reason: click.echo(f'Skipped {path} record {number}: {reason}', err=True))
+        except ValueError as e:
+            raise click.ClickException(f'{e}. Fix the record and re-run to resume.')
+    progress.finish()
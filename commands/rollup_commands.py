@@ -0,0 +1,30 @@
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+rollup_cli = AppGroup('rollup', help='Maintain the timecard_daily_totals rollup table.')
+
+
+@rollup_cli.command('rebuild')
+def rebuild():
+    """Recompute timecard_daily_totals from the timecard table."""
+    rows = current_app.config['DC_DB'].rebuild_daily_totals()
+    click.echo(f'Rebuilt {rows} daily total rows')
+
+
+@rollup_cli.command('verify')
+@click.option('--rebuild', 'rebuild_on_drift', is_flag=True, help='Rebuild the rollup if any drift is found.')
+def verify(rebuild_on_drift: bool):
+    """Compare timecard_daily_totals against the timecard table and report drift."""
+    drift = current_app.config['DC_DB'].verify_daily_totals()
+    for row in drift:
+        click.echo(
+            f"{row['employee_id']} {row['timecard_date']}: "
+            f"expected {row['expected_hours']}h/{row['expected_count']} entries, "
+            f"found {row['actual_hours']}h/{row['actual_count']} entries"
+        )
+    click.echo(f'{len(drift)} drifted daily total rows')
+    if drift and rebuild_on_drift:
+        rebuild.callback()
+    elif drift:
+        raise SystemExit(1)
@@ -0,0 +1,32 @@
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from util import session_util
+
+session_cli = AppGroup('session', help='Maintain the server-side session table.')
+
+
+def echo_stats(label: str, stats: dict) -> None:
+    click.echo(f"{label}: {stats['total_rows']} rows, {stats['expired_rows']} expired, "
+               f"session lookup {stats['lookup_ms']:.3f} ms")
+
+
+@session_cli.command('stats')
+def stats():
+    """Report session table row counts and lookup latency."""
+    echo_stats('Sessions', session_util.session_table_stats(current_app.config['DC_DB'].get_db()))
+
+
+@session_cli.command('prune')
+@click.option('--batch-size', default=1000, show_default=True, help='Rows deleted per statement.')
+@click.option('--pause', default=0.1, show_default=True, help='Seconds to sleep between batches.')
+@click.option('--max-batches', type=int, help='Stop after this many batches.')
+def prune(batch_size: int, pause: float, max_batches: int):
+    """Delete expired sessions in bounded batches."""
+    db = current_app.config['DC_DB'].get_db()
+    echo_stats('Before', session_util.session_table_stats(db))
+    deleted = session_util.prune_expired_sessions(
+        db, batch_size, pause, max_batches, on_batch=lambda rows: click.echo(f'Deleted {rows} expired sessions'))
+    click.echo(f'Deleted {deleted} expired sessions in total')
+    echo_stats('After', session_util.session_table_stats(db))
@@ -0,0 +1,35 @@
+import gc
+from os import environ
+import tempfile
+
+wsgi_app = 'wsgi:app'
+bind = environ.get('GUNICORN_BIND', '127.0.0.1:8000')
+workers = int(environ.get('GUNICORN_WORKERS', 4))
+threads = int(environ.get('GUNICORN_THREADS', 1))
+
+# Import the app and its dependencies and fetch the JWKS key set once in the master, so workers share them
+# copy-on-write instead of each repeating the work.
+preload_app = True
+# The worker and thread counts are exported so the app can refuse per-process state that would diverge across workers.
+# Workers write their metrics to METRICS_DIR so a scrape of any one of them reports all of them.
+raw_env = ['DEFER_WORKER_START=1', f'GUNICORN_WORKERS={workers}', f'GUNICORN_THREADS={threads}',
+           f"METRICS_DIR={environ.get('METRICS_DIR') or tempfile.mkdtemp(prefix='dc-metrics-')}"]
+
+
+def when_ready(server):
+    # Move everything allocated so far into the permanent generation; otherwise the first collection in each worker
+    # touches every preloaded object and copies the pages it shares with the master.
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    from app import init_worker
+
+    init_worker(server.app.wsgi())
+
+
+def child_exit(server, worker):
+    from util import metrics_util
+
+    if metrics_util.metrics_directory:
+        metrics_util.metrics_directory.mark_process_dead(worker.pid)
@@ -0,0 +1,3 @@
+-- Bumped by every login that finds the employee's row already there. The provisioning upsert then always changes an
+-- existing row, so its affected-row count alone tells an insert (1) from an update (2) and no SELECT has to run first.
+ALTER TABLE employee ADD COLUMN refresh_count INT NOT NULL DEFAULT 0;
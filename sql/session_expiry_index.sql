@@ -0,0 +1,3 @@
+-- Lets `flask session prune` find expired sessions by walking the index instead of scanning the table.
+-- Schedule the prune from cron, e.g. hourly: flask session prune --batch-size 1000
+CREATE INDEX ix_session_expiry ON session (expiry);
@@ -0,0 +1,6 @@
+-- Years of timecards moved out of the timecard table into timecard_archive_<year> tables by `flask archive year`.
+-- archived_ts is NULL while the move is in progress; reads of the year then span both tables.
+CREATE TABLE timecard_archive_years (
+    year        INT      NOT NULL PRIMARY KEY,
+    archived_ts DATETIME NULL
+);
@@ -0,0 +1,9 @@
+-- Per-employee, per-day rollup of timecard hours maintained by SQLUtil on every timecard write.
+-- Backfill after creating the table with: flask rollup rebuild
+CREATE TABLE timecard_daily_totals (
+    employee_id   VARCHAR(32)   NOT NULL,
+    timecard_date DATE          NOT NULL,
+    total_hours   DECIMAL(8, 2) NOT NULL DEFAULT 0,
+    entry_count   INT           NOT NULL DEFAULT 0,
+    PRIMARY KEY (employee_id, timecard_date)
+);
@@ -0,0 +1,4 @@
+-- Newest modified_ts of the day's timecard writes, deletes included. With entry_count and version it makes up the
+-- conditional GET validator, which then reads only this table and never the timecard tables.
+-- Run after timecard_daily_totals_version.sql; backfill with: flask rollup rebuild
+ALTER TABLE timecard_daily_totals ADD COLUMN modified_ts DATETIME NULL;
@@ -0,0 +1,4 @@
+-- Change counter bumped by every timecard insert, update and delete of the day. Its sum over a date range is part of the
+-- ETag of the hours and entries endpoints, so an edit within the same second as the previous one still changes it.
+-- Run after timecard_daily_totals.sql.
+ALTER TABLE timecard_daily_totals ADD COLUMN version BIGINT NOT NULL DEFAULT 0;
@@ -1,21 +1,159 @@
+import atexit
+from datetime import datetime, timezone
+import json
 import logging
 from os import environ
-from logging.handlers import WatchedFileHandler
+from logging.handlers import QueueHandler, QueueListener, WatchedFileHandler
 from pathlib import PurePath
+from queue import Full, Queue
+import random
+import re
+from threading import Lock
+from typing import Optional
+from uuid import uuid4
+
+from flask import g, has_request_context, request
+
+CORRELATION_ID_HEADER = 'X-Request-ID'
+LOG_QUEUE_SIZE = int(environ.get('LOG_QUEUE_SIZE', 10000))
+LOG_INFO_SAMPLE_RATE = float(environ.get('LOG_INFO_SAMPLE_RATE', 1.0))
+
+_setup_lock = Lock()
+_queue_handler: Optional['DroppingQueueHandler'] = None
+_listener: Optional[QueueListener] = None
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    Hands records to the listener thread without ever blocking the request thread. When the bounded queue is full the
+    record is dropped and counted instead.
+    """
+
+    def __init__(self, log_queue: Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except Full:
+            self.dropped += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Render the message and traceback here, while args and exc_info still refer to live objects, and leave the
+        # final formatting (and the I/O) to the listener thread.
+        record.message = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        return record
+
+
+class CorrelationIdFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.correlation_id = g.get('correlation_id') if has_request_context() else None
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a ``rate`` fraction of INFO and lower records. Warnings, errors and records logged with
+    ``extra={'unsampled': True}`` always pass."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO or self.rate >= 1 or getattr(record, 'unsampled', False):
+            return True
+        return random.random() < self.rate
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'timestamp': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'correlation_id': getattr(record, 'correlation_id', None)
+        }
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+def _configure(is_dev) -> DroppingQueueHandler:
+    global _queue_handler, _listener
+    with _setup_lock:
+        if _queue_handler is None:
+            if is_dev:
+                handler = logging.StreamHandler()
+                handler.setFormatter(
+                    logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - [%(correlation_id)s] %(message)s'))
+            else:
+                handler = WatchedFileHandler(filename=(str(PurePath(r'/var/log/' + environ['DOMAIN'] + '/flask.log'))))
+                handler.setFormatter(JSONFormatter())
+            handler.setLevel(logging.INFO)
+
+            _queue_handler = DroppingQueueHandler(Queue(maxsize=LOG_QUEUE_SIZE))
+            _queue_handler.addFilter(SamplingFilter(LOG_INFO_SAMPLE_RATE))
+            _queue_handler.addFilter(CorrelationIdFilter())
+            _listener = QueueListener(_queue_handler.queue, handler, respect_handler_level=True)
+            _listener.start()
+            atexit.register(stop_logging)
+        return _queue_handler
+
+
+def start_listener() -> None:
+    """
+    Give the queue handler a fresh queue and listener thread. Threads do not survive fork, and the parent's queue may
+    have been locked mid-operation, so each forked worker calls this before logging. A no-op while the listener runs.
+    """
+    global _listener
+    with _setup_lock:
+        if _queue_handler is None or _listener is None:
+            return
+        if _listener._thread is not None and _listener._thread.is_alive():
+            return
+        _queue_handler.queue = Queue(maxsize=LOG_QUEUE_SIZE)
+        _listener = QueueListener(_queue_handler.queue, *_listener.handlers, respect_handler_level=True)
+        _listener.start()
+
+
+def stop_logging() -> None:
+    """Flush queued records and stop the listener thread."""
+    with _setup_lock:
+        if _listener is not None and _listener._thread is not None:
+            _listener.stop()
+
+
+def dropped_records() -> int:
+    return _queue_handler.dropped if _queue_handler else 0
 
 
 # noinspection SpellCheckingInspection
 def create_logger(name, is_dev):
     logger = logging.getLogger(name)
     logger.setLevel(logging.INFO)
-    if is_dev:
-        handler = logging.StreamHandler()
-    else:
-        handler = WatchedFileHandler(filename=(str(PurePath(r'/var/log/' + environ['DOMAIN'] + '/flask.log'))))
-    handler.setLevel(logging.INFO)
+    queue_handler = _configure(is_dev)
+    if queue_handler not in logger.handlers:
+        logger.addHandler(queue_handler)
+    return logger
 
-    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-    handler.setFormatter(formatter)
 
-    logger.addHandler(handler)
-    return logger
+def init_request_logging(app) -> None:
+    """Tag each request's log records with the caller's X-Request-ID, or a new id, and echo it in the response."""
+
+    @app.before_request
+    def set_correlation_id():
+        correlation_id = request.headers.get(CORRELATION_ID_HEADER, '')
+        g.correlation_id = correlation_id if re.search(r'^[\w.-]{1,64}$', correlation_id) else uuid4().hex
+
+    @app.after_request
+    def add_correlation_id_header(response):
+        if 'correlation_id' in g:
+            response.headers[CORRELATION_ID_HEADER] = g.correlation_id
+        return response
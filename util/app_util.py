@@ -1,6 +1,18 @@
+import csv
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from hashlib import sha1
+from io import StringIO
+import json
+from typing import Callable, Iterable, Iterator, List, Optional
+
+from flask import jsonify, request, Response
+
+from util.sql_util import MYSQL_TIME_FORMAT
 from util.type_util import UpdateTimecardEntryRequest, TimecardEntry
 
 CROSS_ORIGIN_HEADERS = ['Content-Type', 'Authorization']
+STREAM_CHUNK_ROWS = 500
 
 
 def get_timecard_from_request(timecard_request):
@@ -8,3 +20,66 @@ def get_timecard_from_request(timecard_request):
         return TimecardEntry(timecard_request)
     else:
         return UpdateTimecardEntryRequest(timecard_request)
+
+
+def to_report_value(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def rows_to_ndjson(rows: Iterable[dict]) -> Iterator[str]:
+    lines: List[str] = []
+    for row in rows:
+        lines.append(json.dumps({key: to_report_value(value) for key, value in row.items()}) + '\n')
+        if len(lines) >= STREAM_CHUNK_ROWS:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
+
+
+def rows_to_csv(rows: Iterable[dict], columns: List[str]) -> Iterator[str]:
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for count, row in enumerate(rows, start=1):
+        writer.writerow([to_report_value(row[column]) for column in columns])
+        if count % STREAM_CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def parse_last_modified(value) -> Optional[datetime]:
+    """modified_ts is written in the server's local time; Last-Modified is sent in UTC."""
+    if not value:
+        return None
+    if isinstance(value, str):
+        value = datetime.strptime(value, MYSQL_TIME_FORMAT)
+    return value.replace(microsecond=0).astimezone(timezone.utc)
+
+
+def conditional_json(scope: str, validator: dict, build_body: Callable[[], any],
+                     render: Callable[[any], Response] = jsonify) -> Response:
+    """
+    ``render`` (jsonify by default) ``build_body()`` with an ETag derived from ``validator`` (entry count, latest
+    modified_ts and daily totals version). If the client's If-None-Match still matches, return 304 without building
+    the body. If-Modified-Since is not evaluated: the newest modified_ts has whole-second resolution and does not move
+    when an entry is deleted, so only the ETag can tell those changes apart.
+    """
+    last_modified = parse_last_modified(validator['last_modified'])
+    etag = sha1(f"{scope}:{validator['entry_count']}:{last_modified}:{validator['version']}".encode('utf-8')) \
+        .hexdigest()
+
+    # Weak comparison, as RFC 7232 asks for If-None-Match: compressed responses carry the ETag as W/"...".
+    not_modified = bool(request.if_none_match) and request.if_none_match.contains_weak(etag)
+    response = Response(status=304) if not_modified else render(build_body())
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
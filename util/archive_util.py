@@ -0,0 +1,55 @@
+from threading import Lock
+import time
+from typing import Callable, Dict, Tuple
+
+from util.sql_statements import HOT_TABLES
+
+
+def archive_table(year: int) -> str:
+    return f'timecard_archive_{int(year)}'
+
+
+class ArchivedYears:
+    """
+    Which years of timecards have been moved out of the hot timecard table, read from timecard_archive_years through
+    ``loader`` (year -> whether the move finished) and re-read after ``ttl`` seconds.
+
+    While a year is being moved each timecard is in exactly one of the two tables, so reads of that year span both;
+    once the move finishes they only touch the archive table.
+    """
+
+    def __init__(self, loader: Callable[[], Dict[int, bool]], ttl: float = 60):
+        self._loader = loader
+        self.ttl = ttl
+        self._lock = Lock()
+        self._loaded_at = 0.0
+        self._years: Dict[int, bool] = {}
+
+    def invalidate(self) -> None:
+        self._loaded_at = 0.0
+
+    def years(self) -> Dict[int, bool]:
+        if time.monotonic() - self._loaded_at >= self.ttl:
+            with self._lock:
+                if time.monotonic() - self._loaded_at >= self.ttl:
+                    self._years = self._loader()
+                    self._loaded_at = time.monotonic()
+        return self._years
+
+    def is_archived(self, year: int) -> bool:
+        return int(year) in self.years()
+
+    def tables_for(self, start_date: str, end_date: str) -> Tuple[str, ...]:
+        """The tables holding timecards dated between two ISO dates: just the hot table unless the range reaches an
+        archived year."""
+        years = self.years()
+        tables = []
+        for year in range(int(start_date[0:4]), int(end_date[0:4]) + 1):
+            if year in years:
+                tables.append(archive_table(year))
+            if not years.get(year) and HOT_TABLES[0] not in tables:
+                tables.append(HOT_TABLES[0])
+        return tuple(tables)
+
+    def all_tables(self) -> Tuple[str, ...]:
+        return tuple(archive_table(year) for year in sorted(self.years())) + HOT_TABLES
@@ -2,14 +2,19 @@ from datetime import datetime
 from os import environ
 
 # noinspection PyProtectedMember
-from flask import current_app, request as req, _request_ctx_stack, session
+from flask import request as req, _request_ctx_stack, session
 from functools import wraps
 from jose import jwt
+from jose.backends.base import Key
 import requests
-from typing import Dict
+from typing import Callable, Optional
 from werkzeug.exceptions import Forbidden, HTTPException, Unauthorized
 
 from util.app_logger import create_logger
+from util.jwks_util import JWKSStore
+from util.metrics_util import metrics
+from util import rate_limit_util
+from util.token_cache_util import VerifiedTokenCache
 from util.type_util import SessionIdentity, JWTClaims
 
 
@@ -29,52 +34,78 @@ def get_token_auth_header():
     return parts[1]
 
 
+def employee_from_identity(identity: SessionIdentity) -> dict:
+    # The first word is the first name and the rest, possibly empty, the last name.
+    first_name, _, last_name = identity['name'].strip().partition(' ')
+    return {
+        'id': identity['employee_id'],
+        'first_name': first_name,
+        'last_name': last_name.strip(),
+        'user_principal_name': identity['user_principal_name']
+    }
+
+
+def provision_session_employee(identity: SessionIdentity) -> dict:
+    """Upsert the signed-in employee's row and keep it in the session, where /info reads it from."""
+    session['employee'] = employee_provisioner(employee_from_identity(identity))
+    return session['employee']
+
+
 def set_session(claims: JWTClaims) -> SessionIdentity:
+    app_groups = (environ['ADMIN_GROUP_ID'], environ['TIMECARD_GROUP_ID'])
     session['identity'] = {
         'employee_id': claims['oid'].replace('-', ''),
         'exp': claims['exp'],
+        'groups': [group for group in claims.get('groups', []) if group in app_groups],
         'is_admin': 'groups' in claims and environ['ADMIN_GROUP_ID'] in claims['groups'],
         'name': claims['name'],
-        'payload': claims,
+        'tenant_id': claims['tid'],
         'user_principal_name': claims['unique_name']
     }
+    session.pop('employee', None)
     return session['identity']
 
 
 def init_auth(name):
-    logger = create_logger(name + '-auth_util', current_app.config['IS_DEV'])
+    logger = create_logger(name + '-auth_util', 'DEV' in environ)
+    jwks_store.logger = jwks_store.logger or logger
+
+    def requires_auth(admin_required=False, with_session=False, rate_limit=None):
+        """
+        ``rate_limit`` names the employee's budget the request draws from: read, write or report. It defaults to read
+        for GET and write for every other method.
+        """
 
-    def requires_auth(admin_required=False, with_session=False):
         def decorator(f):
             @wraps(f)
             def decorated(*args, **kwargs):
                 identity: SessionIdentity = session.get('identity', {})
                 if is_active_session(identity):
                     validate_permissions(admin_required, identity)
-                    _request_ctx_stack.top.current_user = identity['payload']
-                    if with_session:
-                        return f(identity, *args, **kwargs)
-                    else:
-                        return f(*args, **kwargs)
+                    _request_ctx_stack.top.current_user = identity
+                else:
+                    token = get_token_auth_header()
+                    payload = decode_token(token, logger)
 
-                token = get_token_auth_header()
-                rsa_key = build_rsa_key(token)
-                if rsa_key:
-                    payload = decode_token(rsa_key, token, logger)
-
-                    updated_identity: SessionIdentity = set_session(payload)
+                    identity = set_session(payload)
                     logger.info(
-                        f"{updated_identity['name']} with employee_id {updated_identity['employee_id']} logged in from IP address {updated_identity['payload']['ipaddr']}"
+                        f"{identity['name']} with employee_id {identity['employee_id']} logged in from IP address {payload.get('ipaddr')}",
+                        extra={'unsampled': True}
                     )
-                    validate_permissions(admin_required, updated_identity)
-
+                    validate_permissions(admin_required, identity)
+                    # Provisioned only once the tenant and groups check out. Administrators are not employees.
+                    if employee_provisioner is not None and not is_admin(identity):
+                        provision_session_employee(identity)
                     _request_ctx_stack.top.current_user = payload
+
+                if rate_limiter is not None:
+                    kind = rate_limit or (rate_limit_util.READ if req.method == 'GET' else rate_limit_util.WRITE)
+                    rate_limiter.admit(identity['employee_id'], kind)
+                with concurrency_limiter.admit():
                     if with_session:
-                        return f(updated_identity, *args, **kwargs)
+                        return f(identity, *args, **kwargs)
                     else:
                         return f(*args, **kwargs)
-                logger.exception('unable to find appropriate key')
-                raise Unauthorized()
 
             return decorated
 
@@ -84,9 +115,8 @@ def init_auth(name):
 
 
 def validate_permissions(admin_required: bool, identity: SessionIdentity) -> None:
-    payload = identity['payload']
-    groups = payload['groups']
-    tenant_id = payload['tid']
+    groups = identity['groups']
+    tenant_id = identity['tenant_id']
     if environ['TENANT_ID'] != tenant_id:
         raise Unauthorized('Not a member of this tenant. Tenant ID: ' + tenant_id)
     elif admin_required and environ['ADMIN_GROUP_ID'] not in groups:
@@ -100,34 +130,35 @@ def is_active_session(identity: SessionIdentity) -> bool:
             'user_principal_name' in identity
             and 'employee_id' in identity
             and 'exp' in identity
-            and 'payload' in identity
+            and 'tenant_id' in identity
             and datetime.fromtimestamp(identity['exp']) > datetime.now()
     )
 
 
-def build_rsa_key(token: str) -> Dict[str, any]:
-    unverified_header = jwt.get_unverified_header(token)
-    for key in jwks['keys']:
-        if key['kid'] == unverified_header['kid']:
-            return {
-                'kty': key['kty'],
-                'kid': key['kid'],
-                'use': key['use'],
-                'n': key['n'],
-                'e': key['e']
-            }
-    return {}
+def build_rsa_key(token: str) -> Optional[Key]:
+    with metrics.timed('auth_phase_duration_seconds', phase='jwks'):
+        unverified_header = jwt.get_unverified_header(token)
+        return jwks_store.get(unverified_header.get('kid', ''))
 
 
-def decode_token(rsa_key: Dict[str, any], token: str, logger):
+def decode_token(token: str, logger) -> JWTClaims:
+    claims = token_cache.get(token)
+    if claims is not None:
+        return claims
+
+    rsa_key = build_rsa_key(token)
+    if rsa_key is None:
+        logger.error('unable to find appropriate key')
+        raise Unauthorized()
     try:
-        return jwt.decode(
-            token=token,
-            key=rsa_key,
-            algorithms=['RS256'],
-            audience=f'api://{environ["APP_ID"]}',
-            issuer=f'https://sts.windows.net/{environ["TENANT_ID"]}/'
-        )
+        with metrics.timed('auth_phase_duration_seconds', phase='jwt_decode'):
+            claims = jwt.decode(
+                token=token,
+                key=rsa_key,
+                algorithms=['RS256'],
+                audience=f'api://{environ["APP_ID"]}',
+                issuer=f'https://sts.windows.net/{environ["TENANT_ID"]}/'
+            )
     except jwt.ExpiredSignatureError as e:
         logger.error('token is expired', exc_info=e)
         raise Unauthorized()
@@ -137,6 +168,8 @@ def decode_token(rsa_key: Dict[str, any], token: str, logger):
     except Exception as e:
         logger.error('Uncaught exception in util.auth_util.decode_token', exc_info=e)
         raise Unauthorized()
+    token_cache.put(token, claims)
+    return claims
 
 
 def execute_request(url, headers=None):
@@ -149,5 +182,15 @@ def execute_request(url, headers=None):
         raise HTTPException(f'unable to call {url}. Status code: {str(status_code)}')
 
 
-jwks = execute_request(f'https://login.microsoftonline.com/{environ["TENANT_ID"]}/discovery/v2.0/keys?appid={environ["APP_ID"]}')
-# noinspection SpellCheckingInspection
+def fetch_tenant_jwks():
+    return execute_request(
+        f'https://login.microsoftonline.com/{environ["TENANT_ID"]}/discovery/v2.0/keys?appid={environ["APP_ID"]}')
+
+
+jwks_store = JWKSStore(fetch_tenant_jwks, ttl=float(environ.get('JWKS_TTL_SECONDS', 3600)))
+token_cache = VerifiedTokenCache(max_size=int(environ.get('TOKEN_CACHE_SIZE', 1024)))
+jwks_store.add_listener(token_cache.clear)
+# Set by create_app to SQLUtil.provision_employee.
+employee_provisioner: Optional[Callable[[dict], dict]] = None
+rate_limiter = rate_limit_util.init_rate_limiter()
+concurrency_limiter = rate_limit_util.init_concurrency_limiter()
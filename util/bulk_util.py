@@ -0,0 +1,193 @@
+import csv
+from datetime import date, datetime
+from decimal import Decimal
+import json
+import os
+from typing import Callable, Dict, Iterable, Iterator, List
+
+from werkzeug.exceptions import BadRequest
+
+from util import validation_util
+from util.sql_util import MYSQL_DATE_FORMAT, MYSQL_TIME_FORMAT
+from util.type_util import TimecardEntry
+
+IMPORTED_BY = 'import'
+EXPORT_FORMATS = ('csv', 'jsonl')
+EXPORT_FIELDS = {
+    'employee': ['id', 'first_name', 'last_name', 'user_principal_name'],
+    'timecard': ['id', 'employee_id', 'timecard_date', 'hours', 'location', 'description', 'created_ts',
+                 'modified_ts', 'created_by', 'last_modified_by']
+}
+# Exported as dates even when the column is a MySQL DATETIME, as the import validates them in ISO date format.
+DATE_FIELDS = ('timecard_date',)
+
+
+def to_text(value, date_only: bool = False):
+    if isinstance(value, datetime):
+        return value.strftime(MYSQL_DATE_FORMAT if date_only else MYSQL_TIME_FORMAT)
+    if isinstance(value, date):
+        return value.strftime(MYSQL_DATE_FORMAT)
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def export_rows(rows: Iterable[dict], table: str, directory: str, file_format: str = 'csv',
+                rows_per_file: int = 100000, on_file: Callable[[str, int], None] = None) -> int:
+    """
+    Write ``rows`` to ``<table>-00001.<format>``, ``<table>-00002.<format>``, ... in ``directory``, starting a new file
+    every ``rows_per_file`` rows. Only one row is held at a time. Returns the number of rows written.
+    """
+    fields = EXPORT_FIELDS[table]
+    written, in_file, output, writer, path = 0, 0, None, None, None
+    try:
+        for row in rows:
+            if output is None:
+                path = os.path.join(directory, f'{table}-{written // rows_per_file + 1:05d}.{file_format}')
+                output = open(path, 'w', newline='', encoding='utf-8')
+                if file_format == 'csv':
+                    writer = csv.DictWriter(output, fields, extrasaction='ignore')
+                    writer.writeheader()
+            values = {field: to_text(row[field], field in DATE_FIELDS) for field in fields}
+            if file_format == 'csv':
+                writer.writerow(values)
+            else:
+                output.write(json.dumps(values) + '\n')
+            written += 1
+            in_file += 1
+            if in_file == rows_per_file:
+                output.close()
+                output, in_file = None, 0
+                if on_file:
+                    on_file(path, rows_per_file)
+    finally:
+        if output:
+            output.close()
+    if in_file and on_file:
+        on_file(path, in_file)
+    return written
+
+
+def read_rows(path: str) -> Iterator[dict]:
+    """Stream the records of a .csv or .jsonl export file."""
+    with open(path, newline='', encoding='utf-8') as source:
+        if path.endswith('.jsonl'):
+            for line in source:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(source)
+
+
+def optional_text(record: dict, field: str):
+    # CSV has no NULL; an empty column is read back as one.
+    return record.get(field) or None
+
+
+def employee_row(record: dict) -> dict:
+    validation_util.require_alphanumeric(str(record.get('id') or ''))
+    return {field: optional_text(record, field) for field in EXPORT_FIELDS['employee']}
+
+
+def timecard_row(record: dict, is_archived: Callable[[int], bool] = None) -> dict:
+    """
+    Validate an exported timecard record by the API's rules and return it as a row for SQLUtil.import_timecards. As
+    with the API, a timecard of a year ``is_archived`` reports as archived is rejected: it would land in the hot table,
+    which no longer serves that year.
+    """
+    validation_util.require_alphanumeric(str(record.get('employee_id') or ''))
+    validation_util.require_iso_format(str(record.get('timecard_date') or ''))
+    try:
+        timecard_date = datetime.strptime(record['timecard_date'], MYSQL_DATE_FORMAT)
+        for field in ('created_ts', 'modified_ts'):
+            if record.get(field):
+                datetime.strptime(record[field], MYSQL_TIME_FORMAT)
+    except ValueError as e:
+        raise BadRequest(str(e))
+    if is_archived and is_archived(timecard_date.year):
+        raise BadRequest(f'Timecards for {timecard_date.year} are archived and read-only')
+    timecard = TimecardEntry({
+        'hours': record.get('hours'),
+        'location': optional_text(record, 'location'),
+        'description': optional_text(record, 'description'),
+        'date': int(timecard_date.timestamp())
+    })
+    validation_util.validate_timecard_entry_request(timecard)
+
+    if record.get('id'):
+        validation_util.require_numeric(str(record['id']))
+    created_ts = record.get('created_ts') or datetime.now().strftime(MYSQL_TIME_FORMAT)
+    return {
+        'id': int(record['id']) if record.get('id') else None,
+        'employee_id': record['employee_id'],
+        'timecard_date': record['timecard_date'],
+        'hours': float(timecard.hours),
+        'location': timecard.location,
+        'description': timecard.description,
+        'created_ts': created_ts,
+        'modified_ts': record.get('modified_ts') or created_ts,
+        'created_by': optional_text(record, 'created_by') or IMPORTED_BY,
+        'last_modified_by': optional_text(record, 'last_modified_by') or IMPORTED_BY
+    }
+
+
+class ImportCheckpoint:
+    """
+    Number of records of each input file already committed, kept in a JSON file so a failed import resumes after the
+    last committed batch. The checkpoint is written right after each commit, so a crash between the two repeats at most
+    that one batch, whose timecards SQLUtil.import_timecards recognises by id and skips.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._done: Dict[str, int] = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as source:
+                self._done = json.load(source)
+
+    def done(self, source: str) -> int:
+        return self._done.get(os.path.abspath(source), 0)
+
+    def save(self, source: str, records: int) -> None:
+        self._done[os.path.abspath(source)] = records
+        with open(self.path + '.tmp', 'w', encoding='utf-8') as output:
+            json.dump(self._done, output)
+        os.replace(self.path + '.tmp', self.path)
+
+
+def import_file(path: str, to_row: Callable[[dict], dict], load: Callable[[List[dict]], None],
+                checkpoint: ImportCheckpoint, batch_size: int = 5000, skip_invalid: bool = False,
+                on_batch: Callable[[int], None] = None, on_invalid: Callable[[int, str], None] = None) -> int:
+    """
+    Validate the records of one export file with ``to_row`` and pass them to ``load`` in batches of ``batch_size``,
+    skipping records a previous run already committed. An invalid record aborts the import with a ValueError naming
+    its line, or with ``skip_invalid`` is reported to ``on_invalid`` and left out. Returns the number of rows loaded.
+    """
+    skip = checkpoint.done(path)
+    loaded, batch, number = 0, [], 0
+    for number, record in enumerate(read_rows(path), 1):
+        if number <= skip:
+            continue
+        try:
+            batch.append(to_row(record))
+        except BadRequest as e:
+            if not skip_invalid:
+                raise ValueError(f'{path} record {number}: {e.description}')
+            if on_invalid:
+                on_invalid(number, e.description)
+        if len(batch) >= batch_size:
+            loaded += _load_batch(path, number, batch, load, checkpoint, on_batch)
+            batch = []
+    if batch or number > checkpoint.done(path):
+        loaded += _load_batch(path, number, batch, load, checkpoint, on_batch)
+    return loaded
+
+
+def _load_batch(path: str, number: int, batch: List[dict], load: Callable[[List[dict]], None],
+                checkpoint: ImportCheckpoint, on_batch: Callable[[int], None]) -> int:
+    if batch:
+        load(batch)
+    checkpoint.save(path, number)
+    if on_batch:
+        on_batch(len(batch))
+    return len(batch)
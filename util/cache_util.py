@@ -0,0 +1,310 @@
+from collections import OrderedDict
+from datetime import date, datetime
+import pickle
+from threading import Lock
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from util.replica_util import ReplicaRouter
+from util.sql_util import SQLUtil
+from util.type_util import TimecardEntry, UpdateTimecardEntryRequest
+
+
+class InProcessCacheBackend:
+    """Bounded LRU with per-entry TTL, local to one worker process."""
+
+    def __init__(self, max_size: int = 10000):
+        self._max_size = max_size
+        self._entries: 'OrderedDict[str, Tuple[float, Any]]' = OrderedDict()
+        self._counters: Dict[str, int] = {}
+        self._lock = Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at and expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: float = 0) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl if ttl else 0, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def counter(self, key: str) -> int:
+        return self._counters.get(key, 0)
+
+    def incr(self, key: str) -> int:
+        # Counters are kept outside the LRU: evicting one would reset it and resurrect stale entries.
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SharedCacheBackend:
+    """Backend for a cache shared by all workers. ``client`` follows the redis-py get/set/delete/incr API."""
+
+    def __init__(self, client, key_prefix: str = 'dc:'):
+        self._client = client
+        self._key_prefix = key_prefix
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self._client.get(self._key_prefix + key)
+        return None if value is None else pickle.loads(value)
+
+    def set(self, key: str, value: Any, ttl: float = 0) -> None:
+        self._client.set(self._key_prefix + key, pickle.dumps(value), ex=int(ttl) or None)
+
+    def delete(self, key: str) -> None:
+        self._client.delete(self._key_prefix + key)
+
+    def counter(self, key: str) -> int:
+        return int(self._client.get(self._key_prefix + key) or 0)
+
+    def incr(self, key: str) -> int:
+        return int(self._client.incr(self._key_prefix + key))
+
+
+class LocalSharedCacheClient:
+    """In-memory stand-in for a redis client, used to exercise SharedCacheBackend without a server."""
+
+    def __init__(self):
+        self._values: Dict[str, Tuple[float, bytes]] = {}
+        self._lock = Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None or (entry[0] and entry[0] <= time.monotonic()):
+                self._values.pop(key, None)
+                return None
+            return entry[1]
+
+    def set(self, key: str, value: bytes, ex: int = None) -> bool:
+        with self._lock:
+            self._values[key] = (time.monotonic() + ex if ex else 0, value)
+        return True
+
+    def delete(self, key: str) -> int:
+        with self._lock:
+            return 1 if self._values.pop(key, None) else 0
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            _, value = self._values.get(key, (0, b'0'))
+            value = int(value) + 1
+            self._values[key] = (0, str(value).encode('ascii'))
+            return value
+
+
+def months_between(start_date: str, end_date: str) -> List[str]:
+    year, month = int(start_date[0:4]), int(start_date[5:7])
+    end_year, end_month = int(end_date[0:4]), int(end_date[5:7])
+    months = []
+    while (year, month) <= (end_year, end_month):
+        months.append(f'{year}-{month:02d}')
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def to_iso_date(value) -> Optional[str]:
+    if isinstance(value, (date, datetime)):
+        return value.strftime('%Y-%m-%d')
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value).strftime('%Y-%m-%d')
+    return str(value)[0:10] if value else None
+
+
+def validator_key(validator: Optional[dict]) -> Optional[tuple]:
+    """
+    Part of a cache key that ties a result to the timecard validator read from the database for the same request.
+    Generation counters miss a write in another worker until it reaches this worker's backend; the validator does not,
+    so a conditional response never pairs a fresh ETag with a cached body from before the write.
+    """
+    if validator is None:
+        return None
+    return validator['entry_count'], str(validator['last_modified']), validator['version']
+
+
+class QueryCache:
+    """
+    Read-through cache of per-employee query results.
+
+    Every key embeds a generation counter for each (employee, month) it covers plus one for the employee as a whole.
+    A write bumps the counters for the months it touched, so stale entries become unreachable and age out through
+    LRU/TTL eviction. Counters live in the backend, which makes invalidation work across workers with a shared backend.
+    """
+
+    def __init__(self, backend, ttl: float = 30):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_load(self, name: str, employee_id: str, months: List[str], args: tuple, loader: Callable[[], Any]):
+        generations = [self._generation(employee_id, 'all')] + [self._generation(employee_id, m) for m in months]
+        key = f'q:{name}:{employee_id}:{args}:{generations}'
+        value = self.backend.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = loader()
+        self.backend.set(key, value, self.ttl)
+        return value
+
+    def invalidate(self, employee_id: str, start_date: str = None, end_date: str = None) -> None:
+        if not start_date:
+            self.backend.incr(f'gen:{employee_id}:all')
+            return
+        for month in months_between(start_date, end_date or start_date):
+            self.backend.incr(f'gen:{employee_id}:{month}')
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+    def _generation(self, employee_id: str, bucket: str) -> int:
+        return self.backend.counter(f'gen:{employee_id}:{bucket}')
+
+
+class CachedSQLUtil(SQLUtil):
+    """SQLUtil whose per-employee reads go through a QueryCache and whose writes invalidate it after committing."""
+
+    def __init__(self, db, query_cache: QueryCache, replicas: ReplicaRouter = None):
+        super().__init__(db, replicas)
+        self.query_cache = query_cache
+        self._timecard_owners = InProcessCacheBackend(max_size=10000)
+
+    def employee_info(self, employee_id) -> dict:
+        return self.query_cache.get_or_load(
+            'employee_info', employee_id, [], (), lambda: super(CachedSQLUtil, self).employee_info(employee_id))
+
+    def create_employee(self, employee_data: dict) -> None:
+        super().create_employee(employee_data)
+        self.query_cache.invalidate(employee_data['id'])
+
+    def provision_employee(self, employee_data: dict) -> dict:
+        employee = super().provision_employee(employee_data)
+        self.query_cache.invalidate(employee_data['id'])
+        return employee
+
+    def import_employees(self, employees: List[dict]) -> None:
+        super().import_employees(employees)
+        for employee in employees:
+            self.query_cache.invalidate(employee['id'])
+
+    def get_daily_hours_worked(self, employee_id: str, year: str, month: str, validator: dict = None) -> List[dict]:
+        return self.query_cache.get_or_load(
+            'daily_hours', employee_id, [f'{int(year)}-{int(month):02d}'], (year, month, validator_key(validator)),
+            lambda: super(CachedSQLUtil, self).get_daily_hours_worked(employee_id, year, month))
+
+    def get_year_daily_hours(self, employee_id: str, year: str, validator: dict = None) -> List[dict]:
+        return self.query_cache.get_or_load(
+            'year_hours', employee_id, [f'{int(year)}-{month:02d}' for month in range(1, 13)],
+            (year, validator_key(validator)),
+            lambda: super(CachedSQLUtil, self).get_year_daily_hours(employee_id, year))
+
+    def get_timecard_entries_between(self, employee_id: str, start_date: str, end_date: str,
+                                     columnar: bool = False, validator: dict = None) -> Union[List[dict], dict]:
+        return self.query_cache.get_or_load(
+            'entries', employee_id, months_between(start_date, end_date),
+            (start_date, end_date, columnar, validator_key(validator)),
+            lambda: self._remember_owners(employee_id, super(CachedSQLUtil, self).get_timecard_entries_between(
+                employee_id, start_date, end_date, columnar)))
+
+    def get_timecard_by_id(self, timecard_id) -> dict:
+        timecard = super().get_timecard_by_id(timecard_id)
+        self._timecard_owners.set(str(timecard_id), timecard)
+        return timecard
+
+    def get_timecards_by_ids(self, timecard_ids: List[int]) -> Dict[int, dict]:
+        timecards = super().get_timecards_by_ids(timecard_ids)
+        for timecard_id, timecard in timecards.items():
+            self._timecard_owners.set(str(timecard_id), timecard)
+        return timecards
+
+    def create_timecard(self, timecard: TimecardEntry, name: str) -> None:
+        super().create_timecard(timecard, name)
+        self._invalidate_timecards([timecard])
+
+    def import_timecards(self, rows: List[dict]) -> None:
+        super().import_timecards(rows)
+        dates_by_employee: Dict[str, List[str]] = {}
+        for row in rows:
+            dates_by_employee.setdefault(row['employee_id'], []).append(row['timecard_date'])
+        for employee_id, dates in dates_by_employee.items():
+            self.query_cache.invalidate(employee_id, min(dates), max(dates))
+
+    def update_timecard(self, timecard: UpdateTimecardEntryRequest, name: str, is_admin: bool = False) -> bool:
+        if is_admin:
+            self._lookup_owner(timecard.id)
+        updated = super().update_timecard(timecard, name, is_admin)
+        if updated:
+            self._invalidate_timecards([timecard])
+        return updated
+
+    def save_timecards(self, new_timecards: List[TimecardEntry], updated_timecards: List[UpdateTimecardEntryRequest],
+                       name: str, is_admin: bool = False) -> List[bool]:
+        updated = super().save_timecards(new_timecards, updated_timecards, name, is_admin)
+        self._invalidate_timecards(new_timecards + updated_timecards)
+        return updated
+
+    def delete_timecard(self, timecard_id, employee_id: str, is_admin: bool = False) -> bool:
+        if is_admin:
+            self._lookup_owner(timecard_id)
+        deleted = super().delete_timecard(timecard_id, employee_id, is_admin)
+        if deleted:
+            self._invalidate_timecard_id(timecard_id, employee_id)
+            self._timecard_owners.delete(str(timecard_id))
+        return deleted
+
+    def _invalidate_timecards(self, timecards: List[TimecardEntry]) -> None:
+        for timecard in timecards:
+            if type(timecard) == UpdateTimecardEntryRequest:
+                self._invalidate_timecard_id(timecard.id, timecard.employee_id)
+            else:
+                self.query_cache.invalidate(timecard.employee_id, to_iso_date(timecard.date))
+
+    def _lookup_owner(self, timecard_id) -> None:
+        # An admin may edit a timecard that belongs to someone other than employee_id, so the owner has to be known to
+        # invalidate the right employee. Non-admin writes are restricted to employee_id's own timecards.
+        if not self._timecard_owners.get(str(timecard_id)):
+            self.get_timecards_by_ids([timecard_id])
+
+    def _invalidate_timecard_id(self, timecard_id, employee_id: str) -> None:
+        # Owners are remembered from the entries and id lookups this worker served. Rather than spend a query on an
+        # unknown one, every cached result for the employee is dropped.
+        owner = self._timecard_owners.get(str(timecard_id))
+        if owner:
+            self.query_cache.invalidate(owner['employee_id'], to_iso_date(owner['timecard_date']))
+        else:
+            self.query_cache.invalidate(employee_id)
+
+    def _remember_owners(self, employee_id: str, entries: Union[List[dict], dict]) -> Union[List[dict], dict]:
+        if isinstance(entries, dict):
+            id_index, date_index = entries['columns'].index('id'), entries['columns'].index('timecard_date')
+            entries_by_id = ((row[id_index], row[date_index]) for row in entries['rows'])
+        else:
+            entries_by_id = ((entry['id'], entry['timecard_date']) for entry in entries)
+        for timecard_id, timecard_date in entries_by_id:
+            self._timecard_owners.set(str(timecard_id), {'employee_id': employee_id, 'timecard_date': timecard_date})
+        return entries
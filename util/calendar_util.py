@@ -0,0 +1,55 @@
+from array import array
+from datetime import date
+import sys
+from typing import Iterable, List
+
+CALENDAR_FORMATS = ('json', 'float32', 'uint16')
+# uint16 carries hundredths of an hour, so a day holds at most 655.35 hours.
+UINT16_SCALE = 100
+UINT16_MAX = 0xFFFF
+
+
+def days_in_year(year: int) -> int:
+    return (date(year + 1, 1, 1) - date(year, 1, 1)).days
+
+
+def day_of_year(value) -> int:
+    """Zero-based day of the year of a date, or of an ISO date string as returned by SQLite."""
+    if isinstance(value, str):
+        value = date.fromisoformat(value[0:10])
+    return value.timetuple().tm_yday - 1
+
+
+def year_hours(rows: Iterable[dict], year: int) -> array:
+    """
+    Dense float32 array of daily hour totals indexed by day of the year, from ``timecard_date``/``total_hours`` rows.
+    Days without timecards stay 0.
+    """
+    hours = array('f', bytes(4 * days_in_year(year)))
+    for row in rows:
+        hours[day_of_year(row['timecard_date'])] = float(row['total_hours'])
+    return hours
+
+
+def to_json(hours: array) -> List[float]:
+    # float32 cannot hold most hundredths exactly; round back to the two places hours are stored with. Whole hours,
+    # including the many empty days, are written as integers to keep the array short.
+    return [int(total) if total.is_integer() else round(total, 2) for total in hours]
+
+
+def to_float32(hours: array) -> bytes:
+    """Little-endian float32, four bytes per day."""
+    if sys.byteorder == 'little':
+        return hours.tobytes()
+    swapped = array('f', hours)
+    swapped.byteswap()
+    return swapped.tobytes()
+
+
+def to_uint16(hours: array) -> bytes:
+    """Little-endian uint16 hundredths of an hour, two bytes per day, clamped to 0..UINT16_MAX."""
+    packed = array('H', [0 if total <= 0 else UINT16_MAX if total >= UINT16_MAX / UINT16_SCALE
+                         else round(total * UINT16_SCALE) for total in hours])
+    if sys.byteorder == 'big':
+        packed.byteswap()
+    return packed.tobytes()
@@ -0,0 +1,116 @@
+from functools import partial
+from hashlib import sha1
+from os import environ
+from typing import Iterable, Iterator, Optional
+import zlib
+
+from flask import request, Response
+
+from util.cache_util import InProcessCacheBackend
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {'application/json', 'application/x-ndjson', 'text/csv', 'text/html', 'text/plain'}
+
+
+def gzip_compressor():
+    # wbits=31 writes a gzip header and trailer around the deflate stream.
+    return zlib.compressobj(6, zlib.DEFLATED, 31)
+
+
+def compress_body(body: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    compressor = gzip_compressor()
+    return compressor.compress(body) + compressor.flush()
+
+
+def compress_stream(chunks: Iterable, encoding: str, charset: str = 'utf-8') -> Iterator[bytes]:
+    """Compress a streamed body chunk by chunk, flushing after each so the client can decode rows as they arrive."""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=4)
+        compress, flush, finish = compressor.process, compressor.flush, compressor.finish
+    else:
+        compressor = gzip_compressor()
+        compress, flush, finish = compressor.compress, partial(compressor.flush, zlib.Z_SYNC_FLUSH), compressor.flush
+    for chunk in chunks:
+        if chunk:
+            yield compress(chunk.encode(charset) if isinstance(chunk, str) else chunk) + flush()
+    yield finish()
+
+
+def weaken_etag(response: Response) -> None:
+    # The compressed bytes differ from the identity body, so the validator can only be weak.
+    etag, _ = response.get_etag()
+    if etag:
+        response.set_etag(etag, weak=True)
+
+
+class ResponseCompressor:
+    """
+    Compresses JSON, NDJSON, CSV and text responses of at least ``min_size`` bytes with brotli (when installed) or
+    gzip, whichever the client prefers. Compressed bodies are kept in a bounded LRU for ``cache_ttl`` seconds, keyed by
+    a digest of the body (hashing is far cheaper than compressing), so repeated identical responses, such as a report
+    served from the query cache, are not compressed again.
+    """
+
+    def __init__(self, min_size: int = 1024, cache_size: int = 256, cache_ttl: float = 30):
+        self.min_size = min_size
+        self.cache = InProcessCacheBackend(max_size=cache_size)
+        self.cache_ttl = cache_ttl
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def encoding_for(accept_encodings) -> Optional[str]:
+        return accept_encodings.best_match(['br', 'gzip'] if brotli else ['gzip'])
+
+    def compress(self, response: Response) -> Response:
+        if response.status_code == 304:
+            # A 304 carries the ETag of the 200 it stands for, which is weak whenever compression was negotiated.
+            response.vary.add('Accept-Encoding')
+            if ResponseCompressor.encoding_for(request.accept_encodings):
+                weaken_etag(response)
+            return response
+        if (not 200 <= response.status_code < 300 or response.status_code == 204 or response.direct_passthrough
+                or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE_MIMETYPES
+                or response.cache_control.no_transform):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = ResponseCompressor.encoding_for(request.accept_encodings)
+        if not encoding:
+            return response
+        # Weakened even when the body turns out too small to compress, so the ETag matches the one a 304 sends.
+        weaken_etag(response)
+
+        if response.is_streamed:
+            response.response = compress_stream(response.response, encoding, response.charset)
+            response.headers.pop('Content-Length', None)
+        else:
+            body = response.get_data()
+            if len(body) < self.min_size:
+                return response
+            key = f'{encoding}:{sha1(body).hexdigest()}'
+            compressed = self.cache.get(key)
+            if compressed is None:
+                self.misses += 1
+                compressed = compress_body(body, encoding)
+                self.cache.set(key, compressed, self.cache_ttl)
+            else:
+                self.hits += 1
+            response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+
+def init_compression(app) -> ResponseCompressor:
+    compressor = ResponseCompressor(
+        min_size=int(environ.get('COMPRESSION_MIN_BYTES', 1024)),
+        cache_size=int(environ.get('COMPRESSION_CACHE_SIZE', 256)),
+        cache_ttl=float(environ.get('QUERY_CACHE_TTL', 30))
+    )
+    app.after_request(compressor.compress)
+    return compressor
@@ -0,0 +1,68 @@
+from bisect import bisect_left, bisect_right
+from threading import Lock
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class EmployeeDirectory:
+    """
+    In-memory index of the employee table for the admin screens.
+
+    Employees are held sorted by id for keyset pagination, plus a sorted list of lower-cased name keys ("first last"
+    and "last first") for prefix search. The index is rebuilt from ``loader`` when ``create_employee`` marks it stale
+    or after ``ttl`` seconds, so employees created by other workers show up too.
+    """
+
+    def __init__(self, loader: Callable[[], List[dict]], ttl: float = 300):
+        self._loader = loader
+        self._ttl = ttl
+        self._lock = Lock()
+        self._loaded_at = 0.0
+        # (ids, employees by id, sorted (name key, id) pairs), swapped as one tuple so readers never see a mix.
+        self._index: Tuple[List[str], Dict[str, dict], List[Tuple[str, str]]] = ([], {}, [])
+
+    def invalidate(self) -> None:
+        self._loaded_at = 0.0
+
+    def get(self, employee_id: str) -> Optional[dict]:
+        return self._ensure_loaded()[1].get(employee_id)
+
+    def page(self, limit: int = None, after: str = None, query: str = None) -> Tuple[List[dict], Optional[str]]:
+        """Return up to ``limit`` employees ordered by id with id > ``after``, and the cursor for the next page."""
+        ids, by_id, name_keys = self._ensure_loaded()
+        if query:
+            ids = EmployeeDirectory._search(name_keys, query)
+        start = bisect_right(ids, after) if after else 0
+        end = start + limit if limit else len(ids)
+        page_ids = ids[start:end]
+        next_after = page_ids[-1] if page_ids and end < len(ids) else None
+        return [by_id[employee_id] for employee_id in page_ids], next_after
+
+    @staticmethod
+    def _search(name_keys: List[Tuple[str, str]], query: str) -> List[str]:
+        prefix = ' '.join(query.lower().split())
+        start = bisect_left(name_keys, (prefix,))
+        end = bisect_left(name_keys, (prefix + '\uffff',))
+        return sorted({employee_id for _, employee_id in name_keys[start:end]})
+
+    def _ensure_loaded(self) -> Tuple[List[str], Dict[str, dict], List[Tuple[str, str]]]:
+        if self._loaded_at and time.monotonic() - self._loaded_at < self._ttl:
+            return self._index
+        with self._lock:
+            if self._loaded_at and time.monotonic() - self._loaded_at < self._ttl:
+                return self._index
+            employees = sorted(self._loader(), key=lambda employee: employee['id'])
+            name_keys = []
+            for employee in employees:
+                first_name = (employee.get('first_name') or '').lower()
+                last_name = (employee.get('last_name') or '').lower()
+                name_keys.append((f'{first_name} {last_name}'.strip(), employee['id']))
+                name_keys.append((f'{last_name} {first_name}'.strip(), employee['id']))
+            name_keys.sort()
+            self._index = (
+                [employee['id'] for employee in employees],
+                {employee['id']: employee for employee in employees},
+                name_keys
+            )
+            self._loaded_at = time.monotonic()
+            return self._index
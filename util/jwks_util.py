@@ -0,0 +1,147 @@
+from threading import Event, Lock, Thread
+import time
+from typing import Callable, Dict, List, Optional
+
+from jose import jwk
+from jose.backends.base import Key
+
+JWKSFetcher = Callable[[], Dict[str, any]]
+
+
+class StaticJWKSSource:
+    """Local stand-in for the tenant JWKS endpoint. Tests swap keys in and out to simulate rotation."""
+
+    def __init__(self, keys: List[Dict[str, any]] = None):
+        self.keys = list(keys or [])
+        self.fetch_count = 0
+        self.fail = False
+
+    def __call__(self) -> Dict[str, any]:
+        self.fetch_count += 1
+        if self.fail:
+            raise ConnectionError('StaticJWKSSource configured to fail')
+        return {'keys': list(self.keys)}
+
+
+class JWKSStore:
+    """
+    Holds the tenant signing keys indexed by kid as pre-constructed key objects.
+
+    The key set is refreshed in the background every ``ttl`` seconds. An unknown kid triggers a refetch, at most one
+    per ``refetch_interval`` seconds however many distinct kids arrive, so a flood of tokens with bogus kids cannot
+    hammer the JWKS endpoint. A kid still unknown after a refetch is rejected without waiting on the fetch lock for
+    ``negative_ttl`` seconds; at most ``max_misses`` such kids are remembered. A failed fetch keeps serving the last
+    good key set.
+    """
+
+    def __init__(self, fetcher: JWKSFetcher, logger=None, ttl: float = 3600, negative_ttl: float = 60,
+                 refetch_interval: float = 10, max_misses: int = 1024, algorithm: str = 'RS256'):
+        self._fetcher = fetcher
+        self.logger = logger
+        self._ttl = ttl
+        self._negative_ttl = negative_ttl
+        self._refetch_interval = refetch_interval
+        self._max_misses = max_misses
+        self._refetched_at = float('-inf')
+        self._algorithm = algorithm
+        self._keys: Dict[str, Key] = {}
+        self._jwks: Dict[str, Dict[str, any]] = {}
+        self._fetched_at = 0.0
+        self._misses: Dict[str, float] = {}
+        self._fetch_lock = Lock()
+        self._listeners: List[Callable[[], None]] = []
+        self._stop = Event()
+        self._refresher: Optional[Thread] = None
+        self._attempts = 0
+        self.version = 0
+
+    def get(self, kid: str) -> Optional[Key]:
+        if not self._fetched_at:
+            self._single_flight_fetch()
+        key = self._keys.get(kid)
+        if key is not None:
+            return key
+
+        missed_at = self._misses.get(kid)
+        if missed_at and time.monotonic() - missed_at < self._negative_ttl:
+            return None
+
+        if not self._refetch():
+            return None
+        key = self._keys.get(kid)
+        if key is None:
+            self._remember_miss(kid)
+        return key
+
+    def refresh(self) -> bool:
+        with self._fetch_lock:
+            return self._fetch()
+
+    def add_listener(self, listener: Callable[[], None]) -> None:
+        """Register a callback invoked whenever the key set changes."""
+        self._listeners.append(listener)
+
+    def start(self) -> None:
+        if self._refresher and self._refresher.is_alive():
+            return
+        self._stop.clear()
+        self._refresher = Thread(target=self._refresh_loop, name='jwks-refresher', daemon=True)
+        self._refresher.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._refresher = None
+
+    def _single_flight_fetch(self) -> None:
+        attempt = self._attempts
+        with self._fetch_lock:
+            if self._attempts == attempt:
+                self._fetch()
+
+    def _refetch(self) -> bool:
+        """Refetch for an unknown kid unless another refetch ran within ``refetch_interval``. True if one ran."""
+        if time.monotonic() - self._refetched_at < self._refetch_interval:
+            return False
+        with self._fetch_lock:
+            # Callers that queued behind the refetch find it done instead of repeating it.
+            if time.monotonic() - self._refetched_at < self._refetch_interval:
+                return True
+            self._refetched_at = time.monotonic()
+            self._fetch()
+            return True
+
+    def _remember_miss(self, kid: str) -> None:
+        misses = self._misses
+        misses.pop(kid, None)
+        while len(misses) >= self._max_misses:
+            misses.pop(next(iter(misses)), None)
+        misses[kid] = time.monotonic()
+
+    def _refresh_loop(self) -> None:
+        if not self._fetched_at:
+            self._single_flight_fetch()
+        while not self._stop.wait(self._ttl):
+            self.refresh()
+
+    def _fetch(self) -> bool:
+        self._attempts += 1
+        try:
+            jwks = {key['kid']: key for key in self._fetcher()['keys'] if 'kid' in key}
+            keys = {kid: jwk.construct(key, self._algorithm) for kid, key in jwks.items()}
+        except Exception as e:
+            if self.logger:
+                self.logger.error('Unable to refresh JWKS, keeping %d cached keys', len(self._keys), exc_info=e)
+            self._fetched_at = self._fetched_at or time.monotonic()
+            return False
+
+        # Compare the key material, not just the kids: a key replaced under the same kid must reach the listeners too.
+        changed = jwks != self._jwks
+        self._keys = keys
+        self._jwks = jwks
+        self._fetched_at = time.monotonic()
+        if changed:
+            self._misses = {}
+            self.version += 1
+            for listener in self._listeners:
+                listener()
+        return True
@@ -0,0 +1,274 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from glob import glob
+import inspect
+from os import environ, getpid, path, replace
+import pickle
+from threading import Event, Lock, Thread
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from flask import g, request
+from flask.json.provider import DefaultJSONProvider
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Instrumentation cost allowed per request (one route observation plus a handful of auth/DB/JSON phases).
+# benchmarks/bench_metrics_util.py measures it.
+OVERHEAD_BUDGET_SECONDS = 0.0001
+
+Labels = Tuple[Tuple[str, str], ...]
+# {'histograms': {name: {labels: (buckets, counts, total)}}, 'gauges': {name: (help, {labels: value})}}
+Snapshot = Dict[str, dict]
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self._lock = Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.total += value
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        with self._lock:
+            return list(self.counts), self.total
+
+
+class MetricsRegistry:
+    """Process-local histograms and gauges rendered in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._help: Dict[str, str] = {}
+        self._gauges: Dict[str, Tuple[str, Callable[[], float]]] = {}
+        self._lock = Lock()
+
+    def describe(self, name: str, help_text: str) -> None:
+        self._help[name] = help_text
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        family = self._histograms.get(name)
+        histogram = family.get(key) if family else None
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(name, {}).setdefault(key, Histogram())
+        histogram.observe(value)
+
+    @contextmanager
+    def timed(self, name: str, **labels: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def gauge(self, name: str, help_text: str, read: Callable[[], float]) -> None:
+        self._gauges[name] = (help_text, read)
+
+    def snapshot(self) -> Snapshot:
+        """Copy of every series as plain data, which MetricsDirectory writes for the other workers to read."""
+        with self._lock:
+            histograms = {name: dict(family) for name, family in self._histograms.items()}
+        return {
+            'histograms': {
+                name: {labels: (histogram.buckets,) + histogram.snapshot() for labels, histogram in family.items()}
+                for name, family in histograms.items()
+            },
+            'gauges': {name: (help_text, {(): read()}) for name, (help_text, read) in self._gauges.items()}
+        }
+
+    def render(self, snapshot: Snapshot = None) -> str:
+        """Render ``snapshot`` (by default this registry's own) with this registry's help texts."""
+        return render_snapshot(self._help, snapshot or self.snapshot())
+
+
+class MetricsDirectory:
+    """
+    Shares the metrics of every worker process through a directory (METRICS_DIR). Each worker writes a snapshot of
+    its registry to its own file every ``flush_seconds`` and whenever it serves a scrape, and a scrape renders the
+    histograms summed over every file. Gauges read per-process state such as cache hit counts, so they are rendered
+    once per worker with a ``worker`` label.
+    """
+
+    def __init__(self, registry: MetricsRegistry, directory: str, flush_seconds: float = 5):
+        self.registry = registry
+        self.directory = directory
+        self.flush_seconds = flush_seconds
+        self._stop = Event()
+        self._flusher: Optional[Thread] = None
+
+    def start(self) -> None:
+        if self._flusher and self._flusher.is_alive():
+            return
+        self._stop.clear()
+        self._flusher = Thread(target=self._flush_loop, name='metrics-flusher', daemon=True)
+        self._flusher.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._flusher = None
+
+    def flush(self) -> None:
+        self._write(getpid(), self.registry.snapshot())
+
+    def render(self) -> str:
+        self.flush()
+        snapshots = {}
+        for file in glob(path.join(self.directory, '*.pickle')):
+            with open(file, 'rb') as snapshot:
+                snapshots[path.basename(file)[:-len('.pickle')]] = pickle.load(snapshot)
+        return self.registry.render(merge_snapshots(snapshots))
+
+    def mark_process_dead(self, pid: int) -> None:
+        """Drop an exited worker's gauges; its histogram counts stay in the totals."""
+        file = self._file(pid)
+        if path.exists(file):
+            with open(file, 'rb') as snapshot:
+                self._write(pid, {**pickle.load(snapshot), 'gauges': {}})
+
+    def _flush_loop(self) -> None:
+        while not self._stop.wait(self.flush_seconds):
+            self.flush()
+
+    def _file(self, pid: int) -> str:
+        return path.join(self.directory, f'{pid}.pickle')
+
+    def _write(self, pid: int, snapshot: Snapshot) -> None:
+        # Written aside and renamed so a concurrent scrape never reads a partial file.
+        partial = self._file(pid) + '.partial'
+        with open(partial, 'wb') as file:
+            pickle.dump(snapshot, file)
+        replace(partial, self._file(pid))
+
+
+def merge_snapshots(snapshots: Dict[str, Snapshot]) -> Snapshot:
+    """Sum the histograms of several workers' snapshots and label their gauges with the worker (its pid)."""
+    histograms: Dict[str, dict] = {}
+    gauges: Dict[str, tuple] = {}
+    for worker, snapshot in sorted(snapshots.items()):
+        for name, family in snapshot['histograms'].items():
+            merged_family = histograms.setdefault(name, {})
+            for labels, (buckets, counts, total) in family.items():
+                if labels in merged_family:
+                    _, merged_counts, merged_total = merged_family[labels]
+                    counts = [count + merged for count, merged in zip(counts, merged_counts)]
+                    total += merged_total
+                merged_family[labels] = (buckets, counts, total)
+        for name, (help_text, values) in snapshot['gauges'].items():
+            merged_values = gauges.setdefault(name, (help_text, {}))[1]
+            for labels, value in values.items():
+                merged_values[labels + (('worker', worker),)] = value
+    return {'histograms': histograms, 'gauges': gauges}
+
+
+def render_snapshot(help_texts: Dict[str, str], snapshot: Snapshot) -> str:
+    """Prometheus text exposition format."""
+    lines = []
+    for name, family in sorted(snapshot['histograms'].items()):
+        if name in help_texts:
+            lines.append(f'# HELP {name} {help_texts[name]}')
+        lines.append(f'# TYPE {name} histogram')
+        for labels, (buckets, counts, total) in sorted(family.items()):
+            cumulative = 0
+            for bound, count in zip(buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{name}_bucket{format_labels(labels + (("le", le),))} {cumulative}')
+            lines.append(f'{name}_sum{format_labels(labels)} {total}')
+            lines.append(f'{name}_count{format_labels(labels)} {cumulative}')
+    for name, (help_text, values) in sorted(snapshot['gauges'].items()):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} gauge')
+        for labels, value in sorted(values.items()):
+            lines.append(f'{name}{format_labels(labels)} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def format_labels(labels: Labels) -> str:
+    if not labels:
+        return ''
+    escaped = (
+        f'{key}="' + str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for key, value in labels
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+metrics = MetricsRegistry()
+metrics.describe('http_request_duration_seconds', 'Request latency by route, method and status.')
+metrics.describe('auth_phase_duration_seconds', 'Time spent in session lookup, JWKS key lookup and JWT decoding.')
+metrics.describe('db_query_duration_seconds', 'Time spent in each SQLUtil method.')
+metrics.describe('json_serialization_duration_seconds', 'Time spent serializing JSON responses.')
+# gunicorn.conf.py points METRICS_DIR at a directory shared by its workers. Without it a scrape only reports the
+# worker that served it.
+metrics_directory = MetricsDirectory(metrics, environ['METRICS_DIR'], float(environ.get('METRICS_FLUSH_SECONDS', 5))) \
+    if environ.get('METRICS_DIR') else None
+
+
+def render_metrics() -> str:
+    return metrics_directory.render() if metrics_directory else metrics.render()
+
+
+def instrument_db_methods(*excluded: str):
+    """Class decorator timing every public method of a SQLUtil class under db_query_duration_seconds."""
+
+    def decorator(cls):
+        for name, method in list(vars(cls).items()):
+            if (name.startswith('_') or name in excluded or not inspect.isfunction(method)
+                    or inspect.isgeneratorfunction(method)):
+                continue
+            setattr(cls, name, _timed_method(name, method))
+        return cls
+
+    return decorator
+
+
+def _timed_method(name: str, method):
+    @wraps(method)
+    def timed_method(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            metrics.observe('db_query_duration_seconds', time.perf_counter() - start, method=name)
+
+    return timed_method
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    def dumps(self, obj, **kwargs) -> str:
+        start = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            metrics.observe('json_serialization_duration_seconds', time.perf_counter() - start)
+
+
+def init_metrics(app) -> MetricsRegistry:
+    app.json = TimedJSONProvider(app)
+
+    @app.before_request
+    def start_request_timer():
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def observe_request_latency(response):
+        if 'request_start' in g:
+            metrics.observe(
+                'http_request_duration_seconds',
+                time.perf_counter() - g.request_start,
+                route=request.url_rule.rule if request.url_rule else 'unmatched',
+                method=request.method,
+                status=str(response.status_code)
+            )
+        return response
+
+    return metrics
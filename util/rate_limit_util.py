@@ -0,0 +1,128 @@
+from contextlib import contextmanager
+import math
+from os import environ
+from threading import BoundedSemaphore, Lock
+import time
+from typing import Callable, Dict, NamedTuple, Optional
+
+from werkzeug.exceptions import ServiceUnavailable, TooManyRequests
+
+from util.cache_util import InProcessCacheBackend, SharedCacheBackend
+from util.worker_util import worker_count, worker_threads
+
+READ = 'read'
+WRITE = 'write'
+REPORT = 'report'
+
+
+class Budget(NamedTuple):
+    rate: float
+    burst: float
+
+
+def budget_from_env(name: str, default: str) -> Budget:
+    """Parse a ``rate,burst`` budget such as ``10,40`` (10 requests per second, bursts of up to 40)."""
+    rate, burst = environ.get(name, default).split(',')
+    return Budget(float(rate), float(burst))
+
+
+def worker_share(budget: Budget, workers: int) -> Budget:
+    """
+    One worker's share of a budget when every worker keeps its own buckets. Requests are spread across the workers, so
+    the shares add up to roughly the configured budget. A burst below one token would refuse every request.
+    """
+    return Budget(budget.rate / workers, max(1.0, budget.burst / workers))
+
+
+class TokenBucketLimiter:
+    """
+    One token bucket per employee and request kind. Bucket state is a ``(tokens, updated_at)`` pair kept in a cache
+    backend: an in-process LRU by default, or a SharedCacheBackend so every worker draws from the same bucket. The
+    shared read-modify-write is not atomic across workers, so concurrent workers can overdraw a bucket slightly.
+    init_rate_limiter gives in-process buckets each worker's share of the budget, since every worker has its own.
+    """
+
+    def __init__(self, budgets: Dict[str, Budget], backend, clock: Callable[[], float] = time.time):
+        self.budgets = budgets
+        self.backend = backend
+        self._clock = clock
+        self._lock = Lock()
+        self.rejected = 0
+
+    def take(self, employee_id: str, kind: str) -> float:
+        """Take a token. Returns 0 when the request is admitted, otherwise the seconds until a token is available."""
+        budget = self.budgets[kind]
+        key = f'bucket:{kind}:{employee_id}'
+        with self._lock:
+            now = self._clock()
+            tokens, updated_at = self.backend.get(key) or (budget.burst, now)
+            tokens = min(budget.burst, tokens + max(0.0, now - updated_at) * budget.rate)
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / budget.rate
+            if not wait:
+                tokens -= 1
+            # A bucket left alone refills completely, so it can expire once it would be full again.
+            self.backend.set(key, (tokens, now), math.ceil((budget.burst - tokens) / budget.rate) + 1)
+        if wait:
+            self.rejected += 1
+        return wait
+
+    def admit(self, employee_id: str, kind: str) -> None:
+        wait = self.take(employee_id, kind)
+        if wait:
+            raise TooManyRequests(f'Too many {kind} requests', retry_after=math.ceil(wait))
+
+
+class ConcurrencyLimiter:
+    """
+    Caps the requests one worker runs at once so excess load is shed with a 503 instead of queueing on the DB pool,
+    which is also per worker. A request waits up to ``wait`` seconds for a slot.
+
+    Only threaded workers run several requests at once: a sync worker takes one request at a time and the rest wait
+    in gunicorn's listen backlog, which this cannot shed. init_concurrency_limiter leaves the limit off unless
+    GUNICORN_THREADS exceeds it.
+    """
+
+    def __init__(self, limit: int, wait: float = 0.25):
+        self._slots: Optional[BoundedSemaphore] = BoundedSemaphore(limit) if limit > 0 else None
+        self.wait = wait
+        self.rejected = 0
+
+    @contextmanager
+    def admit(self):
+        if self._slots is None:
+            yield
+            return
+        if not self._slots.acquire(timeout=self.wait):
+            self.rejected += 1
+            raise ServiceUnavailable('Server busy', retry_after=1)
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+
+def init_rate_limiter() -> Optional[TokenBucketLimiter]:
+    """Per-employee budgets from RATE_LIMIT_READ, RATE_LIMIT_WRITE and RATE_LIMIT_REPORT; None when RATE_LIMITS=off."""
+    if environ.get('RATE_LIMITS', 'on') == 'off':
+        return None
+    if environ.get('RATE_LIMIT_REDIS_URL'):
+        import redis
+        backend = SharedCacheBackend(redis.Redis.from_url(environ['RATE_LIMIT_REDIS_URL']), key_prefix='dc-rate:')
+    else:
+        backend = InProcessCacheBackend(max_size=int(environ.get('RATE_LIMIT_BUCKETS', 10000)))
+    budgets = {
+        READ: budget_from_env('RATE_LIMIT_READ', '10,40'),
+        WRITE: budget_from_env('RATE_LIMIT_WRITE', '5,20'),
+        REPORT: budget_from_env('RATE_LIMIT_REPORT', '0.5,5')
+    }
+    if not environ.get('RATE_LIMIT_REDIS_URL'):
+        budgets = {kind: worker_share(budget, worker_count()) for kind, budget in budgets.items()}
+    return TokenBucketLimiter(budgets, backend)
+
+
+def init_concurrency_limiter() -> ConcurrencyLimiter:
+    # Defaults to Flask-SQLAlchemy's pool_size (5) plus max_overflow (10), the most requests the DB pool can serve.
+    limit = int(environ.get('MAX_CONCURRENT_REQUESTS', 15))
+    # A worker never runs more requests at once than it has threads, so a limit at or above that is never reached.
+    return ConcurrencyLimiter(limit if limit < worker_threads() else 0,
+                              float(environ.get('CONCURRENCY_WAIT_SECONDS', 0.25)))
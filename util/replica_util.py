@@ -0,0 +1,83 @@
+from itertools import count
+from os import environ
+from typing import Dict, List
+
+from flask import g, has_app_context
+
+# Pin key for reads of the whole employee table (the directory index), taken when an employee is created.
+EMPLOYEE_LIST_PIN = 'employee_list'
+
+
+def replica_uris() -> List[str]:
+    """Replica URIs from DATABASE_REPLICA_URIS, or MySQL replicas on DB_REPLICA_HOSTS with the primary's credentials."""
+    if environ.get('DATABASE_REPLICA_URIS'):
+        return [uri.strip() for uri in environ['DATABASE_REPLICA_URIS'].split(',') if uri.strip()]
+    return [
+        f'mysql+mysqldb://{environ["DB_USER"]}:{environ["DB_PASS"]}@{host.strip()}/{environ["DB_NAME"]}'
+        for host in environ.get('DB_REPLICA_HOSTS', '').split(',') if host.strip()
+    ]
+
+
+def replica_binds(uris: List[str]) -> Dict[str, str]:
+    return {f'replica_{index}': uri for index, uri in enumerate(uris)}
+
+
+class ReplicaRouter:
+    """
+    Picks the session for a read: one of the replica sessions, or the primary session when there are no replicas or
+    when the data belongs to an employee who wrote within the last ``pin_seconds`` (read-your-writes). Pins live in
+    ``pins``, a cache backend, so a shared backend pins the employee for every worker; init_db refuses replicas
+    with more than one worker unless the pins are shared.
+
+    A request keeps the replica it was first given, so an ETag validator and the body it describes come from the same
+    replica.
+    """
+
+    def __init__(self, primary_session, replica_sessions: List, pins, pin_seconds: float = 5):
+        self.primary_session = primary_session
+        self.replica_sessions = replica_sessions
+        self.pins = pins
+        self.pin_seconds = pin_seconds
+        self._next_replica = count()
+
+    def session_for(self, *employee_ids: str):
+        if not self.replica_sessions or any(self.is_pinned(employee_id) for employee_id in employee_ids):
+            return self.primary_session
+        if not has_app_context():
+            return self.replica_sessions[next(self._next_replica) % len(self.replica_sessions)]
+        if 'replica_index' not in g:
+            g.replica_index = next(self._next_replica) % len(self.replica_sessions)
+        return self.replica_sessions[g.replica_index]
+
+    def pin(self, *employee_ids: str) -> None:
+        if not self.replica_sessions:
+            return
+        for employee_id in employee_ids:
+            self.pins.set(f'pin:{employee_id}', True, self.pin_seconds)
+
+    def is_pinned(self, employee_id: str) -> bool:
+        return bool(employee_id) and self.pins.get(f'pin:{employee_id}') is not None
+
+    def remove(self) -> None:
+        for replica_session in self.replica_sessions:
+            replica_session.remove()
+
+    def dispose(self) -> None:
+        for replica_session in self.replica_sessions:
+            replica_session.bind.dispose(close=False)
+
+
+def init_replicas(app, db, pins) -> ReplicaRouter:
+    """One scoped session per ``replica_*`` bind in SQLALCHEMY_BINDS, removed at the end of every app context."""
+    replica_sessions = [
+        db.create_scoped_session({'bind': db.get_engine(app, bind=bind)})
+        for bind in sorted((app.config.get('SQLALCHEMY_BINDS') or {}).keys()) if bind.startswith('replica_')
+    ]
+    router = ReplicaRouter(db.session, replica_sessions, pins,
+                           pin_seconds=float(environ.get('READ_YOUR_WRITES_SECONDS', 5)))
+
+    @app.teardown_appcontext
+    def remove_replica_sessions(_exception=None):
+        router.remove()
+
+    return router
@@ -0,0 +1,215 @@
+from collections import OrderedDict
+from datetime import datetime, timezone
+from hashlib import sha256
+import secrets
+from threading import Lock
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from flask_session.sessions import SqlAlchemySessionInterface
+from itsdangerous import BadSignature, want_bytes
+
+from util import sql_statements as sql
+from util.metrics_util import metrics
+
+
+class SessionReadCache:
+    """Bounded LRU of deserialized session rows keyed by store id. Entries are trusted for ``ttl`` seconds."""
+
+    def __init__(self, max_size: int = 4096, ttl: float = 30):
+        self._max_size = max_size
+        self._ttl = ttl
+        self._entries: 'OrderedDict[str, Tuple[float, datetime, str, dict]]' = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, store_id: str) -> Optional[Tuple[datetime, str, dict]]:
+        with self._lock:
+            entry = self._entries.get(store_id)
+            if entry is None or time.monotonic() - entry[0] > self._ttl or entry[1] <= datetime.utcnow():
+                self._entries.pop(store_id, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(store_id)
+            self.hits += 1
+            return entry[1:]
+
+    def put(self, store_id: str, expiry: datetime, digest: str, data: dict) -> None:
+        if expiry.tzinfo is not None:
+            expiry = expiry.astimezone(timezone.utc).replace(tzinfo=None)
+        with self._lock:
+            self._entries[store_id] = (time.monotonic(), expiry, digest, data)
+            self._entries.move_to_end(store_id)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, store_id: str) -> None:
+        with self._lock:
+            self._entries.pop(store_id, None)
+
+
+class CachedSqlAlchemySessionInterface(SqlAlchemySessionInterface):
+    """
+    SQLAlchemy session backend that avoids the session table on the hot path.
+
+    Reads are served from an in-process LRU for a short TTL before going back to the table, so another gunicorn
+    worker's login is picked up within ``SESSION_CACHE_TTL`` seconds. The row is only written when the serialized
+    session data changes (in practice: when ``set_session`` stores a new identity) or when less than half of the
+    session lifetime is left on it, instead of on every response. Otherwise the cookie gets the row's expiry, so the
+    browser never holds a session the table has already expired.
+    """
+
+    def __init__(self, app, db, table, key_prefix, use_signer=False, permanent=True):
+        super().__init__(app, db, table, key_prefix, use_signer, permanent)
+        self.read_cache = SessionReadCache(
+            max_size=app.config.get('SESSION_CACHE_SIZE', 4096),
+            ttl=app.config.get('SESSION_CACHE_TTL', 30)
+        )
+
+    @staticmethod
+    def digest(val: bytes) -> str:
+        return sha256(val).hexdigest()
+
+    def open_session(self, app, request):
+        with metrics.timed('auth_phase_duration_seconds', phase='session'):
+            return self._open_session(app, request)
+
+    def _open_session(self, app, request):
+        sid = request.cookies.get(app.session_cookie_name)
+        if not sid:
+            return self.session_class(sid=self._generate_sid(), permanent=self.permanent)
+        if self.use_signer:
+            signer = self._get_signer(app)
+            if signer is None:
+                return None
+            try:
+                sid = signer.unsign(sid).decode()
+            except BadSignature:
+                return self.session_class(sid=self._generate_sid(), permanent=self.permanent)
+
+        store_id = self.key_prefix + sid
+        cached = self.read_cache.get(store_id)
+        if cached:
+            expiry, digest, data = cached
+            return self._loaded_session(dict(data), sid, digest, expiry)
+
+        saved_session = self.sql_session_model.query.filter_by(session_id=store_id).first()
+        if saved_session and saved_session.expiry <= datetime.utcnow():
+            self.db.session.delete(saved_session)
+            self.db.session.commit()
+            saved_session = None
+        if saved_session:
+            try:
+                val = want_bytes(saved_session.data)
+                data = self.serializer.loads(val)
+            except Exception:
+                return self.session_class(sid=sid, permanent=self.permanent)
+            digest = CachedSqlAlchemySessionInterface.digest(val)
+            self.read_cache.put(store_id, saved_session.expiry, digest, data)
+            return self._loaded_session(dict(data), sid, digest, saved_session.expiry)
+        return self.session_class(sid=sid, permanent=self.permanent)
+
+    def save_session(self, app, session, response):
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        store_id = self.key_prefix + session.sid
+        loaded_digest = getattr(session, 'loaded_digest', None)
+        if not session:
+            if session.modified:
+                if loaded_digest:
+                    self.sql_session_model.query.filter_by(session_id=store_id).delete()
+                    self.db.session.commit()
+                self.read_cache.discard(store_id)
+                response.delete_cookie(app.session_cookie_name, domain=domain, path=path)
+            return
+        if loaded_digest is None and not session.modified:
+            return
+
+        expires = self.get_expiration_time(app, session)
+        data = dict(session)
+        val = self.serializer.dumps(data)
+        digest = CachedSqlAlchemySessionInterface.digest(val)
+        loaded_expiry = getattr(session, 'loaded_expiry', None)
+        if digest != loaded_digest or CachedSqlAlchemySessionInterface.expiry_due(app, loaded_expiry):
+            updated = loaded_digest is not None and self.sql_session_model.query.filter_by(
+                session_id=store_id).update({'data': val, 'expiry': expires}, synchronize_session=False)
+            if not updated:
+                self.db.session.add(self.sql_session_model(store_id, val, expires))
+            self.db.session.commit()
+            self.read_cache.put(store_id, expires, digest, data)
+        else:
+            expires = loaded_expiry
+
+        conditional_cookie_kwargs = {}
+        if self.has_same_site_capability:
+            conditional_cookie_kwargs['samesite'] = self.get_cookie_samesite(app)
+        if self.use_signer:
+            session_id = self._get_signer(app).sign(want_bytes(session.sid))
+        else:
+            session_id = session.sid
+        response.set_cookie(app.session_cookie_name, session_id,
+                            expires=expires, httponly=self.get_cookie_httponly(app),
+                            domain=domain, path=path, secure=self.get_cookie_secure(app),
+                            **conditional_cookie_kwargs)
+
+    @staticmethod
+    def expiry_due(app, expiry: Optional[datetime]) -> bool:
+        """Whether a stored (naive UTC) expiry has less than half of the session lifetime left."""
+        return expiry is None or expiry - datetime.utcnow() < app.permanent_session_lifetime / 2
+
+    def _loaded_session(self, data: dict, sid: str, digest: str, expiry: datetime):
+        session = self.session_class(data, sid=sid)
+        session.loaded_digest = digest
+        session.loaded_expiry = expiry
+        return session
+
+
+def init_session(app, db) -> CachedSqlAlchemySessionInterface:
+    app.session_interface = CachedSqlAlchemySessionInterface(
+        app,
+        db,
+        app.config['SESSION_SQLALCHEMY_TABLE'],
+        app.config.get('SESSION_KEY_PREFIX', 'session:'),
+        app.config.get('SESSION_USE_SIGNER', False),
+        app.config.get('SESSION_PERMANENT', True)
+    )
+    return app.session_interface
+
+
+def session_table_stats(db, lookup_samples: int = 25) -> Dict[str, float]:
+    """Row counts of the session table and the median time of a session_id lookup, as open_session does it."""
+    counts = dict(db.session.execute(sql.SESSION_COUNTS, {'now': datetime.utcnow()}).fetchone())
+    timings = []
+    for _ in range(lookup_samples):
+        start = time.perf_counter()
+        db.session.execute(sql.SESSION_LOOKUP, {'session_id': 'session:' + secrets.token_urlsafe(32)}).fetchall()
+        timings.append(time.perf_counter() - start)
+    db.session.commit()
+    return {
+        'total_rows': int(counts['total_rows']),
+        'expired_rows': int(counts['expired_rows']),
+        'lookup_ms': sorted(timings)[len(timings) // 2] * 1000 if timings else 0.0
+    }
+
+
+def prune_expired_sessions(db, batch_size: int = 1000, pause: float = 0.1, max_batches: int = None,
+                           on_batch: Callable[[int], None] = None) -> int:
+    """
+    Delete sessions that expired before now in batches of ``batch_size``, committing after each batch and sleeping
+    ``pause`` seconds between them so no single statement holds locks for long. Returns the number of rows deleted.
+    """
+    statement = sql.PRUNE_EXPIRED_SESSIONS[db.engine.dialect.name]
+    now = datetime.utcnow()
+    deleted = batches = 0
+    while max_batches is None or batches < max_batches:
+        rows = db.session.execute(statement, {'now': now, 'batch_size': batch_size}).rowcount
+        db.session.commit()
+        deleted += rows
+        batches += 1
+        if on_batch:
+            on_batch(rows)
+        if rows < batch_size:
+            break
+        time.sleep(pause)
+    return deleted
@@ -0,0 +1,585 @@
+from functools import lru_cache
+from typing import Tuple
+
+from sqlalchemy import bindparam, DateTime, Float, Integer, String, text
+
+# Statements are built once at import time so SQLAlchemy does not re-parse the SQL text (and re-derive the bind
+# parameters) on every call, and so each one hits the compiled-statement cache.
+
+EMPLOYEE_ID = bindparam('employee_id', type_=String)
+START_DATE = bindparam('start_date', type_=String)
+END_DATE = bindparam('end_date', type_=String)
+TIMECARD_ID = bindparam('id', type_=Integer)
+HOURS = bindparam('hours', type_=Float)
+
+# The table timecards live in until their year is archived into timecard_archive_<year>.
+HOT_TABLES = ('timecard',)
+
+EMPLOYEE_LIST = text('''
+    SELECT id,
+           first_name,
+           last_name
+    FROM employee
+''')
+
+EMPLOYEE_INFO = text('''
+    SELECT id,
+           first_name,
+           last_name,
+           user_principal_name
+    FROM employee
+    WHERE id = :employee_id
+''').bindparams(EMPLOYEE_ID)
+
+CREATE_EMPLOYEE = text('''
+    INSERT INTO employee (id, first_name, last_name, user_principal_name)
+    VALUES (:employee_id, :first_name, :last_name, :user_principal_name)
+''').bindparams(EMPLOYEE_ID)
+
+# Employee insert that refreshes the names and UPN of an existing row, per dialect.
+UPSERT_EMPLOYEE = {
+    'mysql': text('''
+        INSERT INTO employee (id, first_name, last_name, user_principal_name)
+        VALUES (:employee_id, :first_name, :last_name, :user_principal_name)
+        ON DUPLICATE KEY UPDATE
+            first_name = VALUES(first_name),
+            last_name = VALUES(last_name),
+            user_principal_name = VALUES(user_principal_name)
+    ''').bindparams(EMPLOYEE_ID),
+    'sqlite': text('''
+        INSERT INTO employee (id, first_name, last_name, user_principal_name)
+        VALUES (:employee_id, :first_name, :last_name, :user_principal_name)
+        ON CONFLICT (id) DO UPDATE SET
+            first_name = excluded.first_name,
+            last_name = excluded.last_name,
+            user_principal_name = excluded.user_principal_name
+    ''').bindparams(EMPLOYEE_ID)
+}
+
+# The employee upsert run at login. refresh_count changes on every duplicate, so MySQL always reports an updated row as
+# two affected rows and an inserted one as one, CLIENT_FOUND_ROWS or not; SQLite returns the new count instead.
+PROVISION_EMPLOYEE = {
+    'mysql': text('''
+        INSERT INTO employee (id, first_name, last_name, user_principal_name, refresh_count)
+        VALUES (:employee_id, :first_name, :last_name, :user_principal_name, 0)
+        ON DUPLICATE KEY UPDATE
+            first_name = VALUES(first_name),
+            last_name = VALUES(last_name),
+            user_principal_name = VALUES(user_principal_name),
+            refresh_count = refresh_count + 1
+    ''').bindparams(EMPLOYEE_ID),
+    'sqlite': text('''
+        INSERT INTO employee (id, first_name, last_name, user_principal_name, refresh_count)
+        VALUES (:employee_id, :first_name, :last_name, :user_principal_name, 0)
+        ON CONFLICT (id) DO UPDATE SET
+            first_name = excluded.first_name,
+            last_name = excluded.last_name,
+            user_principal_name = excluded.user_principal_name,
+            refresh_count = refresh_count + 1
+        RETURNING refresh_count
+    ''').bindparams(EMPLOYEE_ID)
+}
+
+DAILY_HOURS_WORKED = text('''
+    SELECT timecard_date,
+           total_hours
+    FROM timecard_daily_totals
+    WHERE employee_id = :employee_id
+    AND timecard_date >= :start_date
+    AND timecard_date < :end_date
+    AND entry_count > 0
+    ORDER BY timecard_date
+''').bindparams(EMPLOYEE_ID, START_DATE, END_DATE)
+
+MONTHLY_HOURS_ALL_EMPLOYEES = text('''
+    SELECT employee_id,
+           timecard_date,
+           total_hours
+    FROM timecard_daily_totals
+    WHERE timecard_date >= :start_date
+    AND timecard_date < :end_date
+    AND entry_count > 0
+    ORDER BY employee_id, timecard_date
+''').bindparams(START_DATE, END_DATE)
+
+MONTHLY_HOURS_BY_EMPLOYEE = text('''
+    SELECT employee_id,
+           timecard_date,
+           total_hours
+    FROM timecard_daily_totals
+    WHERE employee_id IN :employee_ids
+    AND timecard_date >= :start_date
+    AND timecard_date < :end_date
+    AND entry_count > 0
+    ORDER BY employee_id, timecard_date
+''').bindparams(bindparam('employee_ids', type_=String, expanding=True), START_DATE, END_DATE)
+
+# Hours per week (starting Monday), pay period, month and year from timecard_daily_totals, per dialect and for one
+# employee or all of them. Pay periods are :period_days long and start on :anchor, which must not be after :start_date.
+ROLLUP_PERIOD_KEYS = {
+    'mysql': {
+        'week': "DATE_FORMAT(DATE_SUB(timecard_date, INTERVAL WEEKDAY(timecard_date) DAY), '%Y-%m-%d')",
+        'pay_period': "DATE_FORMAT(DATE_ADD(:anchor, INTERVAL "
+                      "((TO_DAYS(timecard_date) - TO_DAYS(:anchor)) DIV :period_days) * :period_days DAY), '%Y-%m-%d')",
+        'month': "DATE_FORMAT(timecard_date, '%Y-%m')",
+        'year': "DATE_FORMAT(timecard_date, '%Y')"
+    },
+    'sqlite': {
+        'week': "date(timecard_date, 'weekday 0', '-6 days')",
+        'pay_period': "date(:anchor, '+' || ((CAST(julianday(timecard_date) - julianday(:anchor) AS INTEGER) "
+                      "/ :period_days) * :period_days) || ' days')",
+        'month': "strftime('%Y-%m', timecard_date)",
+        'year': "strftime('%Y', timecard_date)"
+    }
+}
+
+
+def _rollup(period_keys: dict, one_employee: bool):
+    selects = [f'''
+        SELECT '{period}' AS period,
+               employee_id,
+               {period_key} AS period_start,
+               SUM(total_hours) AS total_hours,
+               SUM(entry_count) AS entry_count
+        FROM timecard_daily_totals
+        WHERE timecard_date >= :start_date
+        AND timecard_date <= :end_date
+        AND entry_count > 0
+        {'AND employee_id = :employee_id' if one_employee else ''}
+        GROUP BY employee_id, period_start
+    ''' for period, period_key in period_keys.items()]
+    params = [START_DATE, END_DATE, bindparam('anchor', type_=String), bindparam('period_days', type_=Integer)]
+    return text(' UNION ALL '.join(selects) + ' ORDER BY employee_id, period, period_start').bindparams(
+        *params + ([EMPLOYEE_ID] if one_employee else []))
+
+
+HOURS_ROLLUP = {dialect: _rollup(keys, True) for dialect, keys in ROLLUP_PERIOD_KEYS.items()}
+HOURS_ROLLUP_ALL_EMPLOYEES = {dialect: _rollup(keys, False) for dialect, keys in ROLLUP_PERIOD_KEYS.items()}
+
+# Every timecard write bumps the version and modified_ts of its day's timecard_daily_totals row, so the validator of
+# a date range changes on each insert, update and delete in it without reading the timecard tables, archives included.
+TIMECARD_VALIDATOR = text('''
+    SELECT COALESCE(SUM(entry_count), 0) as entry_count,
+           MAX(modified_ts) as last_modified,
+           COALESCE(SUM(version), 0) as version
+    FROM timecard_daily_totals
+    WHERE employee_id = :employee_id
+    AND timecard_date >= :start_date
+    AND timecard_date < :end_date
+''').bindparams(EMPLOYEE_ID, START_DATE, END_DATE)
+
+_EXISTING_TIMECARD_IDS = '''
+    SELECT id
+    FROM {table}
+    WHERE id IN :ids
+'''
+
+_TIMECARD_ENTRIES_BETWEEN = '''
+    SELECT id,
+           timecard_date,
+           hours,
+           location,
+           description,
+           created_ts,
+           modified_ts,
+           created_by,
+           last_modified_by
+    FROM {table}
+    WHERE employee_id = :employee_id
+    AND timecard_date >= :start_date
+    AND timecard_date <= :end_date
+'''
+
+_TIMECARD_REPORT = '''
+    SELECT t.employee_id,
+           e.first_name,
+           e.last_name,
+           t.id,
+           t.timecard_date,
+           t.hours,
+           t.location,
+           t.description,
+           t.created_ts,
+           t.modified_ts,
+           t.created_by,
+           t.last_modified_by
+    FROM {table} t
+    LEFT JOIN employee e ON e.id = t.employee_id
+    WHERE t.timecard_date >= :start_date
+    AND t.timecard_date <= :end_date
+'''
+
+
+def _across(select: str, tables: Tuple[str, ...]) -> str:
+    return ' UNION ALL '.join(select.format(table=table) for table in tables)
+
+
+# Builders for the timecard reads, over the hot timecard table and/or timecard_archive_<year> tables. Each distinct
+# tuple of tables is compiled once; the module-level constants below are the hot-table-only forms.
+@lru_cache(maxsize=256)
+def existing_timecard_ids(tables: Tuple[str, ...]):
+    return text(_across(_EXISTING_TIMECARD_IDS, tables)).bindparams(bindparam('ids', type_=Integer, expanding=True))
+
+
+@lru_cache(maxsize=256)
+def timecard_entries_between(tables: Tuple[str, ...]):
+    return text(_across(_TIMECARD_ENTRIES_BETWEEN, tables)).bindparams(EMPLOYEE_ID, START_DATE, END_DATE)
+
+
+@lru_cache(maxsize=256)
+def timecard_report(tables: Tuple[str, ...]):
+    # A UNION is ordered by its result columns; a single SELECT has to qualify them, as employee also has an id.
+    order_by = ' ORDER BY t.employee_id, t.timecard_date, t.id' if len(tables) == 1 else \
+        ' ORDER BY employee_id, timecard_date, id'
+    return text(_across(_TIMECARD_REPORT, tables) + order_by).bindparams(START_DATE, END_DATE)
+
+
+TIMECARD_ENTRIES_BETWEEN = timecard_entries_between(HOT_TABLES)
+
+TIMECARD_REPORT = timecard_report(HOT_TABLES)
+
+EXPORT_EMPLOYEES = text('''
+    SELECT id,
+           first_name,
+           last_name,
+           user_principal_name
+    FROM employee
+    ORDER BY id
+''')
+
+@lru_cache(maxsize=16)
+def export_timecards(tables: Tuple[str, ...]):
+    return text(_across('''
+        SELECT id,
+               employee_id,
+               timecard_date,
+               hours,
+               location,
+               description,
+               created_ts,
+               modified_ts,
+               created_by,
+               last_modified_by
+        FROM {table}
+    ''', tables) + ' ORDER BY id')
+
+TIMECARD_BY_ID = text('''
+    SELECT employee_id,
+           timecard_date
+    FROM timecard
+    WHERE id = :id
+''').bindparams(TIMECARD_ID)
+
+TIMECARDS_BY_IDS = text('''
+    SELECT id,
+           employee_id,
+           timecard_date
+    FROM timecard
+    WHERE id IN :ids
+''').bindparams(bindparam('ids', type_=Integer, expanding=True))
+
+INSERT_TIMECARD = text('''
+    INSERT INTO timecard (
+        employee_id,
+        timecard_date,
+        hours,
+        location,
+        description,
+        created_ts,
+        modified_ts,
+        created_by,
+        last_modified_by
+    ) VALUES (
+        :employee_id,
+        :timecard_date,
+        :hours,
+        :location,
+        :description,
+        :created_ts,
+        :modified_ts,
+        :created_by,
+        :last_modified_by
+    )
+''').bindparams(EMPLOYEE_ID, HOURS)
+
+# Bulk import keeps the exported id; a NULL id is assigned a new one.
+IMPORT_TIMECARD = text('''
+    INSERT INTO timecard (
+        id,
+        employee_id,
+        timecard_date,
+        hours,
+        location,
+        description,
+        created_ts,
+        modified_ts,
+        created_by,
+        last_modified_by
+    ) VALUES (
+        :id,
+        :employee_id,
+        :timecard_date,
+        :hours,
+        :location,
+        :description,
+        :created_ts,
+        :modified_ts,
+        :created_by,
+        :last_modified_by
+    )
+''').bindparams(EMPLOYEE_ID, HOURS)
+
+UPDATE_TIMECARD = text('''
+    UPDATE timecard
+    SET
+        hours = :hours,
+        location = :location,
+        description = :description,
+        modified_ts = :modified_ts,
+        last_modified_by = :last_modified_by
+    WHERE id = :id
+''').bindparams(TIMECARD_ID, HOURS)
+
+DELETE_TIMECARD = text('''
+    DELETE FROM timecard
+    WHERE id = :id
+''').bindparams(TIMECARD_ID)
+
+# Ownership-checked variants for non-admins: the employee_id predicate makes a timecard owned by someone else match no
+# rows, so the ownership check and the write are one statement.
+UPDATE_OWN_TIMECARD = text('''
+    UPDATE timecard
+    SET
+        hours = :hours,
+        location = :location,
+        description = :description,
+        modified_ts = :modified_ts,
+        last_modified_by = :last_modified_by
+    WHERE id = :id
+    AND employee_id = :employee_id
+''').bindparams(TIMECARD_ID, HOURS, EMPLOYEE_ID)
+
+DELETE_OWN_TIMECARD = text('''
+    DELETE FROM timecard
+    WHERE id = :id
+    AND employee_id = :employee_id
+''').bindparams(TIMECARD_ID, EMPLOYEE_ID)
+
+# timecard_daily_totals upsert that adds the inserted hours and entry count to an existing row, per dialect.
+UPSERT_DAILY_TOTALS = {
+    'mysql': text('''
+        INSERT INTO timecard_daily_totals (employee_id, timecard_date, total_hours, entry_count, version, modified_ts)
+        VALUES (:employee_id, :timecard_date, :hours, :entry_count, 1, :modified_ts)
+        ON DUPLICATE KEY UPDATE
+            total_hours = total_hours + VALUES(total_hours),
+            entry_count = entry_count + VALUES(entry_count),
+            version = version + 1,
+            modified_ts = GREATEST(COALESCE(modified_ts, VALUES(modified_ts)), VALUES(modified_ts))
+    ''').bindparams(EMPLOYEE_ID, HOURS),
+    'sqlite': text('''
+        INSERT INTO timecard_daily_totals (employee_id, timecard_date, total_hours, entry_count, version, modified_ts)
+        VALUES (:employee_id, :timecard_date, :hours, :entry_count, 1, :modified_ts)
+        ON CONFLICT (employee_id, timecard_date) DO UPDATE SET
+            total_hours = total_hours + excluded.total_hours,
+            entry_count = entry_count + excluded.entry_count,
+            version = version + 1,
+            modified_ts = MAX(COALESCE(modified_ts, excluded.modified_ts), excluded.modified_ts)
+    ''').bindparams(EMPLOYEE_ID, HOURS)
+}
+
+ADJUST_DAILY_TOTALS_FOR_UPDATE = text('''
+    UPDATE timecard_daily_totals
+    SET total_hours = total_hours + :hours - (SELECT hours FROM timecard WHERE id = :id),
+        version = version + 1,
+        modified_ts = :modified_ts
+    WHERE employee_id = (SELECT employee_id FROM timecard WHERE id = :id)
+    AND timecard_date = (SELECT DATE(timecard_date) FROM timecard WHERE id = :id)
+''').bindparams(TIMECARD_ID, HOURS)
+
+ADJUST_OWN_DAILY_TOTALS_FOR_UPDATE = text('''
+    UPDATE timecard_daily_totals
+    SET total_hours = total_hours + :hours - (SELECT hours FROM timecard WHERE id = :id),
+        version = version + 1,
+        modified_ts = :modified_ts
+    WHERE employee_id = :employee_id
+    AND timecard_date = (SELECT DATE(timecard_date) FROM timecard WHERE id = :id AND employee_id = :employee_id)
+''').bindparams(TIMECARD_ID, HOURS, EMPLOYEE_ID)
+
+ADJUST_DAILY_TOTALS_FOR_DELETE = text('''
+    UPDATE timecard_daily_totals
+    SET total_hours = total_hours - (SELECT hours FROM timecard WHERE id = :id),
+        entry_count = entry_count - 1,
+        version = version + 1,
+        modified_ts = :modified_ts
+    WHERE employee_id = (SELECT employee_id FROM timecard WHERE id = :id)
+    AND timecard_date = (SELECT DATE(timecard_date) FROM timecard WHERE id = :id)
+''').bindparams(TIMECARD_ID)
+
+ADJUST_OWN_DAILY_TOTALS_FOR_DELETE = text('''
+    UPDATE timecard_daily_totals
+    SET total_hours = total_hours - (SELECT hours FROM timecard WHERE id = :id),
+        entry_count = entry_count - 1,
+        version = version + 1,
+        modified_ts = :modified_ts
+    WHERE employee_id = :employee_id
+    AND timecard_date = (SELECT DATE(timecard_date) FROM timecard WHERE id = :id AND employee_id = :employee_id)
+''').bindparams(TIMECARD_ID, EMPLOYEE_ID)
+
+CLEAR_DAILY_TOTALS = text('DELETE FROM timecard_daily_totals')
+
+_DAILY_TOTALS = '''
+    SELECT employee_id,
+           DATE(timecard_date) as timecard_date,
+           SUM(hours) as total_hours,
+           COUNT(*) as entry_count,
+           MAX(modified_ts) as modified_ts
+    FROM {table}
+    GROUP BY employee_id, DATE(timecard_date)
+'''
+
+
+def _daily_totals_across(tables: Tuple[str, ...]) -> str:
+    if len(tables) == 1:
+        return _DAILY_TOTALS.format(table=tables[0])
+    # A timecard is in exactly one table at any time, but a day being archived can be split between two of them.
+    return f'''
+        SELECT employee_id,
+               timecard_date,
+               SUM(total_hours) as total_hours,
+               SUM(entry_count) as entry_count,
+               MAX(modified_ts) as modified_ts
+        FROM ({_across(_DAILY_TOTALS, tables)}) daily_totals
+        GROUP BY employee_id, timecard_date
+    '''
+
+
+@lru_cache(maxsize=16)
+def rebuild_daily_totals(tables: Tuple[str, ...]):
+    return text('''
+        INSERT INTO timecard_daily_totals (employee_id, timecard_date, total_hours, entry_count, modified_ts)
+    ''' + _daily_totals_across(tables))
+
+
+@lru_cache(maxsize=16)
+def expected_daily_totals(tables: Tuple[str, ...]):
+    return text(_daily_totals_across(tables))
+
+
+STORED_DAILY_TOTALS = text('''
+    SELECT employee_id,
+           timecard_date,
+           total_hours,
+           entry_count
+    FROM timecard_daily_totals
+    WHERE entry_count <> 0 OR total_hours <> 0
+''')
+
+SESSION_COUNTS = text('''
+    SELECT COUNT(*) AS total_rows,
+           COALESCE(SUM(CASE WHEN expiry < :now THEN 1 ELSE 0 END), 0) AS expired_rows
+    FROM session
+''').bindparams(bindparam('now', type_=DateTime))
+
+SESSION_LOOKUP = text('''
+    SELECT id,
+           expiry
+    FROM session
+    WHERE session_id = :session_id
+''').bindparams(bindparam('session_id', type_=String))
+
+# Deletes at most :batch_size expired sessions, oldest first, walking the expiry index. SQLite has no DELETE ... LIMIT
+# unless compiled with it, so it selects the ids first.
+PRUNE_EXPIRED_SESSIONS = {
+    'mysql': text('''
+        DELETE FROM session
+        WHERE expiry < :now
+        ORDER BY expiry
+        LIMIT :batch_size
+    ''').bindparams(bindparam('now', type_=DateTime), bindparam('batch_size', type_=Integer)),
+    'sqlite': text('''
+        DELETE FROM session
+        WHERE id IN (
+            SELECT id
+            FROM session
+            WHERE expiry < :now
+            ORDER BY expiry
+            LIMIT :batch_size
+        )
+    ''').bindparams(bindparam('now', type_=DateTime), bindparam('batch_size', type_=Integer))
+}
+
+ARCHIVED_YEARS = text('''
+    SELECT year,
+           archived_ts
+    FROM timecard_archive_years
+''')
+
+REGISTER_ARCHIVE_YEAR = {
+    'mysql': text('INSERT IGNORE INTO timecard_archive_years (year) VALUES (:year)'),
+    'sqlite': text('INSERT OR IGNORE INTO timecard_archive_years (year) VALUES (:year)')
+}
+
+COMPLETE_ARCHIVE_YEAR = text('''
+    UPDATE timecard_archive_years
+    SET archived_ts = :archived_ts
+    WHERE year = :year
+''').bindparams(bindparam('archived_ts', type_=DateTime))
+
+UNARCHIVED_ROW_COUNT = text('''
+    SELECT COUNT(*)
+    FROM timecard
+    WHERE timecard_date >= :start_date
+    AND timecard_date < :end_date
+''').bindparams(START_DATE, END_DATE)
+
+# Locks the batch on MySQL so an update cannot land between the copy and the delete.
+NEXT_ROWS_TO_ARCHIVE = {
+    dialect: text(f'''
+        SELECT id
+        FROM timecard
+        WHERE timecard_date >= :start_date
+        AND timecard_date < :end_date
+        ORDER BY id
+        LIMIT :batch_size
+        {lock}
+    ''').bindparams(START_DATE, END_DATE, bindparam('batch_size', type_=Integer))
+    for dialect, lock in (('mysql', 'FOR UPDATE'), ('sqlite', ''))
+}
+
+DELETE_TIMECARDS_BY_IDS = text('''
+    DELETE FROM timecard
+    WHERE id IN :ids
+''').bindparams(bindparam('ids', type_=Integer, expanding=True))
+
+TIMECARD_COLUMNS = 'id, employee_id, timecard_date, hours, location, description, created_ts, modified_ts, ' \
+                   'created_by, last_modified_by'
+
+
+def create_archive_table(dialect: str, table: str) -> list:
+    """DDL for an archive table with the timecard table's columns and (employee_id, timecard_date) index."""
+    if dialect == 'mysql':
+        return [text(f'CREATE TABLE IF NOT EXISTS {table} LIKE timecard')]
+    return [text(f'''
+        CREATE TABLE IF NOT EXISTS {table} (
+            id               INTEGER PRIMARY KEY,
+            employee_id      VARCHAR(32) NOT NULL,
+            timecard_date    DATE        NOT NULL,
+            hours            DECIMAL(4, 2),
+            location         VARCHAR(255),
+            description      VARCHAR(255),
+            created_ts       DATETIME,
+            modified_ts      DATETIME,
+            created_by       VARCHAR(255),
+            last_modified_by VARCHAR(255)
+        )
+    '''), text(f'CREATE INDEX IF NOT EXISTS ix_{table}_employee_date ON {table} (employee_id, timecard_date)')]
+
+
+@lru_cache(maxsize=64)
+def copy_to_archive(table: str):
+    return text(f'''
+        INSERT INTO {table} ({TIMECARD_COLUMNS})
+        SELECT {TIMECARD_COLUMNS}
+        FROM timecard
+        WHERE id IN :ids
+    ''').bindparams(bindparam('ids', type_=Integer, expanding=True))
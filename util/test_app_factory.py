@@ -0,0 +1,64 @@
+import importlib
+from os import environ, path
+import runpy
+import sqlite3
+import sys
+import tempfile
+from unittest import mock, TestCase
+
+from benchmarks import load_test
+from benchmarks.sqlite_schema import create_schema
+from util import app_logger, auth_util, metrics_util
+from util.sql_util import SQLUtil
+
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+
+
+class TestWorkerStart(TestCase):
+    """create_app and gunicorn's post_fork hook, with the per-process resources replaced by mocks."""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        database = path.join(directory, 'timecards.db')
+        with sqlite3.connect(database) as connection:
+            create_schema(connection)
+        self.patch(mock.patch.dict(environ))
+        load_test.configure_environment(database)
+        environ['METRICS_DIR'] = directory
+        self.jwks_store = self.patch(mock.patch.object(auth_util, 'jwks_store'))
+        self.start_listener = self.patch(mock.patch.object(app_logger, 'start_listener'))
+        self.metrics_directory = self.patch(mock.patch.object(metrics_util, 'metrics_directory'))
+        self.dispose_engines = self.patch(mock.patch.object(SQLUtil, 'dispose_engines'))
+        self.worker_resources = (self.dispose_engines, self.start_listener, self.jwks_store.start,
+                                 self.metrics_directory.start)
+
+    def patch(self, patcher):
+        mocked = patcher.start()
+        self.addCleanup(patcher.stop)
+        return mocked
+
+    def test_deferred_start_leaves_worker_resources_to_post_fork(self):
+        environ['DEFER_WORKER_START'] = '1'
+        sys.modules.pop('wsgi', None)
+        self.addCleanup(sys.modules.pop, 'wsgi', None)
+        app = importlib.import_module('wsgi').app
+        self.jwks_store.refresh.assert_called_once_with()
+        for resource in self.worker_resources:
+            resource.assert_not_called()
+
+        config = runpy.run_path(path.join(ROOT, 'gunicorn.conf.py'))
+        self.assertIn('DEFER_WORKER_START=1', config['raw_env'])
+        server = mock.Mock()
+        server.app.wsgi.return_value = app
+        config['post_fork'](server, mock.Mock())
+        for resource in self.worker_resources:
+            resource.assert_called_once_with()
+        self.jwks_store.refresh.assert_called_once_with()
+
+    def test_create_app_starts_worker_resources_once(self):
+        from app import create_app
+
+        create_app()
+        for resource in self.worker_resources:
+            resource.assert_called_once_with()
+        self.jwks_store.refresh.assert_not_called()
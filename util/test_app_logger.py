@@ -0,0 +1,67 @@
+import json
+import logging
+from queue import Queue
+import sys
+from unittest import TestCase
+
+from flask import Flask
+
+from util import app_logger
+from util.app_logger import CorrelationIdFilter, DroppingQueueHandler, JSONFormatter, SamplingFilter
+
+
+def make_record(level=logging.INFO, msg='hello %s', args=('world',), exc_info=None) -> logging.LogRecord:
+    return logging.LogRecord('test', level, __file__, 1, msg, args, exc_info)
+
+
+class TestAppLogger(TestCase):
+    def test_create_logger_adds_one_handler_per_logger(self):
+        logger = app_logger.create_logger('test-app-logger', True)
+        app_logger.create_logger('test-app-logger', True)
+        self.assertEqual(1, len(logger.handlers))
+        self.assertIs(logger.handlers[0], app_logger.create_logger('test-app-logger-other', True).handlers[0])
+
+    def test_full_queue_drops_and_counts(self):
+        handler = DroppingQueueHandler(Queue(maxsize=1))
+        handler.handle(make_record())
+        handler.handle(make_record())
+        self.assertEqual(1, handler.queue.qsize())
+        self.assertEqual(1, handler.dropped)
+
+    def test_prepare_renders_message_and_exception(self):
+        try:
+            raise ValueError('boom')
+        except ValueError:
+            record = DroppingQueueHandler(Queue()).prepare(make_record(exc_info=sys.exc_info()))
+        self.assertEqual('hello world', record.getMessage())
+        self.assertIsNone(record.exc_info)
+        self.assertIn('ValueError: boom', record.exc_text)
+
+    def test_sampling_filter_keeps_warnings_and_unsampled_records(self):
+        sampler = SamplingFilter(0)
+        self.assertFalse(sampler.filter(make_record()))
+        self.assertTrue(sampler.filter(make_record(level=logging.WARNING)))
+        record = make_record()
+        record.unsampled = True
+        self.assertTrue(sampler.filter(record))
+
+    def test_json_formatter_includes_request_correlation_id(self):
+        app = Flask(__name__)
+        app_logger.init_request_logging(app)
+        with app.test_request_context(headers={'X-Request-ID': 'abc-123'}):
+            app.preprocess_request()
+            record = make_record()
+            CorrelationIdFilter().filter(record)
+        entry = json.loads(JSONFormatter().format(record))
+        self.assertEqual('hello world', entry['message'])
+        self.assertEqual('abc-123', entry['correlation_id'])
+        self.assertEqual('INFO', entry['level'])
+
+    def test_invalid_correlation_id_is_replaced(self):
+        app = Flask(__name__)
+        app_logger.init_request_logging(app)
+        with app.test_request_context(headers={'X-Request-ID': 'x' * 65}):
+            app.preprocess_request()
+            record = make_record()
+            CorrelationIdFilter().filter(record)
+        self.assertRegex(record.correlation_id, r'^[0-9a-f]{32}$')
@@ -0,0 +1,19 @@
+from unittest import TestCase
+
+from util.auth_util import employee_from_identity
+
+
+def identity(name: str) -> dict:
+    return {'employee_id': 'abc', 'name': name, 'user_principal_name': 'ada@example.com'}
+
+
+class TestEmployeeFromIdentity(TestCase):
+    def test_splits_first_word_from_the_rest(self):
+        self.assertEqual(('Ada', 'Lovelace'), self.names('Ada Lovelace'))
+        self.assertEqual(('Mary', 'Ann de la Cruz'), self.names(' Mary Ann de la Cruz '))
+        self.assertEqual(('Cher', ''), self.names('Cher'))
+
+    @staticmethod
+    def names(name: str) -> tuple:
+        employee = employee_from_identity(identity(name))
+        return employee['first_name'], employee['last_name']
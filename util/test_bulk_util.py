@@ -0,0 +1,73 @@
+from datetime import datetime
+import os
+import tempfile
+from unittest import TestCase
+
+from werkzeug.exceptions import BadRequest
+
+from util import bulk_util
+
+
+def timecard(employee_id='e1', hours='2.5', description='Work'):
+    return {'id': 1, 'employee_id': employee_id, 'timecard_date': '2024-03-01', 'hours': hours, 'location': 'Office',
+            'description': description, 'created_ts': '2024-03-01 17:00:00', 'modified_ts': '2024-03-01 17:00:00',
+            'created_by': 'Ada', 'last_modified_by': 'Ada'}
+
+
+class TestBulkUtil(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def test_export_splits_files_and_reads_back(self):
+        for file_format in bulk_util.EXPORT_FORMATS:
+            files = []
+            written = bulk_util.export_rows((timecard() for _ in range(5)), 'timecard', self.directory, file_format,
+                                            rows_per_file=2, on_file=lambda path, rows: files.append(rows))
+            self.assertEqual(5, written)
+            self.assertEqual([2, 2, 1], files)
+            records = list(bulk_util.read_rows(os.path.join(self.directory, f'timecard-00003.{file_format}')))
+            self.assertEqual(2.5, bulk_util.timecard_row(records[0])['hours'])
+
+    def test_datetime_timecard_date_round_trips_as_a_date(self):
+        exported = {**timecard(), 'timecard_date': datetime(2024, 3, 1), 'created_ts': datetime(2024, 3, 1, 17)}
+        for file_format in bulk_util.EXPORT_FORMATS:
+            bulk_util.export_rows([exported], 'timecard', self.directory, file_format)
+            record, = bulk_util.read_rows(os.path.join(self.directory, f'timecard-00001.{file_format}'))
+            row = bulk_util.timecard_row(record)
+            self.assertEqual(('2024-03-01', '2024-03-01 17:00:00'), (row['timecard_date'], row['created_ts']))
+
+    def test_timecard_row_applies_api_validation(self):
+        self.assertEqual('Ada', bulk_util.timecard_row(timecard())['created_by'])
+        self.assertIsNone(bulk_util.timecard_row(timecard(description=''))['description'])
+        for invalid in (timecard(hours='2.555'), timecard(employee_id='e-1'), timecard(description='<script>')):
+            with self.assertRaises(BadRequest):
+                bulk_util.timecard_row(invalid)
+
+    def test_timecard_row_rejects_archived_years(self):
+        with self.assertRaisesRegex(BadRequest, 'archived and read-only'):
+            bulk_util.timecard_row(timecard(), is_archived=lambda year: year == 2024)
+        self.assertEqual('2024-03-01', bulk_util.timecard_row(timecard(), lambda year: year == 2023)['timecard_date'])
+
+    def test_import_resumes_after_invalid_record(self):
+        path = os.path.join(self.directory, 'timecard-00001.csv')
+        bulk_util.export_rows([timecard(), timecard(), timecard(hours='x'), timecard()], 'timecard', self.directory)
+        checkpoint = bulk_util.ImportCheckpoint(os.path.join(self.directory, '.import-timecard.json'))
+        loaded = []
+        with self.assertRaisesRegex(ValueError, 'record 3'):
+            bulk_util.import_file(path, bulk_util.timecard_row, loaded.append, checkpoint, batch_size=2)
+        self.assertEqual([2], [len(batch) for batch in loaded])
+
+        bulk_util.export_rows([timecard()] * 4, 'timecard', self.directory)
+        resumed = bulk_util.ImportCheckpoint(checkpoint.path)
+        self.assertEqual(2, bulk_util.import_file(path, bulk_util.timecard_row, loaded.append, resumed, batch_size=2))
+        self.assertEqual(4, resumed.done(path))
+
+    def test_skip_invalid_reports_and_continues(self):
+        path = os.path.join(self.directory, 'timecard-00001.csv')
+        bulk_util.export_rows([timecard(hours='x'), timecard()], 'timecard', self.directory)
+        invalid = []
+        loaded = bulk_util.import_file(path, bulk_util.timecard_row, lambda batch: None,
+                                       bulk_util.ImportCheckpoint(os.path.join(self.directory, 'checkpoint.json')),
+                                       skip_invalid=True, on_invalid=lambda number, reason: invalid.append(number))
+        self.assertEqual(1, loaded)
+        self.assertEqual([1], invalid)
@@ -0,0 +1,102 @@
+from os import environ, path
+import sqlite3
+import tempfile
+from unittest import mock, TestCase
+
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+
+from benchmarks.sqlite_schema import create_schema
+from util.cache_util import CachedSQLUtil, InProcessCacheBackend, LocalSharedCacheClient, months_between, QueryCache, \
+    SharedCacheBackend
+from util.sql_util import init_query_cache
+from util.type_util import TimecardEntry
+
+
+class TestQueryCache(TestCase):
+    def setUp(self):
+        self.loads = 0
+
+    def load(self, value):
+        def loader():
+            self.loads += 1
+            return value
+
+        return loader
+
+    def assert_invalidation(self, cache: QueryCache):
+        cache.get_or_load('hours', 'e1', ['2024-01'], ('2024', '1'), self.load([1]))
+        cache.get_or_load('hours', 'e1', ['2024-02'], ('2024', '2'), self.load([2]))
+        cache.invalidate('e1', '2024-01-15')
+        self.assertEqual([1], cache.get_or_load('hours', 'e1', ['2024-01'], ('2024', '1'), self.load([1])))
+        self.assertEqual([2], cache.get_or_load('hours', 'e1', ['2024-02'], ('2024', '2'), self.load([2])))
+        self.assertEqual(3, self.loads)
+        self.assertEqual({'hits': 1, 'misses': 3, 'hit_rate': 0.25}, cache.stats())
+
+    def test_invalidate_in_process_backend_by_month(self):
+        self.assert_invalidation(QueryCache(InProcessCacheBackend()))
+
+    def test_invalidate_shared_backend_by_month(self):
+        self.assert_invalidation(QueryCache(SharedCacheBackend(LocalSharedCacheClient())))
+
+    def test_invalidate_employee_without_date(self):
+        cache = QueryCache(InProcessCacheBackend())
+        cache.get_or_load('info', 'e1', [], (), self.load({}))
+        cache.invalidate('e1')
+        cache.get_or_load('info', 'e1', [], (), self.load({}))
+        self.assertEqual(2, self.loads)
+
+
+class TestInProcessCacheBackend(TestCase):
+    def test_set_evicts_least_recently_used_but_keeps_counters(self):
+        backend = InProcessCacheBackend(max_size=2)
+        backend.incr('gen')
+        backend.set('a', 1)
+        backend.set('b', 2)
+        backend.get('a')
+        backend.set('c', 3)
+        self.assertIsNone(backend.get('b'))
+        self.assertEqual(1, backend.get('a'))
+        self.assertEqual(1, backend.counter('gen'))
+
+    def test_months_between_spans_year_end(self):
+        self.assertEqual(['2023-12', '2024-01'], months_between('2023-12-20', '2024-01-10'))
+
+
+class TestCachedSQLUtilAcrossWorkers(TestCase):
+    def setUp(self):
+        database = path.join(tempfile.mkdtemp(), 'timecards.db')
+        with sqlite3.connect(database) as connection:
+            create_schema(connection)
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{database}'
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db = SQLAlchemy(self.app)
+        # Two workers: one database, each with its own in-process cache.
+        self.reader = CachedSQLUtil(db, QueryCache(InProcessCacheBackend()))
+        self.writer = CachedSQLUtil(db, QueryCache(InProcessCacheBackend()))
+
+    def create_timecard(self, hours: float) -> None:
+        timecard = TimecardEntry({'hours': hours, 'location': 'Office', 'description': 'Work', 'date': 1704067200})
+        timecard.employee_id = 'e1'
+        self.writer.create_timecard(timecard, 'Owner')
+
+    def hours(self) -> list:
+        validator = self.reader.get_timecard_validator('e1', '2024-01-01', '2024-02-01')
+        return self.reader.get_daily_hours_worked('e1', '2024', '1', validator)
+
+    def test_results_keyed_on_the_validator_see_another_workers_write(self):
+        with self.app.app_context():
+            self.create_timecard(2)
+            self.assertEqual([{'timecard_date': '2024-01-01', 'total_hours': 2}], self.hours())
+            self.assertEqual([{'timecard_date': '2024-01-01', 'total_hours': 2}], self.hours())
+            self.assertEqual(1, self.reader.query_cache.hits)
+            self.create_timecard(3)
+            self.assertEqual([{'timecard_date': '2024-01-01', 'total_hours': 5}], self.hours())
+
+    def test_in_process_cache_is_refused_with_several_workers(self):
+        with mock.patch.dict(environ, {'GUNICORN_WORKERS': '4'}):
+            environ.pop('QUERY_CACHE_REDIS_URL', None)
+            self.assertRaises(RuntimeError, init_query_cache, Flask(__name__))
+            environ['GUNICORN_WORKERS'] = '1'
+            self.assertIsInstance(init_query_cache(Flask(__name__)).backend, InProcessCacheBackend)
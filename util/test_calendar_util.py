@@ -0,0 +1,47 @@
+from datetime import date
+import struct
+from unittest import TestCase
+
+from werkzeug.exceptions import BadRequest
+
+from util import calendar_util, validation_util
+
+
+class TestCalendarUtil(TestCase):
+    rows = [
+        {'timecard_date': '2024-01-01', 'total_hours': 8},
+        {'timecard_date': date(2024, 2, 29), 'total_hours': 7.25},
+        {'timecard_date': '2024-12-31 00:00:00', 'total_hours': 1.5}
+    ]
+
+    def test_year_hours_is_dense_by_day_of_year(self):
+        hours = calendar_util.year_hours(self.rows, 2024)
+        self.assertEqual(366, len(hours))
+        self.assertEqual(365, len(calendar_util.year_hours([], 2023)))
+        self.assertEqual(8, hours[0])
+        self.assertEqual(7.25, hours[59])
+        self.assertEqual(1.5, hours[365])
+        self.assertEqual(16.75, sum(hours))
+
+    def test_encodings(self):
+        hours = calendar_util.year_hours([{'timecard_date': '2023-01-02', 'total_hours': 7.3}], 2023)
+        self.assertEqual([0, 7.3, 0], calendar_util.to_json(hours)[0:3])
+
+        float32 = calendar_util.to_float32(hours)
+        self.assertEqual(365 * 4, len(float32))
+        self.assertAlmostEqual(7.3, struct.unpack_from('<f', float32, 4)[0], places=5)
+
+        uint16 = calendar_util.to_uint16(hours)
+        self.assertEqual(365 * 2, len(uint16))
+        self.assertEqual(730, struct.unpack_from('<H', uint16, 2)[0])
+        self.assertEqual(0, struct.unpack_from('<H', uint16, 0)[0])
+
+    def test_uint16_saturates(self):
+        hours = calendar_util.year_hours([{'timecard_date': '2023-01-01', 'total_hours': 1000}], 2023)
+        self.assertEqual(0xFFFF, struct.unpack_from('<H', calendar_util.to_uint16(hours))[0])
+
+    def test_validate_year_calendar_request(self):
+        validation_util.validate_year_calendar_request('2024', 'uint16')
+        self.assertRaises(BadRequest, validation_util.validate_year_calendar_request, '2024', 'csv')
+        self.assertRaises(BadRequest, validation_util.validate_year_calendar_request, '0', 'json')
+        self.assertRaises(BadRequest, validation_util.validate_year_calendar_request, '99999', 'json')
@@ -0,0 +1,81 @@
+import gzip
+import json
+from unittest import TestCase
+import zlib
+
+from flask import Flask, jsonify, Response
+
+from util import app_util, compression_util
+
+ROWS = [{'id': index, 'description': 'Synthetic entry'} for index in range(200)]
+
+
+def make_app() -> Flask:
+    app = Flask(__name__)
+    compressor = compression_util.init_compression(app)
+    app.config['COMPRESSOR'] = compressor
+
+    @app.route('/rows')
+    def rows():
+        return jsonify(ROWS)
+
+    @app.route('/small')
+    def small():
+        return jsonify([])
+
+    @app.route('/validated')
+    def validated():
+        return app_util.conditional_json('rows', {'entry_count': 1, 'last_modified': None, 'version': 1}, lambda: ROWS)
+
+    @app.route('/stream')
+    def stream():
+        return Response((f'{index}\n' for index in range(1000)), mimetype='application/x-ndjson')
+
+    return app
+
+
+class TestResponseCompressor(TestCase):
+    def setUp(self):
+        self.app = make_app()
+        self.client = self.app.test_client()
+
+    def test_gzip_body_is_cached_and_varies_on_accept_encoding(self):
+        first = self.client.get('/rows', headers={'Accept-Encoding': 'gzip'})
+        second = self.client.get('/rows', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual('gzip', first.headers['Content-Encoding'])
+        self.assertIn('Accept-Encoding', first.headers['Vary'])
+        self.assertEqual(ROWS, json.loads(gzip.decompress(second.data)))
+        self.assertEqual((1, 1), (self.app.config['COMPRESSOR'].hits, self.app.config['COMPRESSOR'].misses))
+
+    def test_prefers_brotli_when_installed(self):
+        response = self.client.get('/rows', headers={'Accept-Encoding': 'gzip, br'})
+        if compression_util.brotli is None:
+            self.assertEqual('gzip', response.headers['Content-Encoding'])
+        else:
+            self.assertEqual('br', response.headers['Content-Encoding'])
+            self.assertEqual(ROWS, json.loads(compression_util.brotli.decompress(response.data)))
+
+    def test_small_and_unaccepted_responses_are_left_alone(self):
+        self.assertNotIn('Content-Encoding', self.client.get('/small', headers={'Accept-Encoding': 'gzip'}).headers)
+        response = self.client.get('/rows')
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+
+    def test_compressed_etag_is_weak_and_still_revalidates(self):
+        response = self.client.get('/validated', headers={'Accept-Encoding': 'gzip'})
+        self.assertTrue(response.headers['ETag'].startswith('W/'))
+        revalidated = self.client.get('/validated', headers={'Accept-Encoding': 'gzip',
+                                                            'If-None-Match': response.headers['ETag']})
+        self.assertEqual(304, revalidated.status_code)
+        self.assertEqual(response.headers['ETag'], revalidated.headers['ETag'])
+        identity = self.client.get('/validated')
+        self.assertFalse(identity.headers['ETag'].startswith('W/'))
+        revalidated = self.client.get('/validated', headers={'If-None-Match': identity.headers['ETag']})
+        self.assertEqual((304, identity.headers['ETag']), (revalidated.status_code, revalidated.headers['ETag']))
+
+    def test_streamed_response_is_compressed_incrementally(self):
+        response = self.client.get('/stream', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual('gzip', response.headers['Content-Encoding'])
+        self.assertNotIn('Content-Length', response.headers)
+        body = zlib.decompress(response.data, 31).decode('utf-8')
+        self.assertEqual(''.join(f'{index}\n' for index in range(1000)), body)
@@ -0,0 +1,38 @@
+from unittest import TestCase
+
+from util.directory_util import EmployeeDirectory
+
+
+class TestEmployeeDirectory(TestCase):
+    def setUp(self):
+        self.employees = [
+            {'id': 'c3', 'first_name': 'Ada', 'last_name': 'Lovelace'},
+            {'id': 'a1', 'first_name': 'Alan', 'last_name': 'Turing'},
+            {'id': 'b2', 'first_name': 'Grace', 'last_name': 'Hopper'},
+        ]
+        self.loads = 0
+        self.directory = EmployeeDirectory(self.load)
+
+    def load(self):
+        self.loads += 1
+        return list(self.employees)
+
+    def test_page_uses_keyset_cursor(self):
+        first_page, cursor = self.directory.page(2)
+        self.assertEqual(['a1', 'b2'], [employee['id'] for employee in first_page])
+        second_page, cursor = self.directory.page(2, cursor)
+        self.assertEqual(['c3'], [employee['id'] for employee in second_page])
+        self.assertIsNone(cursor)
+        self.assertEqual(1, self.loads)
+
+    def test_page_searches_first_and_last_name_prefix(self):
+        self.assertEqual(['a1', 'c3'], [employee['id'] for employee in self.directory.page(10, query='a')[0]])
+        self.assertEqual(['b2'], [employee['id'] for employee in self.directory.page(10, query='hop')[0]])
+        self.assertEqual(['a1'], [employee['id'] for employee in self.directory.page(10, query='alan  t')[0]])
+
+    def test_invalidate_reloads_on_next_read(self):
+        self.directory.page()
+        self.employees.append({'id': 'd4', 'first_name': 'Edsger', 'last_name': 'Dijkstra'})
+        self.directory.invalidate()
+        self.assertEqual('Edsger', self.directory.get('d4')['first_name'])
+        self.assertEqual(2, self.loads)
@@ -0,0 +1,296 @@
+import csv
+from datetime import date, datetime
+import io
+import json
+from os import environ, path
+import sqlite3
+import tempfile
+from unittest import mock, TestCase
+
+from benchmarks import load_test
+from benchmarks.fake_idp import FakeIdentityProvider
+from benchmarks.sqlite_schema import create_schema
+from util import auth_util
+from util.app_util import STREAM_CHUNK_ROWS
+from util.type_util import TimecardEntry
+
+
+def timestamp(day: date) -> int:
+    return int(datetime(day.year, day.month, day.day).timestamp())
+
+
+class EmployeeApiTestCase(TestCase):
+    """Runs the app against a fresh SQLite database, logged in as employee e1 through the load test's fake IdP."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.idp = FakeIdentityProvider(load_test.TENANT_ID, load_test.APP_ID, key_size=1024)
+
+    def setUp(self):
+        self.database = path.join(tempfile.mkdtemp(), 'timecards.db')
+        with sqlite3.connect(self.database) as connection:
+            create_schema(connection)
+        for patcher in (mock.patch.dict(environ), mock.patch.object(auth_util, 'jwks_store'),
+                        mock.patch.object(auth_util, 'rate_limiter', None)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        load_test.configure_environment(self.database)
+        self.app = load_test.load_app(self.idp)
+        self.client = load_test.login(self.app, self.idp, 'e1', admin=False)
+        self.today = date.today()
+
+    def call(self, method: str, url: str, body=None, client=None, **headers):
+        return (client or self.client).open(url, method=method, json=body, headers=headers,
+                                            base_url=load_test.BASE_URL)
+
+    def entry(self, hours: float = 2, day: date = None) -> dict:
+        return {'hours': hours, 'location': 'Office', 'description': 'Work', 'date': timestamp(day or self.today)}
+
+    def save(self, employee_id: str, *entries: dict) -> None:
+        with self.app.app_context():
+            timecards = []
+            for entry in entries:
+                timecard = TimecardEntry(entry)
+                timecard.employee_id = employee_id
+                timecards.append(timecard)
+            self.app.config['DC_DB'].save_timecards(timecards, [], 'Seed')
+
+    def entries(self, employee_id: str = 'e1', day: date = None) -> list:
+        day = day or self.today
+        with self.app.app_context():
+            return self.app.config['DC_DB'].get_timecard_entries_between(employee_id, day.isoformat(), day.isoformat())
+
+
+class TestEmployeeList(EmployeeApiTestCase):
+    def test_list_is_served_to_administrators(self):
+        admin = load_test.login(self.app, self.idp, 'admin', admin=True)
+        response = self.call('GET', '/api/employee/list', client=admin)
+        self.assertEqual(200, response.status_code)
+        # Administrators are not provisioned as employees.
+        self.assertEqual(['e1'], [employee['id'] for employee in response.get_json()])
+        response = self.call('GET', '/api/employee/list?limit=1&q=Ada', client=admin)
+        self.assertEqual({'employees': [{'id': 'e1', 'first_name': 'Ada', 'last_name': 'Lovelace'}], 'next': None},
+                         response.get_json())
+        self.assertEqual(403, self.call('GET', '/api/employee/list').status_code)
+
+
+class TestEmployeeInfo(EmployeeApiTestCase):
+    def test_first_info_after_provisioning_reports_a_new_employee(self):
+        employee = {'id': 'e1', 'first_name': 'Ada', 'last_name': 'Lovelace',
+                    'user_principal_name': 'ada.lovelace@example.com'}
+        self.assertEqual({**employee, 'new_employee': True}, self.call('GET', '/api/employee/e1/info').get_json())
+        self.assertEqual(employee, self.call('GET', '/api/employee/e1/info').get_json())
+        client = load_test.login(self.app, self.idp, 'e1', admin=False)
+        self.assertEqual(employee, self.call('GET', '/api/employee/e1/info', client=client).get_json())
+
+
+class TestSaveTimecardBatch(EmployeeApiTestCase):
+    def test_mixed_batch_reports_a_status_per_entry(self):
+        self.save('e1', self.entry(1))
+        self.save('e2', self.entry(1))
+        own_id, other_id = self.entries()[0]['id'], self.entries('e2')[0]['id']
+
+        response = self.call('PUT', '/api/employee/e1/timecard/batch', [
+            self.entry(3),
+            {'id': own_id, 'hours': 5, 'location': 'Home', 'description': 'Edited'},
+            {'id': 999999, 'hours': 5, 'location': 'Home', 'description': 'Edited'},
+            {'id': other_id, 'hours': 5, 'location': 'Home', 'description': 'Edited'}
+        ])
+        self.assertEqual(200, response.status_code)
+        self.assertEqual([
+            {'index': 0, 'status': 'created'},
+            {'index': 1, 'id': own_id, 'status': 'updated'},
+            {'index': 2, 'id': 999999, 'status': 'not_found'},
+            {'index': 3, 'id': other_id, 'status': 'forbidden'}
+        ], response.get_json())
+        self.assertCountEqual([5, 3], [entry['hours'] for entry in self.entries()])
+        self.assertEqual(1, self.entries('e2')[0]['hours'])
+
+    def test_entries_changed_after_the_ownership_check_are_not_reported_updated(self):
+        self.save('e1', self.entry(1))
+        self.save('e2', self.entry(1))
+        own_id, other_id = self.entries()[0]['id'], self.entries('e2')[0]['id']
+        db = self.app.config['DC_DB']
+        lookup = db.get_timecards_by_ids
+        # The pre-check sees every entry as e1's, as if e2's entry and a deleted one changed after it ran.
+        stale_check = {timecard_id: {'id': timecard_id, 'employee_id': 'e1'}
+                       for timecard_id in (own_id, other_id, 999999)}
+        checks = iter([stale_check])
+        with mock.patch.object(db, 'get_timecards_by_ids', side_effect=lambda ids: next(checks, None) or lookup(ids)):
+            response = self.call('PUT', '/api/employee/e1/timecard/batch', [
+                {'id': own_id, 'hours': 5, 'location': 'Home', 'description': 'Edited'},
+                {'id': other_id, 'hours': 5, 'location': 'Home', 'description': 'Edited'},
+                {'id': 999999, 'hours': 5, 'location': 'Home', 'description': 'Edited'}
+            ])
+        self.assertEqual([
+            {'index': 0, 'id': own_id, 'status': 'updated'},
+            {'index': 1, 'id': other_id, 'status': 'forbidden'},
+            {'index': 2, 'id': 999999, 'status': 'not_found'}
+        ], response.get_json())
+        self.assertEqual([5], [entry['hours'] for entry in self.entries()])
+        self.assertEqual(1, self.entries('e2')[0]['hours'])
+
+    def test_invalid_batches_are_rejected_without_writing(self):
+        self.save('e1', self.entry(1))
+        own_id = self.entries()[0]['id']
+        update = {'id': own_id, 'hours': 5, 'location': 'Home', 'description': 'Edited'}
+        for body in (
+                self.entry(),
+                [],
+                [self.entry()] * 101,
+                [self.entry(), {**self.entry(), 'hours': '1.234'}],
+                [self.entry(), {**self.entry(), 'description': '<script>'}],
+                [update, update]
+        ):
+            self.assertEqual(400, self.call('PUT', '/api/employee/e1/timecard/batch', body).status_code)
+        self.assertEqual(403, self.call('PUT', '/api/employee/e2/timecard/batch', [self.entry()]).status_code)
+        self.assertEqual([1], [entry['hours'] for entry in self.entries()])
+
+
+class TestArchivedTimecards(EmployeeApiTestCase):
+    def test_archived_timecards_are_read_only(self):
+        day = date(self.today.year - 2, 6, 1)
+        self.save('e1', self.entry(1, day))
+        timecard_id = self.entries(day=day)[0]['id']
+        with self.app.app_context():
+            db = self.app.config['DC_DB']
+            db.start_archive(day.year)
+            db.archive_batch(day.year)
+            db.finish_archive(day.year)
+        update = {'id': timecard_id, 'hours': 5, 'location': 'Home', 'description': 'Edited'}
+        for method, url, body in (('PUT', '/api/employee/e1/timecard', update),
+                                  ('PUT', '/api/employee/e1/timecard/batch', [self.entry(), update]),
+                                  ('PUT', '/api/employee/e1/timecard', self.entry(2, day)),
+                                  ('DELETE', f'/api/employee/e1/timecard/{timecard_id}', None)):
+            self.assertEqual(400, self.call(method, url, body).status_code)
+        self.assertEqual([1], [entry['hours'] for entry in self.entries(day=day)])
+        self.assertEqual([], self.entries())
+        self.assertEqual(404, self.call('DELETE', '/api/employee/e1/timecard/999999').status_code)
+
+class TestTimecardRollup(EmployeeApiTestCase):
+    def test_invalid_rollup_requests_are_rejected(self):
+        admin = load_test.login(self.app, self.idp, 'admin', admin=True)
+        year = self.today.year
+        valid = {'startDate': f'{year}-01-01', 'endDate': f'{year}-03-31', 'payPeriodDays': 14,
+                 'payPeriodAnchor': '2024-01-01'}
+        self.assertEqual(200, self.call('POST', '/api/employee/timecard/rollup', valid, client=admin).status_code)
+        for body in ({'startDate': f'{year}-01-01'},
+                     {**valid, 'startDate': f'{year}-02-30'},
+                     {**valid, 'endDate': f'{year}-01'},
+                     {**valid, 'payPeriodDays': 32},
+                     {**valid, 'payPeriodAnchor': '2024-13-45'},
+                     {**valid, 'extra': True}):
+            self.assertEqual(400, self.call('POST', '/api/employee/timecard/rollup', body, client=admin).status_code)
+            self.assertEqual(400, self.call('POST', '/api/employee/e1/timecard/rollup', body).status_code)
+
+
+class TestTimecardReport(EmployeeApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = load_test.login(self.app, self.idp, 'admin', admin=True)
+        self.save('e1', *[self.entry(1) for _ in range(STREAM_CHUNK_ROWS)])
+        self.save('e2', *[self.entry(2) for _ in range(STREAM_CHUNK_ROWS + 1)])
+        self.dates = {'startDate': self.today.isoformat(), 'endDate': self.today.isoformat()}
+        # Imported once configure_environment has run: importing the app configures logging from the environment.
+        from blueprints.employee_blueprint import TIMECARD_REPORT_COLUMNS
+        self.columns = TIMECARD_REPORT_COLUMNS
+
+    def report(self, report_format: str):
+        response = self.call('POST', f'/api/employee/timecard/report?format={report_format}', self.dates,
+                             client=self.admin)
+        self.assertEqual(200, response.status_code)
+        self.assertTrue(response.is_streamed)
+        return response
+
+    def test_ndjson_report_streams_every_row_in_chunks(self):
+        response = self.report('ndjson')
+        self.assertEqual('application/x-ndjson', response.mimetype)
+        chunks = list(response.response)
+        self.assertEqual(3, len(chunks))
+        rows = [json.loads(line) for line in b''.join(chunks).decode('utf-8').splitlines()]
+        self.assertEqual(2 * STREAM_CHUNK_ROWS + 1, len(rows))
+        self.assertEqual(['e1'] * STREAM_CHUNK_ROWS + ['e2'] * (STREAM_CHUNK_ROWS + 1),
+                         [row['employee_id'] for row in rows])
+        self.assertEqual(self.columns, list(rows[0]))
+        self.assertEqual(('Ada', 'Lovelace', self.today.isoformat(), 1.0),
+                         (rows[0]['first_name'], rows[0]['last_name'], rows[0]['timecard_date'], rows[0]['hours']))
+        self.assertIsNone(rows[-1]['first_name'])
+
+    def test_csv_report_has_a_header_and_every_row(self):
+        response = self.report('csv')
+        self.assertEqual('text/csv', response.mimetype)
+        chunks = list(response.response)
+        self.assertEqual(3, len(chunks))
+        rows = list(csv.reader(io.StringIO(b''.join(chunks).decode('utf-8'))))
+        self.assertEqual(self.columns, rows[0])
+        self.assertEqual(2 * STREAM_CHUNK_ROWS + 1, len(rows) - 1)
+        self.assertEqual(['e2', '', ''], rows[-1][0:3])
+        self.assertEqual(2, float(rows[-1][5]))
+
+    def test_report_requires_an_administrator_and_valid_dates(self):
+        self.assertEqual(403, self.call('POST', '/api/employee/timecard/report', self.dates).status_code)
+        for query, body in (('?format=xml', self.dates),
+                            ('', {'startDate': self.today.isoformat()}),
+                            ('', {'startDate': '2024-02-01', 'endDate': '2024-01-01'}),
+                            ('', {'startDate': '2024-02-30', 'endDate': '2024-03-01'})):
+            response = self.call('POST', f'/api/employee/timecard/report{query}', body, client=self.admin)
+            self.assertEqual(400, response.status_code)
+
+
+class TestConditionalGet(EmployeeApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.save('e1', self.entry(1), self.entry(2))
+        self.url = f'/api/employee/e1/timecard/entries/{self.today.year}/{self.today.month}/{self.today.day}'
+
+    def get(self, **headers):
+        return self.call('GET', self.url, **headers)
+
+    def test_matching_etag_is_not_modified(self):
+        response = self.get()
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(2, len(response.get_json()))
+        etag = response.headers['ETag']
+        self.assertEqual(304, self.get(**{'If-None-Match': etag}).status_code)
+        self.assertEqual(304, self.get(**{'If-None-Match': f'W/{etag}'}).status_code)
+        self.assertEqual(200, self.get(**{'If-None-Match': '"other"'}).status_code)
+
+    def test_every_write_changes_the_etag(self):
+        etags = [self.get().headers['ETag']]
+        ids = {entry['hours']: entry['id'] for entry in self.entries()}
+        first, second = ids[1], ids[2]
+        writes = [
+            lambda: self.call('PUT', '/api/employee/e1/timecard', self.entry(3)),
+            # Both updates usually land within the same second, so the newest modified_ts alone would not move.
+            lambda: self.call('PUT', '/api/employee/e1/timecard',
+                              {'id': first, 'hours': 4, 'location': 'Home', 'description': 'Edited'}),
+            lambda: self.call('PUT', '/api/employee/e1/timecard',
+                              {'id': first, 'hours': 5, 'location': 'Home', 'description': 'Edited'}),
+            lambda: self.call('DELETE', f'/api/employee/e1/timecard/{second}')
+        ]
+        for write in writes:
+            self.assertEqual(204, write().status_code)
+            response = self.get(**{'If-None-Match': etags[-1]})
+            self.assertEqual(200, response.status_code)
+            etags.append(response.headers['ETag'])
+        self.assertEqual(len(etags), len(set(etags)))
+        self.assertCountEqual([5, 3], [entry['hours'] for entry in self.get().get_json()])
+
+    def test_if_modified_since_is_not_trusted_after_a_delete(self):
+        response = self.get()
+        last_modified = response.headers['Last-Modified']
+        self.assertTrue(last_modified.endswith('GMT'))
+        self.assertEqual(204, self.call('DELETE', f"/api/employee/e1/timecard/{self.entries()[0]['id']}").status_code)
+        response = self.get(**{'If-Modified-Since': last_modified})
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(1, len(response.get_json()))
+
+    def test_impossible_dates_are_rejected(self):
+        for url in ('/api/employee/e1/timecard/entries/2024/2/30', '/api/employee/e1/timecard/entries/2024/13/1',
+                    '/api/employee/e1/timecard/hours/2024/13'):
+            self.assertEqual(400, self.call('GET', url).status_code)
+        admin = load_test.login(self.app, self.idp, 'admin', admin=True)
+        for month in ('0', '13'):
+            response = self.call('GET', f'/api/employee/timecard/hours/2024/{month}', client=admin)
+            self.assertEqual(400, response.status_code)
+        self.assertEqual(200, self.call('GET', '/api/employee/timecard/hours/2024/12', client=admin).status_code)
@@ -0,0 +1,77 @@
+import base64
+from unittest import TestCase
+
+import rsa
+
+from util.jwks_util import JWKSStore, StaticJWKSSource
+
+
+def _b64(value: int) -> str:
+    raw = value.to_bytes((value.bit_length() + 7) // 8, 'big')
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+
+def _jwk(kid: str) -> dict:
+    public_key, _ = rsa.newkeys(512)
+    return {'kty': 'RSA', 'kid': kid, 'use': 'sig', 'n': _b64(public_key.n), 'e': _b64(public_key.e)}
+
+
+class TestJWKSStore(TestCase):
+    def setUp(self):
+        self.source = StaticJWKSSource([_jwk('a')])
+        self.store = JWKSStore(self.source, negative_ttl=60)
+
+    def test_get_known_kid_fetches_once(self):
+        self.assertIsNotNone(self.store.get('a'))
+        self.assertIsNotNone(self.store.get('a'))
+        self.assertEqual(1, self.source.fetch_count)
+
+    def test_get_unknown_kid_refetches_after_rotation(self):
+        self.store.get('a')
+        self.source.keys = [_jwk('b')]
+        self.assertIsNotNone(self.store.get('b'))
+        self.assertEqual(2, self.source.fetch_count)
+        self.assertIsNone(self.store.get('a'))
+
+    def test_get_unknown_kid_is_negatively_cached(self):
+        self.assertIsNone(self.store.get('missing'))
+        self.assertIsNone(self.store.get('missing'))
+        self.assertEqual(2, self.source.fetch_count)
+
+    def test_distinct_bogus_kids_refetch_at_most_once_per_interval(self):
+        self.store.get('a')
+        for number in range(2000):
+            self.assertIsNone(self.store.get(f'bogus-{number}'))
+        self.assertEqual(2, self.source.fetch_count)
+        self.assertLessEqual(len(self.store._misses), 1024)
+
+    def test_misses_are_capped(self):
+        store = JWKSStore(self.source, refetch_interval=0, max_misses=3)
+        for number in range(10):
+            store.get(f'bogus-{number}')
+        self.assertEqual(['bogus-7', 'bogus-8', 'bogus-9'], list(store._misses))
+
+    def test_failed_refresh_keeps_last_good_keys(self):
+        self.store.get('a')
+        self.source.fail = True
+        self.assertFalse(self.store.refresh())
+        self.assertIsNotNone(self.store.get('a'))
+
+    def test_listener_called_when_key_set_changes(self):
+        calls = []
+        self.store.add_listener(lambda: calls.append(self.store.version))
+        self.store.refresh()
+        self.store.refresh()
+        self.source.keys = [_jwk('b')]
+        self.store.refresh()
+        self.assertEqual([1, 2], calls)
+
+    def test_listener_called_when_key_replaced_under_same_kid(self):
+        calls = []
+        self.store.add_listener(lambda: calls.append(self.store.version))
+        self.store.refresh()
+        old_key = self.store.get('a')
+        self.source.keys = [_jwk('a')]
+        self.store.refresh()
+        self.assertEqual([1, 2], calls)
+        self.assertIsNot(old_key, self.store.get('a'))
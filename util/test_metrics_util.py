@@ -0,0 +1,58 @@
+import tempfile
+from unittest import mock, TestCase
+
+from benchmarks import bench_metrics_util
+from util.metrics_util import merge_snapshots, MetricsDirectory, MetricsRegistry, OVERHEAD_BUDGET_SECONDS
+
+
+class TestMetricsRegistry(TestCase):
+    def test_render_cumulative_histogram_buckets(self):
+        registry = MetricsRegistry()
+        registry.observe('latency_seconds', 0.002, route='/a')
+        registry.observe('latency_seconds', 0.2, route='/a')
+        rendered = registry.render()
+        self.assertIn('latency_seconds_bucket{route="/a",le="0.001"} 0', rendered)
+        self.assertIn('latency_seconds_bucket{route="/a",le="0.0025"} 1', rendered)
+        self.assertIn('latency_seconds_bucket{route="/a",le="+Inf"} 2', rendered)
+        self.assertIn('latency_seconds_count{route="/a"} 2', rendered)
+
+    def test_render_gauge(self):
+        registry = MetricsRegistry()
+        registry.gauge('cache_hits', 'Cache hits.', lambda: 3)
+        self.assertIn('# TYPE cache_hits gauge\ncache_hits 3\n', registry.render())
+
+    def test_merge_sums_histograms_and_labels_gauges_by_worker(self):
+        first, second = MetricsRegistry(), MetricsRegistry()
+        for registry, hits in ((first, 3), (second, 4)):
+            registry.observe('latency_seconds', 0.002, route='/a')
+            registry.gauge('cache_hits', 'Cache hits.', lambda hits=hits: hits)
+        second.observe('latency_seconds', 0.2, route='/b')
+        rendered = first.render(merge_snapshots({'101': first.snapshot(), '102': second.snapshot()}))
+        self.assertIn('latency_seconds_count{route="/a"} 2', rendered)
+        self.assertIn('latency_seconds_count{route="/b"} 1', rendered)
+        self.assertIn('cache_hits{worker="101"} 3\ncache_hits{worker="102"} 4\n', rendered)
+
+    def test_instrumentation_overhead_is_within_budget(self):
+        # The median of several short runs, so one slow run on a busy machine does not fail it.
+        self.assertLess(bench_metrics_util.measure(2000), OVERHEAD_BUDGET_SECONDS)
+
+
+class TestMetricsDirectory(TestCase):
+    def test_scrape_reports_every_worker(self):
+        directory = tempfile.mkdtemp()
+        serving, other = MetricsRegistry(), MetricsRegistry()
+        serving.observe('latency_seconds', 0.002)
+        other.observe('latency_seconds', 0.002)
+        other.gauge('cache_hits', 'Cache hits.', lambda: 4)
+        with mock.patch('util.metrics_util.getpid', return_value=102):
+            MetricsDirectory(other, directory).flush()
+
+        metrics_directory = MetricsDirectory(serving, directory)
+        rendered = metrics_directory.render()
+        self.assertIn('latency_seconds_count 2', rendered)
+        self.assertIn('cache_hits{worker="102"} 4', rendered)
+
+        metrics_directory.mark_process_dead(102)
+        rendered = metrics_directory.render()
+        self.assertIn('latency_seconds_count 2', rendered)
+        self.assertNotIn('cache_hits', rendered)
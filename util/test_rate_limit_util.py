@@ -0,0 +1,85 @@
+from os import environ
+from threading import Event, Thread
+from unittest import mock, TestCase
+
+from werkzeug.exceptions import ServiceUnavailable, TooManyRequests
+
+from util.cache_util import InProcessCacheBackend, LocalSharedCacheClient, SharedCacheBackend
+from util.rate_limit_util import Budget, ConcurrencyLimiter, init_concurrency_limiter, init_rate_limiter, \
+    TokenBucketLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestTokenBucketLimiter(TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.limiter = TokenBucketLimiter({'read': Budget(2, 3), 'report': Budget(0.5, 1)}, InProcessCacheBackend(),
+                                          clock=self.clock)
+
+    def test_burst_then_retry_after(self):
+        self.assertEqual([0, 0, 0], [self.limiter.take('e1', 'read') for _ in range(3)])
+        self.assertAlmostEqual(0.5, self.limiter.take('e1', 'read'))
+        self.clock.now += 0.5
+        self.assertEqual(0, self.limiter.take('e1', 'read'))
+        self.assertEqual(1, self.limiter.rejected)
+
+    def test_budgets_are_per_employee_and_kind(self):
+        self.limiter.take('e1', 'report')
+        self.assertEqual(0, self.limiter.take('e2', 'report'))
+        self.assertEqual(0, self.limiter.take('e1', 'read'))
+        with self.assertRaises(TooManyRequests) as context:
+            self.limiter.admit('e1', 'report')
+        self.assertIn(('Retry-After', '2'), context.exception.get_headers())
+
+    def test_shared_backend_is_shared_between_limiters(self):
+        backend = SharedCacheBackend(LocalSharedCacheClient())
+        first = TokenBucketLimiter({'report': Budget(0.5, 1)}, backend, clock=self.clock)
+        second = TokenBucketLimiter({'report': Budget(0.5, 1)}, backend, clock=self.clock)
+        self.assertEqual(0, first.take('e1', 'report'))
+        self.assertGreater(second.take('e1', 'report'), 0)
+
+    def test_in_process_buckets_get_each_workers_share(self):
+        with mock.patch.dict(environ, {'RATE_LIMITS': 'on', 'GUNICORN_WORKERS': '4', 'RATE_LIMIT_READ': '10,40',
+                                       'RATE_LIMIT_REPORT': '0.5,2'}):
+            environ.pop('RATE_LIMIT_REDIS_URL', None)
+            budgets = init_rate_limiter().budgets
+        self.assertEqual(Budget(2.5, 10), budgets['read'])
+        # Half a token of burst would refuse every report request.
+        self.assertEqual(Budget(0.125, 1), budgets['report'])
+
+
+class TestConcurrencyLimiter(TestCase):
+    def test_sheds_when_all_slots_are_busy(self):
+        limiter = ConcurrencyLimiter(1, wait=0.01)
+        entered, release = Event(), Event()
+
+        def hold_slot():
+            with limiter.admit():
+                entered.set()
+                release.wait()
+
+        holder = Thread(target=hold_slot)
+        holder.start()
+        entered.wait()
+        with self.assertRaises(ServiceUnavailable) as context:
+            with limiter.admit():
+                pass
+        release.set()
+        holder.join()
+        self.assertIn(('Retry-After', '1'), context.exception.get_headers())
+        with limiter.admit():
+            pass
+        self.assertEqual(1, limiter.rejected)
+
+    def test_limit_is_off_unless_workers_run_more_threads(self):
+        with mock.patch.dict(environ, {'MAX_CONCURRENT_REQUESTS': '15', 'GUNICORN_THREADS': '1'}):
+            self.assertIsNone(init_concurrency_limiter()._slots)
+            environ['GUNICORN_THREADS'] = '32'
+            self.assertIsNotNone(init_concurrency_limiter()._slots)
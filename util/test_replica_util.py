@@ -0,0 +1,84 @@
+from os import environ, path
+import sqlite3
+import tempfile
+import time
+from unittest import mock, TestCase
+
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+
+from benchmarks.sqlite_schema import create_schema
+from util.cache_util import InProcessCacheBackend
+from util.replica_util import init_replicas, replica_binds
+from util.sql_util import init_db, SQLUtil
+from util.type_util import TimecardEntry
+
+
+class TestReplicaRouting(TestCase):
+    """A primary and a replica SQLite file whose employee rows differ, so each read shows where it was served from."""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        primary, replica = path.join(directory, 'primary.db'), path.join(directory, 'replica.db')
+        for database, first_name in ((primary, 'Primary'), (replica, 'Replica')):
+            with sqlite3.connect(database) as connection:
+                create_schema(connection)
+                for employee_id in ('e1', 'e2'):
+                    connection.execute(
+                        'INSERT INTO employee (id, first_name, last_name, user_principal_name) VALUES (?, ?, ?, ?)',
+                        (employee_id, first_name, 'Person', f'{employee_id}@example.com'))
+
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{primary}'
+        self.app.config['SQLALCHEMY_BINDS'] = replica_binds([f'sqlite:///{replica}'])
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db = SQLAlchemy(self.app)
+        self.replicas = init_replicas(self.app, db, InProcessCacheBackend())
+        self.sql_util = SQLUtil(db, self.replicas)
+
+    def create_timecard(self, employee_id: str) -> None:
+        timecard = TimecardEntry({'hours': 2, 'location': 'Office', 'description': 'Work', 'date': 1704067200})
+        timecard.employee_id = employee_id
+        self.sql_util.create_timecard(timecard, 'Test Person')
+
+    def test_reads_go_to_replica(self):
+        with self.app.app_context():
+            self.assertEqual('Replica', self.sql_util.employee_info('e1')['first_name'])
+            self.assertEqual({'Replica'}, {employee['first_name'] for employee in self.sql_util.employee_list()})
+
+    def test_write_pins_only_that_employee_to_primary(self):
+        with self.app.app_context():
+            self.create_timecard('e1')
+            self.assertEqual('Primary', self.sql_util.employee_info('e1')['first_name'])
+            self.assertEqual(1, len(self.sql_util.get_timecard_entries_between('e1', '2024-01-01', '2024-01-01')))
+            self.assertEqual('Replica', self.sql_util.employee_info('e2')['first_name'])
+
+    def test_pin_expires_after_window(self):
+        self.replicas.pin_seconds = 0.05
+        with self.app.app_context():
+            self.create_timecard('e1')
+            time.sleep(0.1)
+            self.assertEqual('Replica', self.sql_util.employee_info('e1')['first_name'])
+            self.assertEqual([], self.sql_util.get_timecard_entries_between('e1', '2024-01-01', '2024-01-01'))
+
+    def test_create_employee_pins_employee_list(self):
+        with self.app.app_context():
+            self.sql_util.create_employee(
+                {'id': 'e3', 'first_name': 'New', 'last_name': 'Person', 'user_principal_name': 'e3@example.com'})
+            self.assertIn('e3', [employee['id'] for employee in self.sql_util.employee_list()])
+
+    def test_without_replicas_reads_primary(self):
+        self.replicas.replica_sessions = []
+        with self.app.app_context():
+            self.assertEqual('Primary', self.sql_util.employee_info('e1')['first_name'])
+
+
+class TestReplicaPins(TestCase):
+    def test_replicas_with_several_workers_need_shared_pins(self):
+        database = path.join(tempfile.mkdtemp(), 'primary.db')
+        with mock.patch.dict(environ, {'DATABASE_URI': f'sqlite:///{database}',
+                                       'DATABASE_REPLICA_URIS': f'sqlite:///{database}', 'GUNICORN_WORKERS': '4'}):
+            environ.pop('QUERY_CACHE_REDIS_URL', None)
+            self.assertRaises(RuntimeError, init_db, Flask(__name__))
+            environ['GUNICORN_WORKERS'] = '1'
+            self.assertEqual(1, len(init_db(Flask(__name__)).replicas.replica_sessions))
@@ -0,0 +1,113 @@
+from datetime import datetime, timedelta
+from os import path
+import sqlite3
+import tempfile
+from unittest import TestCase
+
+from flask import Flask, session
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+
+from benchmarks.sqlite_schema import create_schema
+from util import session_util
+
+
+class TestPruneExpiredSessions(TestCase):
+    def setUp(self):
+        database = path.join(tempfile.mkdtemp(), 'sessions.db')
+        now = datetime.utcnow()
+        with sqlite3.connect(database) as connection:
+            create_schema(connection)
+            connection.executemany('INSERT INTO session (session_id, data, expiry) VALUES (?, ?, ?)', [
+                (f'session:{index}', b'', str(now + timedelta(hours=-1 if index < 25 else 1)))
+                for index in range(30)
+            ])
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{database}'
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        self.db = SQLAlchemy(self.app)
+
+    def test_prunes_expired_sessions_in_batches(self):
+        batches = []
+        with self.app.app_context():
+            deleted = session_util.prune_expired_sessions(self.db, batch_size=10, pause=0, on_batch=batches.append)
+            stats = session_util.session_table_stats(self.db, lookup_samples=3)
+        self.assertEqual(25, deleted)
+        self.assertEqual([10, 10, 5], batches)
+        self.assertEqual(5, stats['total_rows'])
+        self.assertEqual(0, stats['expired_rows'])
+        self.assertGreater(stats['lookup_ms'], 0)
+
+    def test_max_batches_bounds_the_run(self):
+        with self.app.app_context():
+            deleted = session_util.prune_expired_sessions(self.db, batch_size=10, pause=0, max_batches=1)
+            stats = session_util.session_table_stats(self.db, lookup_samples=1)
+        self.assertEqual(10, deleted)
+        self.assertEqual(15, stats['expired_rows'])
+
+
+class TestCachedSqlAlchemySessionInterface(TestCase):
+    def setUp(self):
+        database = path.join(tempfile.mkdtemp(), 'sessions.db')
+        with sqlite3.connect(database) as connection:
+            create_schema(connection)
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{database}'
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        self.app.config['SESSION_SQLALCHEMY_TABLE'] = 'session'
+        self.app.permanent_session_lifetime = timedelta(hours=2)
+        self.db = SQLAlchemy(self.app)
+        self.interface = session_util.init_session(self.app, self.db)
+        self.statements = []
+        with self.app.app_context():
+            event.listen(self.db.engine, 'before_cursor_execute',
+                         lambda *args: self.statements.append(args[2].split()[0].upper()))
+
+        @self.app.route('/set/<value>')
+        def set_value(value):
+            session['value'] = value
+            return ''
+
+        @self.app.route('/get')
+        def get_value():
+            return session.get('value', '')
+
+        self.client = self.app.test_client()
+
+    def stored_expiry(self) -> datetime:
+        with sqlite3.connect(self.app.config['SQLALCHEMY_DATABASE_URI'][len('sqlite:///'):]) as connection:
+            return datetime.fromisoformat(connection.execute('SELECT expiry FROM session').fetchone()[0])
+
+    def test_unchanged_session_is_read_from_cache_and_not_written(self):
+        self.client.get('/set/a')
+        self.assertEqual(['INSERT'], self.statements)
+        self.statements.clear()
+
+        response = self.client.get('/get')
+        self.assertEqual(b'a', response.data)
+        self.assertEqual([], self.statements)
+        self.assertEqual(1, self.interface.read_cache.hits)
+
+    def test_changed_session_is_written(self):
+        self.client.get('/set/a')
+        self.statements.clear()
+        self.client.get('/set/b')
+        self.assertEqual(['UPDATE'], self.statements)
+        self.assertEqual(b'b', self.client.get('/get').data)
+
+    def test_cookie_keeps_the_stored_expiry_until_the_row_is_refreshed(self):
+        self.client.get('/set/a')
+        stored = self.stored_expiry()
+        cookie = self.client.get('/get').headers['Set-Cookie']
+        self.assertIn(stored.strftime('%d %b %Y %H:%M:%S'), cookie)
+
+        # Age the row past half its lifetime: the next response extends it even though the data is unchanged.
+        with self.app.app_context():
+            self.db.session.execute(self.interface.sql_session_model.__table__.update().values(
+                expiry=datetime.utcnow() + timedelta(minutes=30)))
+            self.db.session.commit()
+        self.interface.read_cache = session_util.SessionReadCache()
+        self.statements.clear()
+        self.client.get('/get')
+        self.assertEqual(['SELECT', 'UPDATE'], self.statements)
+        self.assertGreater(self.stored_expiry(), datetime.utcnow() + timedelta(hours=1))
@@ -0,0 +1,249 @@
+from datetime import date
+from decimal import Decimal
+from os import path
+import sqlite3
+import tempfile
+from unittest import TestCase
+
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+
+from benchmarks.sqlite_schema import create_schema
+from util import bulk_util
+from util.sql_util import align_pay_period_anchor, SQLUtil
+from util.type_util import TimecardEntry, UpdateTimecardEntryRequest
+
+
+class TestSQLUtil(TestCase):
+    def test_group_daily_totals_by_employee(self):
+        rows = [
+            ('a', date(2024, 2, 1), Decimal('1.50')),
+            ('a', date(2024, 2, 2), Decimal('2.00')),
+            ('c', date(2024, 2, 1), Decimal('8.00'))
+        ]
+        totals = SQLUtil.group_daily_totals_by_employee(rows, ['a', 'b'])
+        self.assertEqual(3.5, totals['a']['total_hours'])
+        self.assertEqual([{'timecard_date': '2024-02-01', 'total_hours': 1.5},
+                          {'timecard_date': '2024-02-02', 'total_hours': 2.0}], totals['a']['days'])
+        self.assertEqual({'total_hours': 0.0, 'days': []}, totals['b'])
+        self.assertEqual(8.0, totals['c']['total_hours'])
+
+    def test_align_pay_period_anchor(self):
+        self.assertEqual('2024-01-01', align_pay_period_anchor('2024-01-01', '2024-03-05', 14))
+        self.assertEqual('2023-12-18', align_pay_period_anchor('2024-01-01', '2023-12-20', 14))
+        self.assertEqual('2023-12-20', align_pay_period_anchor('2024-01-03', '2023-12-20', 14))
+
+
+class TestOwnershipCheckedWrites(TestCase):
+    def setUp(self):
+        database = path.join(tempfile.mkdtemp(), 'timecards.db')
+        with sqlite3.connect(database) as connection:
+            create_schema(connection)
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{database}'
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        self.sql_util = SQLUtil(SQLAlchemy(self.app))
+        with self.app.app_context():
+            timecard = TimecardEntry({'hours': 2, 'location': 'Office', 'description': 'Work', 'date': 1704067200})
+            timecard.employee_id = 'e1'
+            self.sql_util.create_timecard(timecard, 'Owner')
+            self.timecard_id = self.sql_util.get_timecard_entries_between('e1', '2024-01-01', '2024-01-01')[0]['id']
+
+    def update(self, employee_id: str, is_admin: bool = False) -> bool:
+        timecard = UpdateTimecardEntryRequest(
+            {'id': self.timecard_id, 'hours': 5, 'location': 'Home', 'description': 'Edited'})
+        timecard.employee_id = employee_id
+        return self.sql_util.update_timecard(timecard, 'Editor', is_admin)
+
+    def test_update_of_someone_elses_timecard_matches_no_row(self):
+        with self.app.app_context():
+            self.assertFalse(self.update('e2'))
+            entries = self.sql_util.get_timecard_entries_between('e1', '2024-01-01', '2024-01-01')
+            self.assertEqual(2, entries[0]['hours'])
+            self.assertTrue(self.update('e1'))
+            self.assertEqual([{'timecard_date': '2024-01-01', 'total_hours': 5}],
+                             self.sql_util.get_daily_hours_worked('e1', '2024', '1'))
+            self.assertEqual([], self.sql_util.verify_daily_totals())
+
+    def test_year_daily_hours(self):
+        with self.app.app_context():
+            self.assertEqual([{'timecard_date': '2024-01-01', 'total_hours': 2}],
+                             self.sql_util.get_year_daily_hours('e1', '2024'))
+            self.assertEqual([], self.sql_util.get_year_daily_hours('e1', '2023'))
+
+    def test_admin_update_bypasses_ownership(self):
+        with self.app.app_context():
+            self.assertTrue(self.update('e2', is_admin=True))
+            self.assertEqual([], self.sql_util.verify_daily_totals())
+
+    def test_delete_checks_ownership(self):
+        with self.app.app_context():
+            self.assertFalse(self.sql_util.delete_timecard(self.timecard_id, 'e2'))
+            self.assertEqual([], self.sql_util.verify_daily_totals())
+            self.assertTrue(self.sql_util.delete_timecard(self.timecard_id, 'e1'))
+            self.assertFalse(self.sql_util.delete_timecard(self.timecard_id, 'e1', is_admin=True))
+            self.assertEqual([], self.sql_util.get_daily_hours_worked('e1', '2024', '1'))
+            self.assertEqual([], self.sql_util.verify_daily_totals())
+
+
+class TestDailyTotals(TestCase):
+    def setUp(self):
+        database = path.join(tempfile.mkdtemp(), 'timecards.db')
+        with sqlite3.connect(database) as connection:
+            create_schema(connection)
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{database}'
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        self.db = SQLAlchemy(self.app)
+        self.sql_util = SQLUtil(self.db)
+
+    def timecard(self, hours: float, timestamp: int = 1704067200) -> TimecardEntry:  # 2024-01-01
+        timecard = TimecardEntry({'hours': hours, 'location': 'Office', 'description': 'Work', 'date': timestamp})
+        timecard.employee_id = 'e1'
+        return timecard
+
+    def totals(self) -> list:
+        return [dict(row) for row in self.db.session.execute(
+            'SELECT timecard_date, total_hours, entry_count FROM timecard_daily_totals ORDER BY timecard_date')]
+
+    def ids(self) -> list:
+        return [entry['id'] for entry in self.sql_util.get_timecard_entries_between('e1', '2024-01-01', '2024-01-02')]
+
+    def test_insert_update_and_delete_maintain_the_totals(self):
+        with self.app.app_context():
+            self.sql_util.create_timecard(self.timecard(2), 'Owner')
+            self.sql_util.save_timecards([self.timecard(1.5), self.timecard(4, 1704153600)], [], 'Owner')
+            self.assertEqual([{'timecard_date': '2024-01-01', 'total_hours': 3.5, 'entry_count': 2},
+                              {'timecard_date': '2024-01-02', 'total_hours': 4, 'entry_count': 1}], self.totals())
+
+            first, second = self.ids()[0:2]
+            update = UpdateTimecardEntryRequest({'id': first, 'hours': 6, 'location': 'Home', 'description': 'Edit'})
+            update.employee_id = 'e1'
+            self.assertTrue(self.sql_util.update_timecard(update, 'Owner'))
+            self.assertEqual(7.5, self.totals()[0]['total_hours'])
+
+            self.assertTrue(self.sql_util.delete_timecard(first, 'e1'))
+            self.assertTrue(self.sql_util.delete_timecard(second, 'e1'))
+            # The emptied day keeps a zero row, which the hours queries skip.
+            self.assertEqual({'timecard_date': '2024-01-01', 'total_hours': 0, 'entry_count': 0}, self.totals()[0])
+            self.assertEqual([{'timecard_date': '2024-01-02', 'total_hours': 4}],
+                             self.sql_util.get_daily_hours_worked('e1', '2024', '1'))
+            self.assertEqual([], self.sql_util.verify_daily_totals())
+
+    def test_validator_is_read_from_the_totals_and_changes_on_every_write(self):
+        with self.app.app_context():
+            self.sql_util.save_timecards([self.timecard(2), self.timecard(3)], [], 'Owner')
+            created = self.sql_util.get_timecard_validator('e1', '2024-01-01', '2024-01-02')
+            self.assertEqual(2, created['entry_count'])
+            self.assertIsNotNone(created['last_modified'])
+            self.assertTrue(self.sql_util.delete_timecard(self.ids()[0], 'e1'))
+            deleted = self.sql_util.get_timecard_validator('e1', '2024-01-01', '2024-01-02')
+            self.assertEqual((1, created['version'] + 1), (deleted['entry_count'], deleted['version']))
+            # Writes that bypass the totals go unnoticed: the validator never reads the timecard table.
+            self.db.session.execute('DELETE FROM timecard')
+            self.assertEqual(deleted, self.sql_util.get_timecard_validator('e1', '2024-01-01', '2024-01-02'))
+            self.assertEqual({'entry_count': 0, 'last_modified': None, 'version': 0},
+                             self.sql_util.get_timecard_validator('e2', '2024-01-01', '2024-01-02'))
+
+    def test_verify_reports_drift_and_rebuild_repairs_it(self):
+        with self.app.app_context():
+            self.sql_util.save_timecards([self.timecard(2), self.timecard(3)], [], 'Owner')
+            self.db.session.execute('UPDATE timecard_daily_totals SET total_hours = 1, entry_count = 1')
+            self.db.session.execute("INSERT INTO timecard_daily_totals (employee_id, timecard_date, total_hours, entry_count) "
+                                    "VALUES ('e2', '2024-01-05', 8, 1)")
+            self.db.session.commit()
+            self.assertEqual([
+                {'employee_id': 'e1', 'timecard_date': '2024-01-01', 'expected_hours': 5.0, 'actual_hours': 1.0,
+                 'expected_count': 2, 'actual_count': 1},
+                {'employee_id': 'e2', 'timecard_date': '2024-01-05', 'expected_hours': 0.0, 'actual_hours': 8.0,
+                 'expected_count': 0, 'actual_count': 1}
+            ], self.sql_util.verify_daily_totals())
+
+            self.assertEqual(1, self.sql_util.rebuild_daily_totals())
+            self.assertEqual([], self.sql_util.verify_daily_totals())
+            self.assertEqual([{'timecard_date': '2024-01-01', 'total_hours': 5}],
+                             self.sql_util.get_daily_hours_worked('e1', '2024', '1'))
+
+
+    def test_repeated_import_batch_is_skipped_by_id(self):
+        records = [{'id': timecard_id, 'employee_id': 'e1', 'timecard_date': '2024-01-01', 'hours': '2',
+                    'created_ts': '2024-01-01 17:00:00'} for timecard_id in ('7', '8', '')]
+        with self.app.app_context():
+            self.sql_util.import_timecards([bulk_util.timecard_row(record) for record in records[0:2]])
+            # The batch is repeated, as after a crash before its checkpoint was saved, with one new record.
+            self.sql_util.import_timecards([bulk_util.timecard_row(record) for record in records])
+            ids = self.ids()
+            self.assertEqual(3, len(ids))
+            self.assertEqual([7, 8], ids[0:2])
+            self.assertEqual([{'timecard_date': '2024-01-01', 'total_hours': 6, 'entry_count': 3}], self.totals())
+            self.assertEqual([], self.sql_util.verify_daily_totals())
+
+
+class TestYearArchive(TestCase):
+    def setUp(self):
+        database = path.join(tempfile.mkdtemp(), 'timecards.db')
+        with sqlite3.connect(database) as connection:
+            create_schema(connection)
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{database}'
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        self.sql_util = SQLUtil(SQLAlchemy(self.app))
+        with self.app.app_context():
+            timecards = []
+            for timestamp in (1703980800, 1703980800, 1703980800, 1704067200):  # 2023-12-31 x3, 2024-01-01
+                timecard = TimecardEntry({'hours': 2, 'location': 'Office', 'description': 'Work', 'date': timestamp})
+                timecard.employee_id = 'e1'
+                timecards.append(timecard)
+            self.sql_util.save_timecards(timecards, [], 'Owner')
+
+    def entries(self) -> list:
+        return self.sql_util.get_timecard_entries_between('e1', '2023-12-01', '2024-01-31')
+
+    def test_reads_span_the_archive_during_and_after_the_move(self):
+        with self.app.app_context():
+            before = self.entries()
+            self.sql_util.start_archive(2023)
+            tables = self.sql_util.archive.tables_for('2023-12-01', '2024-01-31')
+            self.assertEqual(('timecard_archive_2023', 'timecard'), tables)
+            self.assertEqual(2, self.sql_util.archive_batch(2023, batch_size=2))
+            self.assertFalse(self.sql_util.finish_archive(2023))
+            self.assertCountEqual(before, self.entries())
+            self.assertEqual([], self.sql_util.verify_daily_totals())
+
+            self.assertEqual(1, self.sql_util.archive_batch(2023, batch_size=2))
+            self.assertTrue(self.sql_util.finish_archive(2023))
+            self.assertEqual(('timecard_archive_2023',), self.sql_util.archive.tables_for('2023-01-01', '2023-12-31'))
+            self.assertEqual(('timecard',), self.sql_util.archive.tables_for('2024-01-01', '2024-01-31'))
+            self.assertCountEqual(before, self.entries())
+            self.assertEqual(3, self.sql_util.get_timecard_validator('e1', '2023-12-01', '2024-01-01')['entry_count'])
+            self.assertEqual(4, len(list(self.sql_util.stream_timecards())))
+            self.assertEqual(2, self.sql_util.rebuild_daily_totals())
+            self.assertEqual([], self.sql_util.verify_daily_totals())
+
+
+class TestProvisionEmployee(TestCase):
+    def setUp(self):
+        database = path.join(tempfile.mkdtemp(), 'employees.db')
+        with sqlite3.connect(database) as connection:
+            create_schema(connection)
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{database}'
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        self.sql_util = SQLUtil(SQLAlchemy(self.app))
+
+    def test_provision_inserts_then_refreshes(self):
+        employee = {'id': 'e1', 'first_name': 'Ada', 'last_name': '', 'user_principal_name': 'ada@example.com'}
+        with self.app.app_context():
+            self.assertEqual({**employee, 'new_employee': True}, self.sql_util.provision_employee(employee))
+            updated = {**employee, 'last_name': 'Lovelace'}
+            self.assertEqual(updated, self.sql_util.provision_employee(updated))
+            self.assertEqual({**employee, 'last_name': 'Lovelace'}, self.sql_util.employee_info('e1'))
+            self.assertEqual(1, len(self.sql_util.employee_list()))
+            self.assertEqual(updated, self.sql_util.provision_employee(updated))
+
+    def test_first_login_of_an_imported_employee_is_not_new(self):
+        employee = {'id': 'e2', 'first_name': 'Grace', 'last_name': 'Hopper',
+                    'user_principal_name': 'grace@example.com'}
+        with self.app.app_context():
+            self.sql_util.import_employees([employee])
+            self.assertEqual(employee, self.sql_util.provision_employee(employee))
@@ -0,0 +1,30 @@
+import time
+from unittest import TestCase
+
+from util.token_cache_util import VerifiedTokenCache
+
+
+class TestVerifiedTokenCache(TestCase):
+    def test_get_returns_cached_claims_and_counts_hits(self):
+        cache = VerifiedTokenCache()
+        claims = {'exp': time.time() + 60, 'oid': 'abc'}
+        self.assertIsNone(cache.get('token'))
+        cache.put('token', claims)
+        self.assertEqual(claims, cache.get('token'))
+        self.assertEqual((1, 1), (cache.hits, cache.misses))
+
+    def test_get_expired_token_is_a_miss(self):
+        cache = VerifiedTokenCache()
+        cache.put('token', {'exp': time.time() - 1})
+        self.assertIsNone(cache.get('token'))
+        self.assertEqual(0, len(cache))
+
+    def test_put_evicts_least_recently_used(self):
+        cache = VerifiedTokenCache(max_size=2)
+        exp = time.time() + 60
+        cache.put('a', {'exp': exp})
+        cache.put('b', {'exp': exp})
+        cache.get('a')
+        cache.put('c', {'exp': exp})
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
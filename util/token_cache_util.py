@@ -0,0 +1,61 @@
+from collections import OrderedDict
+from hashlib import sha256
+from threading import Lock
+import time
+from typing import Optional, Tuple
+
+from util.type_util import JWTClaims
+
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU of claims for bearer tokens that already passed RS256 verification.
+
+    Entries are keyed by a SHA-256 digest of the token so raw tokens are never held in memory, and each entry expires
+    at the token's own ``exp`` claim.
+    """
+
+    def __init__(self, max_size: int = 1024):
+        self._max_size = max_size
+        self._entries: 'OrderedDict[str, Tuple[float, JWTClaims]]' = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def token_key(token: str) -> str:
+        return sha256(token.encode('utf-8')).hexdigest()
+
+    def get(self, token: str) -> Optional[JWTClaims]:
+        key = VerifiedTokenCache.token_key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, claims = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return claims
+
+    def put(self, token: str, claims: JWTClaims) -> None:
+        expires_at = float(claims.get('exp', 0))
+        if expires_at <= time.time():
+            return
+        key = VerifiedTokenCache.token_key(token)
+        with self._lock:
+            self._entries[key] = (expires_at, claims)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
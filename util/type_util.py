@@ -18,9 +18,10 @@ class JWTClaims(TypedDict):
 class SessionIdentity(TypedDict):
     employee_id: str
     exp: int
+    groups: List[str]
     is_admin: bool
     name: str
-    payload: JWTClaims
+    tenant_id: str
     user_principal_name: str
 
 
@@ -1,10 +1,15 @@
 from datetime import date, datetime
 import re
-from typing import cast, Dict
+from typing import cast, Dict, List
 
 from werkzeug.exceptions import BadRequest, Forbidden
 
+MAX_TIMECARD_BATCH_SIZE = 100
+MAX_EMPLOYEE_PAGE_SIZE = 500
+MAX_ROLLUP_DAYS = 731
+
 from util import auth_util
+from util.calendar_util import CALENDAR_FORMATS
 from util.type_util import TimecardEntry, UpdateTimecardEntryRequest, SessionIdentity
 
 
@@ -33,6 +38,21 @@ def require_iso_format(value: str) -> None:
         raise BadRequest('Value must be in ISO format')
 
 
+def require_date(year: str, month: str, day: str) -> None:
+    try:
+        date(int(year), int(month), int(day))
+    except ValueError:
+        raise BadRequest('Value must be a valid date')
+
+
+def require_iso_date(value: str) -> date:
+    require_iso_format(value)
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise BadRequest('Value must be a valid date')
+
+
 def verify_admin_or_self(identity: SessionIdentity, employee_id: str) -> None:
     if not (auth_util.is_admin(identity) or employee_id == identity.get('employee_id', '')):
         raise Forbidden('User not allowed to access this page. ' + str(identity))
@@ -56,6 +76,8 @@ def validate_employee_api_request(
         require_numeric(month)
     if day:
         require_numeric(day)
+    if year and month:
+        require_date(year, month, day or '1')
     verify_admin_or_self(identity, employee_id)
 
 
@@ -71,6 +93,49 @@ def validate_timecard_entry_request(request: TimecardEntry) -> None:
         require_numeric(str(request.date))
 
 
+def validate_employee_list_query(limit: str = None, after: str = None, query: str = None) -> None:
+    if limit is not None:
+        require_numeric(limit)
+        if not 0 < int(limit) <= MAX_EMPLOYEE_PAGE_SIZE:
+            raise BadRequest(f'limit must be between 1 and {MAX_EMPLOYEE_PAGE_SIZE}')
+    if after is not None:
+        require_alphanumeric(after)
+    if query is not None and not re.search(r"^[\w\s.,'-]{1,100}$", query):
+        raise BadRequest('Search must be 1 to 100 letters, numbers, spaces, or name punctuation')
+
+
+def validate_employee_ids_query(employee_ids: str) -> None:
+    ids = employee_ids.split(',')
+    if len(ids) > MAX_EMPLOYEE_PAGE_SIZE:
+        raise BadRequest(f'At most {MAX_EMPLOYEE_PAGE_SIZE} employee ids may be requested at once')
+    for employee_id in ids:
+        require_alphanumeric(employee_id)
+
+
+def validate_response_format(response_format: str) -> None:
+    if response_format not in ('rows', 'columnar'):
+        raise BadRequest('Response format must be rows or columnar')
+
+
+def validate_year_calendar_request(year: str, calendar_format: str) -> None:
+    if not 1 <= int(year) < date.max.year:
+        raise BadRequest('Year is out of range')
+    if calendar_format not in CALENDAR_FORMATS:
+        raise BadRequest('Calendar format must be json, float32 or uint16')
+
+
+def validate_timecard_batch_request(requests: List[TimecardEntry]) -> None:
+    if not requests:
+        raise BadRequest('Timecard batch must contain at least one entry')
+    if len(requests) > MAX_TIMECARD_BATCH_SIZE:
+        raise BadRequest(f'Timecard batch may contain at most {MAX_TIMECARD_BATCH_SIZE} entries')
+    for request in requests:
+        validate_timecard_entry_request(request)
+    update_ids = [str(request.id) for request in requests if type(request) == UpdateTimecardEntryRequest]
+    if len(update_ids) != len(set(update_ids)):
+        raise BadRequest('Timecard batch may only update each entry once')
+
+
 def validate_timecard_entry_query(request: Dict[str, str]) -> None:
     if len(request.items()) != 2 or 'startDate' not in request or 'endDate' not in request:
         raise BadRequest('Timecard entry request must have startDate and endDate')
@@ -82,3 +147,31 @@ def validate_timecard_entry_query(request: Dict[str, str]) -> None:
         raise BadRequest('Start date must be before end date')
     if start_date_ts < end_date_ts - 2678400:
         raise BadRequest('Maximum time difference between start and end dates is 31 days')
+
+
+def validate_timecard_report_query(request: Dict[str, str], report_format: str) -> None:
+    if report_format not in ('ndjson', 'csv'):
+        raise BadRequest('Report format must be ndjson or csv')
+    if not request or 'startDate' not in request or 'endDate' not in request:
+        raise BadRequest('Timecard report request must have startDate and endDate')
+    if require_iso_date(request['startDate']) > require_iso_date(request['endDate']):
+        raise BadRequest('Start date must be before end date')
+
+
+def validate_rollup_query(request: Dict[str, any]) -> None:
+    if not request or 'startDate' not in request or 'endDate' not in request:
+        raise BadRequest('Rollup request must have startDate and endDate')
+    if set(request.keys()) - {'startDate', 'endDate', 'payPeriodDays', 'payPeriodAnchor'}:
+        raise BadRequest('Rollup request may only have startDate, endDate, payPeriodDays and payPeriodAnchor')
+    start_date = require_iso_date(request['startDate'])
+    end_date = require_iso_date(request['endDate'])
+    if start_date > end_date:
+        raise BadRequest('Start date must be before end date')
+    if (end_date - start_date).days >= MAX_ROLLUP_DAYS:
+        raise BadRequest(f'Maximum rollup range is {MAX_ROLLUP_DAYS} days')
+    if 'payPeriodDays' in request:
+        require_numeric(str(request['payPeriodDays']))
+        if not 1 <= int(request['payPeriodDays']) <= 31:
+            raise BadRequest('Pay period must be between 1 and 31 days')
+    if 'payPeriodAnchor' in request:
+        require_iso_date(request['payPeriodAnchor'])
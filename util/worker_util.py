@@ -0,0 +1,11 @@
+from os import environ
+
+
+def worker_count() -> int:
+    """Worker processes serving the app: GUNICORN_WORKERS, which gunicorn.conf.py exports to its workers, or 1."""
+    return int(environ.get('GUNICORN_WORKERS', 1))
+
+
+def worker_threads() -> int:
+    """Request threads per worker process: GUNICORN_THREADS, or 1."""
+    return int(environ.get('GUNICORN_THREADS', 1))
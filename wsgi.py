@@ -1,4 +1,9 @@
-from app import app
+from os import environ
+
+from app import create_app
+
+# gunicorn.conf.py sets DEFER_WORKER_START so a --preload master leaves per-process resources to post_fork.
+app = create_app(start_worker='DEFER_WORKER_START' not in environ)
 
 if __name__ == "__main__":
     app.run()